@@ -1,6 +1,7 @@
 import sys
 import bpy
 import os
+import threading
 import traceback
 
 from typing import List, Dict, Tuple, Set
@@ -10,14 +11,13 @@ sys.path.append(bpy.utils.user_resource(resource_type='SCRIPTS', path="addons")
 from pyedm_platform_selector import pyedm, native_bindings
 
 from bpy.types import Operator, Panel, Context, AddonPreferences, Object, UILayout, Light
-from bpy.props import StringProperty, BoolProperty, PointerProperty
+from bpy.props import StringProperty, BoolProperty, IntProperty, PointerProperty, EnumProperty
 from bpy_extras.io_utils import ExportHelper
 
 from pathlib import Path
 import shlex
 import subprocess
 
-from . import collection_walker
 from objects_custom_props import get_edm_props, EDM_PropsEnumValues, EDMPropsGroup
 from custom_sockets import get_custom_sockets_classes
 from . import custom_shader_group as custom_sg
@@ -28,14 +28,19 @@ from edm_exception import EdmFatalException
 from logger import log
 from enums import ObjectTypeEnum, EDMPropsSpecialTypeStr, LampTypeEnum, NodeGroupTypeEnum
 from edm_materials import get_material_classes, NODE_MT_EDM_Menu_add, NODE_MT_EDM_Dev_Menu_add
-from arg_panel import get_arg_panel_classes, EDM_PT_set_argument, EDM_PT_mute_animations, EDM_PT_unmute_animations, EDM_PT_reset, EDMArgPropsGroup, get_arg_panel_props
+from arg_panel import get_arg_panel_classes, EDM_PT_set_argument, EDM_PT_mute_animations, EDM_PT_unmute_animations, EDM_PT_reset, EDMArgPropsGroup, get_arg_panel_props, register_arg_index_handlers, unregister_arg_index_handlers
 from material_tools import get_material_tool_classes, EDM_PT_import_materials, EDM_PT_export_materials, check_materials_validity
-from materials import check_if_referenced_file, build_material_descriptions
+from materials import check_if_referenced_file
+from material_enum_index import load_enum_index
+from benchmarks import get_benchmark_classes
 from serializer_tools import MatDesc
 from dev_mode import get_dev_mode_classes, EDMDevModePropsGroup, get_dev_mode_props
 from export_connectors import ConnectorChildPanel
 from export_fake_lights import FakeLightChildPanel
-from export_lights import LightChildPanel
+from export_lights import LightChildPanel, light_cache
+from export_cache import export_cache, register_export_cache_handlers, unregister_export_cache_handlers
+from export_scope import get_export_scope_classes, get_export_scope_props, EDMExportScopePropsGroup, build_export_scope, get_scope_file_path
+from auto_lod import get_auto_lod_classes, get_auto_lod_props, draw_auto_lod_props, EDMAutoLodPropsGroup
 
 from . import utils
 
@@ -89,6 +94,12 @@ class EDMDataPanel(Panel):
         row = layout.row()
         row.operator(EDM_PT_fast_export.bl_idname)
 
+        scope_props = get_export_scope_props(context.scene)
+        row = layout.row()
+        row.prop(scope_props, "SCOPE")
+        if scope_props.SCOPE == 'LOD':
+            row.prop(scope_props, "LOD_ID")
+
         layout.split()
 
         props = get_arg_panel_props(context.scene)
@@ -208,6 +219,20 @@ class UnknownChildPanel(bpy.types.Panel):
             row = layout.row()
             row.prop(props, "OPACITY_VALUE_ARG")
 
+            if object.type == ObjectTypeEnum.MESH:
+                box = layout.box()
+                row = box.row()
+                row.prop(props, "CLUSTER_MESH")
+                if props.CLUSTER_MESH:
+                    row = box.row()
+                    row.prop(props, "CLUSTER_MAX_VERTICES")
+                    row = box.row()
+                    row.prop(props, "CLUSTER_MAX_TRIANGLES")
+
+                box = layout.box()
+                box.label(text='Auto Lod')
+                draw_auto_lod_props(box, get_auto_lod_props(object))
+
 class UserBoxChildPanel(bpy.types.Panel):
     bl_label = "UserBox type Properties"
     bl_idname = "OBJECT_PT_user_box_panel"
@@ -401,6 +426,62 @@ class EDMAddonParams(AddonPreferences):
         name="Arguments",
         default="--reload --single s $FILE$"
     )
+
+    deterministic_export: BoolProperty(
+        name = "Deterministic export",
+        description = "Export objects and bones in stable order and don't rewrite model if its content is unchanged",
+        default = False,
+    )
+
+    shell_bvh: BoolProperty(
+        name = "Collision shell BVH order",
+        description = "Write triangles of collision shells in order of BVH leaves, so close triangles are close in shell",
+        default = False,
+    )
+
+    light_grid: BoolProperty(
+        name = "Light influence grid",
+        description = "Write influence bounds of lights and their grid to <model>.lights.json. Model format doesn't store them",
+        default = False,
+    )
+
+    incremental_export: BoolProperty(
+        name = "Incremental export",
+        description = "Reuse mesh data and animation keys of objects which haven't changed since previous export",
+        default = True,
+    )
+
+    bone_palette_size: IntProperty(
+        name = "Bone palette size",
+        description = "Max number of bones of skin render node, bigger skins are split. 0 means no limit",
+        default = 0,
+        min = 0,
+    )
+
+    log_level: EnumProperty(
+        name = "Log level",
+        description = "Export messages below this level aren't written",
+        items = [
+            ('DEBUG', "Debug", "Write all messages"),
+            ('INFO', "Info", "Write info messages, warnings and errors"),
+            ('WARNING', "Warning", "Write warnings and errors"),
+            ('ERROR', "Error", "Write errors only"),
+        ],
+        default = 'INFO',
+    )
+
+    log_file: StringProperty(
+        name = "Log file",
+        description = "Write export log to this file instead of console",
+        subtype = 'FILE_PATH',
+        default = "",
+    )
+
+    object_table: BoolProperty(
+        name = "Table of objects",
+        description = "Write exported objects to <model>.objects.csv instead of log",
+        default = False,
+    )
     
     def draw(self, context):
         layout = self.layout
@@ -409,50 +490,232 @@ class EDMAddonParams(AddonPreferences):
         layout.prop(self, "working_dir")
         layout.prop(self, "arguments")
         layout.prop(self, "executable_path")
+        layout.prop(self, "deterministic_export")
+        layout.prop(self, "incremental_export")
+        layout.prop(self, "bone_palette_size")
+        layout.prop(self, "shell_bvh")
+        layout.prop(self, "light_grid")
+        layout.prop(self, "log_level")
+        layout.prop(self, "log_file")
+        layout.prop(self, "object_table")
+
+# Exporter modules are imported on first export, so blender sessions without export don't pay for them.
+def get_collection_walker():
+    from . import collection_walker
+    return collection_walker
+
+def get_export_options(context: Context):
+    options = get_collection_walker().ExportOptions()
+    options.scope = build_export_scope(context)
+    addon = context.preferences.addons.get(__name__)
+    if not addon:
+        return options
+
+    my_addon_params: EDMAddonParams = addon.preferences
+    options.deterministic = my_addon_params.deterministic_export
+    options.incremental = my_addon_params.incremental_export
+    options.shell_bvh = my_addon_params.shell_bvh
+    options.light_grid = my_addon_params.light_grid
+    options.bone_palette_size = my_addon_params.bone_palette_size
+    options.log_level = my_addon_params.log_level
+    options.log_file = bpy.path.abspath(my_addon_params.log_file) if my_addon_params.log_file else ''
+    options.object_table = my_addon_params.object_table
+    return options
+
+def check_export_prerequisites() -> None:
+    if not native_bindings:
+        raise EdmFatalException(f"\nError: couldn't proceed edm export because it's python dummy plugin, not native.")
+
+    if not check_if_referenced_file(bpy.context.blend_data.filepath):
+        check_materials_validity()
+
+# Reports collected warnings and errors to operator. Returns False if there were errors.
+def report_export_log(operator: Operator) -> bool:
+    for i in log.warnings:
+        operator.report({"WARNING"}, i)
+
+    if log.errors:
+        for i in log.errors:
+            operator.report({"ERROR"}, i)
+        log.errors = []
+        return False
+    return True
+
+def report_export_result(operator: Operator, abs_file_path: str, written: bool) -> None:
+    if written:
+        operator.report({"INFO"}, f'Model successfully exported to {abs_file_path}.')
+    else:
+        operator.report({"INFO"}, f'Model {abs_file_path} is unchanged, file was not rewritten.')
+    if export_cache.enabled and export_cache.stats:
+        operator.report({"INFO"}, f'Export cache: {export_cache.get_stats_string()}.')
+    if light_cache.misses:
+        operator.report({"INFO"}, f'Light cache: {light_cache.get_stats_string()}.')
+
+def report_export_fatal(operator: Operator, e: EdmFatalException):
+    log.error(str(e))
+    log.errors = []
+    operator.report({"ERROR"}, str(e))
+    return {'CANCELLED'}
+
+def run_model_viewer_process(file_path: str, context: Context) -> None:
+    my_addon_params: EDMAddonParams = context.preferences.addons[__name__].preferences
+    if not my_addon_params or not my_addon_params.run_viewer_flag:
+        return
+    args = shlex.split(my_addon_params.arguments)
+    args.insert(0, my_addon_params.executable_path)
+    if '$FILE$' in args:
+        i = args.index('$FILE$')
+        args[i] = file_path
+    DETACHED_PROCESS = 0x00000008
+    try:
+        subprocess.Popen(args, close_fds = True, creationflags = DETACHED_PROCESS)
+    except:
+        pass
 
 def run_edm_export(file_path: str, context: Context, operator: Operator, run_model_viewer: bool = True):
     abs_file_path: str = os.path.abspath(file_path)    
     try:
-        if not native_bindings:
-            raise EdmFatalException(f"\nError: couldn't proceed edm export because it's python dummy plugin, not native.")
-                
-        if not check_if_referenced_file(bpy.context.blend_data.filepath):
-            check_materials_validity()
-        collection_walker._write(context, abs_file_path)
+        check_export_prerequisites()
+        written: bool = get_collection_walker()._write(context, abs_file_path, get_export_options(context))
 
-        for i in log.warnings:
-            operator.report({"WARNING"}, i)
+        if not report_export_log(operator):
+            return {'CANCELLED'}
+        report_export_result(operator, abs_file_path, written)
+    except EdmFatalException as e:
+        return report_export_fatal(operator, e)
 
-        if log.errors:
-            for i in log.errors:
-                operator.report({"ERROR"}, i)
+    if run_model_viewer:
+        run_model_viewer_process(file_path, context)
+    return {'FINISHED'}
+
+# Export from UI goes through modal operator, so blender stays responsive and export can be cancelled.
+# Background mode and scripts without window export synchronously.
+# Scoped export is written to its own file, see 'get_scope_file_path'.
+def start_edm_export(file_path: str, context: Context, operator: Operator, run_model_viewer: bool = True):
+    scope_file_path: str = get_scope_file_path(context, file_path)
+    if scope_file_path != file_path:
+        operator.report({"INFO"}, f'Export scope is not whole scene, model is written to {scope_file_path}, {file_path} is kept.')
+        file_path = scope_file_path
+    if bpy.app.background or not context.window:
+        return run_edm_export(file_path, context, operator, run_model_viewer)
+
+    result = bpy.ops.edm.modal_export('INVOKE_DEFAULT', filepath = file_path, run_model_viewer = run_model_viewer)
+    return {'FINISHED'} if 'RUNNING_MODAL' in result else result
+
+class EDM_PT_modal_export(Operator):
+    bl_idname = "edm.modal_export"
+    bl_label = "EDM export"
+    bl_description = "Export to edm keeping blender responsive. Press ESC to cancel"
+    bl_options = {'INTERNAL'}
+
+    filepath: StringProperty(options = {'HIDDEN'})
+    run_model_viewer: BoolProperty(default = True, options = {'HIDDEN'})
+
+    ## Seconds of scene walking per timer tick.
+    TIME_SLICE = 0.05
+    TIMER_STEP = 0.01
+    # Events of viewport navigation and redraw.
+    PASS_THROUGH_EVENTS = {
+        'TIMER', 'TIMER_REPORT', 'TIMERREGION', 'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'MIDDLEMOUSE',
+        'WHEELUPMOUSE', 'WHEELDOWNMOUSE', 'WHEELINMOUSE', 'WHEELOUTMOUSE', 'TRACKPADPAN', 'TRACKPADZOOM',
+        'MOUSEROTATE', 'MOUSESMARTZOOM', 'NDOF_MOTION', 'WINDOW_DEACTIVATE',
+    }
+    is_running: bool = False
+
+    def invoke(self, context, event):
+        if EDM_PT_modal_export.is_running:
+            self.report({"WARNING"}, "EDM export is already running.")
+            return {'CANCELLED'}
+
+        collection_walker = get_collection_walker()
+        self._abs_file_path: str = os.path.abspath(self.filepath)
+        self._job: collection_walker.ExportJob = None
+        self._save_thread: threading.Thread = None
+        self._save_result: str = ''
+        try:
+            check_export_prerequisites()
+            self._job = collection_walker.ExportJob(context, self._abs_file_path, get_export_options(context))
+        except EdmFatalException as e:
+            return report_export_fatal(self, e)
+
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(self.TIMER_STEP, window = context.window)
+        wm.progress_begin(0, max(self._job.total, 1))
+        wm.modal_handler_add(self)
+        EDM_PT_modal_export.is_running = True
+        self.update_status(context)
+        return {'RUNNING_MODAL'}
+
+    def update_status(self, context: Context) -> None:
+        context.window_manager.progress_update(self._job.done)
+        if self._save_thread:
+            text = f"EDM export: saving {self._abs_file_path}"
+        else:
+            text = f"EDM export: {self._job.done}/{self._job.total} objects, ESC to cancel"
+        context.workspace.status_text_set(text)
+
+    # Runs in worker thread. Native serialization doesn't touch blender data.
+    def save(self) -> None:
+        try:
+            self._save_result = self._job.save_model()
+        except Exception as e:
+            self._save_result = str(e)
+
+    def finish(self, context: Context) -> None:
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+        self._job.destroy()
+        EDM_PT_modal_export.is_running = False
+
+    def modal(self, context, event):
+        # Model is complete at saving, so saving isn't interrupted.
+        if event.type == 'ESC' and event.value == 'PRESS' and not self._save_thread:
+            self.finish(context)
             log.errors = []
+            self.report({"WARNING"}, f"EDM export is cancelled, {self._abs_file_path} was not written.")
             return {'CANCELLED'}
-            
-        operator.report({"INFO"}, f'Model successfully exported to {abs_file_path}.')
-    except EdmFatalException as e:
-        exc_type, exc_value, exc_traceback = sys.exc_info()
-        res = ''.join(traceback.format_tb(exc_traceback, limit=1))
-        res += ''.join(traceback.format_exception(exc_type, exc_value, exc_traceback, limit=2))
-        log.error(str(e))
-        log.errors = []
-        operator.report({"ERROR"}, str(e))
-        return {'CANCELLED'}
 
-    my_addon_params: EDMAddonParams = context.preferences.addons[__name__].preferences
-    run_viewer_flag: bool = my_addon_params and my_addon_params.run_viewer_flag and run_model_viewer
-    if run_viewer_flag:
-        args = shlex.split(my_addon_params.arguments)
-        args.insert(0, my_addon_params.executable_path)
-        if '$FILE$' in args:
-            i = args.index('$FILE$')
-            args[i] = file_path
-        DETACHED_PROCESS = 0x00000008
+        if event.type != 'TIMER' or event.timer != self._timer:
+            # Job holds blender data, so only viewport navigation is allowed while it runs: editing, deleting
+            # or undo could free data which is walked or saved.
+            if event.type in self.PASS_THROUGH_EVENTS:
+                return {'PASS_THROUGH'}
+            return {'RUNNING_MODAL'}
+
         try:
-            subprocess.Popen(args, close_fds = True, creationflags = DETACHED_PROCESS)
-        except:
-            pass
-    return {'FINISHED'}
+            if not self._save_thread:
+                if self._job.step(self.TIME_SLICE):
+                    self._job.walker.log_status()
+                    if log.errors:
+                        self.finish(context)
+                        report_export_log(self)
+                        return {'CANCELLED'}
+                    self._save_thread = threading.Thread(target = self.save, daemon = True)
+                    self._save_thread.start()
+                self.update_status(context)
+                return {'RUNNING_MODAL'}
+
+            if self._save_thread.is_alive():
+                return {'RUNNING_MODAL'}
+
+            written: bool = self._job.finish_save(self._save_result)
+        except EdmFatalException as e:
+            self.finish(context)
+            return report_export_fatal(self, e)
+        except Exception as e:
+            self.finish(context)
+            raise e
+
+        self.finish(context)
+        if not report_export_log(self):
+            return {'CANCELLED'}
+        report_export_result(self, self._abs_file_path, written)
+
+        if self.run_model_viewer:
+            run_model_viewer_process(self.filepath, context)
+        return {'FINISHED'}
 
 class EDM_PT_export(Operator, ExportHelper):
     bl_idname = "edm.export"
@@ -466,7 +729,7 @@ class EDM_PT_export(Operator, ExportHelper):
     )
 
     def execute(self, context):
-        return run_edm_export(self.filepath, context, self)
+        return start_edm_export(self.filepath, context, self)
 
 class EDM_PT_fast_export(Operator):
     bl_idname = "edm.fast_export" 
@@ -478,7 +741,7 @@ class EDM_PT_fast_export(Operator):
         file_dir: str = os.path.dirname(bpy.data.filepath) if is_file_name_available else os.path.dirname(os.path.realpath(__file__))
         file_name = Path(bpy.data.filepath).stem if is_file_name_available else 'test'
         file_path: str = os.path.join(file_dir, file_name + '.edm')
-        return run_edm_export(file_path, context, self)
+        return start_edm_export(file_path, context, self)
     
 class EDM_PT_fast_export_dummy(Operator):
     bl_idname = "edm.fast_export_dummy" 
@@ -490,7 +753,7 @@ class EDM_PT_fast_export_dummy(Operator):
         file_dir: str = os.path.dirname(bpy.data.filepath) if is_file_name_available else os.path.dirname(os.path.realpath(__file__))
         file_name = Path(bpy.data.filepath).stem if is_file_name_available else 'test'
         file_path: str = os.path.join(file_dir, file_name + '.edm')
-        return run_edm_export(file_path, context, self, False)
+        return start_edm_export(file_path, context, self, False)
 
 def menu_func_export(self, context):
     self.layout.operator(EDM_PT_export.bl_idname, text="Eagle Dynamics Model (.edm)")
@@ -504,6 +767,9 @@ def collect_classes():
     classes += get_objects_custom_props_classes()
     classes += custom_sg.get_custom_shader_group_classes()
     classes += get_dev_mode_classes()
+    classes += get_export_scope_classes()
+    classes += get_auto_lod_classes()
+    classes += get_benchmark_classes()
     classes += (
         EDMDataPanel,
         EDM_PT_fast_export,
@@ -520,6 +786,7 @@ def collect_classes():
         LightBoxChildPanel,
         NumberTypeChildPanel,
         EDM_PT_export,
+        EDM_PT_modal_export,
     )
     return classes
 
@@ -543,9 +810,10 @@ def create_return_items(enum_name: str, mat_name: str, it: Dict[custom_sg.Materi
 def register():
     pyedm.init()
 
-    material_desc: Dict[NodeGroupTypeEnum, MatDesc] = build_material_descriptions()
-    items: Dict[custom_sg.MaterialNameType, Dict[custom_sg.SocketNameType, List[Tuple[str, str, str, int]]]] = custom_sg.get_enum_items(material_desc)
-    names: Dict[custom_sg.MaterialNameType, Dict[str, str]] = custom_sg.get_enum_names(material_desc)
+    # Enum items come from json index, descriptions are loaded on first use.
+    items: Dict[custom_sg.MaterialNameType, Dict[custom_sg.SocketNameType, List[Tuple[str, str, str, int]]]]
+    names: Dict[custom_sg.MaterialNameType, Dict[str, str]]
+    items, names = load_enum_index()
     names_enum: List[Tuple[custom_sg.SocketType, custom_sg.MaterialNameType, custom_sg.SocketNameType, int]] = custom_sg.get_enum_names_map(names)
 
     deffered_names_enum = bpy.props.EnumProperty (
@@ -571,10 +839,15 @@ def register():
 
     bpy.types.TOPBAR_MT_file_export.append(menu_func_export)
     bpy.types.NODE_MT_add.append(add_node_button)
+    register_export_cache_handlers()
+    register_arg_index_handlers()
     
     bpy.types.Scene.EDMArgProps = PointerProperty(type = EDMArgPropsGroup)
     bpy.types.Object.EDMProps = PointerProperty(type = EDMPropsGroup)
     bpy.types.Scene.EDMEnumItems = PointerProperty(type = EDM_PropsEnumValues)
+    bpy.types.Scene.EDMExportScopeProps = PointerProperty(type = EDMExportScopePropsGroup)
+    bpy.types.Object.AutoLodProps = PointerProperty(type = EDMAutoLodPropsGroup)
+    bpy.types.Collection.AutoLodProps = PointerProperty(type = EDMAutoLodPropsGroup)
     
     if pyedm.dev_mode():
         bpy.types.Scene.EDMDevModeProps = PointerProperty(type = EDMDevModePropsGroup)
@@ -595,11 +868,16 @@ def unregister():
     del bpy.types.Scene.EDMArgProps
     del bpy.types.Object.EDMProps
     del bpy.types.Scene.EDMEnumItems
+    del bpy.types.Scene.EDMExportScopeProps
+    del bpy.types.Object.AutoLodProps
+    del bpy.types.Collection.AutoLodProps
     if pyedm.dev_mode():
         del bpy.types.Scene.EDMDevModeProps
 
     bpy.types.TOPBAR_MT_file_export.remove(menu_func_export)
     bpy.types.NODE_MT_add.remove(add_node_button)
+    unregister_export_cache_handlers()
+    unregister_arg_index_handlers()
 
     classes = collect_classes()
     for cls in reversed(classes):
@@ -3,8 +3,9 @@ from pyedm_platform_selector import pyedm
 from enum import Enum
 from math_tools import euler_to_quat
 from bpy.types import FCurve, Action, Object, AnimData
-from typing import Union, Callable, Set, Tuple, List
+from typing import Union, Callable, Set, Tuple, List, Dict
 import utils
+from export_cache import export_cache, get_id_key
 
 class Data_Path_Enum(str, Enum):
     LOCATION        = 'location'
@@ -72,6 +73,18 @@ def has_transform_anim(obj: Object, data_path_modifier=lambda x: x, allowed_args
     
     return (None, -1)
 
+## F-curves of action by data path. Is built once and shared by all users of action, for example all bones of armature,
+## so every user doesn't scan all f-curves of action.
+class ActionIndex:
+    def __init__(self, action: Action) -> None:
+        self.action = action
+        self.fcurves: Dict[str, List[FCurve]] = {}
+        for fcu in action.fcurves:
+            self.fcurves.setdefault(fcu.data_path, []).append(fcu)
+
+    def get(self, data_path: str) -> List[FCurve]:
+        return self.fcurves.get(data_path, [])
+
 def has_data_anim(obj: Object) -> bool:
     if not hasattr(obj, 'data'):
         return False
@@ -103,8 +116,16 @@ KeyFrameValueTransform = Callable[[KeyFrameValue], KeyFrameValue]
 KeyFramePoint = Tuple[KeyFrameTime, KeyFrameValue]
 KeyFramePoints = List[KeyFramePoint]
 
+# Applies fn to every value. Lists are copied, so fn can't spoil cached keys.
+def apply_to_keys(kvs: KeyFramePoints, fn: KeyFrameValueTransform) -> KeyFramePoints:
+    return [(k, fn(list(v)) if isinstance(v, list) else fn(v)) for k, v in kvs]
+
 # Returns [(key, value), ...] for 1 animation element and [(key, [value1, value2, ...], ...] for multiple, or None
 def fcurves_animation(fcurves: List[FCurve], expected_num: int, def_value: KeyFrameValue, fn: KeyFrameValueTransform = lambda v: v) -> KeyFramePoints:
+    return apply_to_keys(fcurves_raw_animation(fcurves, expected_num, def_value), fn)
+
+# Same as 'fcurves_animation' without value transform.
+def fcurves_raw_animation(fcurves: List[FCurve], expected_num: int, def_value: KeyFrameValue) -> KeyFramePoints:
     if not def_value:
         def_value = [0] * expected_num
     
@@ -127,47 +148,55 @@ def fcurves_animation(fcurves: List[FCurve], expected_num: int, def_value: KeyFr
                     v.append(val)
                 else:
                     v.append(fcu.val)
-            kvs.append((((k / 100.0) - 1.0), fn(v)))
+            kvs.append((((k / 100.0) - 1.0), v))
     else:
         for k in keys:
             for fcu in fcurves:
                 v = fcu.evaluate(k)
-                kvs.append((((k / 100.0) - 1.0), fn(v)))
+                kvs.append((((k / 100.0) - 1.0), v))
         
     return kvs
 
 # Returns [(key, value), ...] for 1 animation element and [(key, [value1, value2, ...], ...] for multiple, or None
-def action_animation(action: Action, data_path: str, expected_num: int, def_value: KeyFrameValue, fn: KeyFrameValueTransform = lambda v: v) -> KeyFramePoints:
+# Raw keys are kept in export cache until action changes.
+def action_animation(action: Action, data_path: str, expected_num: int, def_value: KeyFrameValue, fn: KeyFrameValueTransform = lambda v: v, action_index: ActionIndex = None) -> KeyFramePoints:
     if not action:
         return None
-    
+
+    key = ('ANIM', action.name, data_path, expected_num, tuple(def_value) if def_value else None)
+    kvs = export_cache.get(key, {get_id_key(action)}, (action.as_pointer(),), lambda: action_raw_animation(action, data_path, expected_num, def_value, action_index))
+    if kvs is None:
+        return None
+    return apply_to_keys(kvs, fn)
+
+def action_raw_animation(action: Action, data_path: str, expected_num: int, def_value: KeyFrameValue, action_index: ActionIndex = None) -> KeyFramePoints:
     if not def_value:
         def_value = [0] * expected_num
     
     fcurves = [DummyFCurve(i, def_value[i]) for i in range(expected_num)]
 
     not_dummy = False
-    for fcu in action.fcurves:
-        if fcu.data_path == data_path:
-            not_dummy = True
-            fcurves[fcu.array_index] = fcu
+    path_fcurves = action_index.get(data_path) if action_index else (fcu for fcu in action.fcurves if fcu.data_path == data_path)
+    for fcu in path_fcurves:
+        not_dummy = True
+        fcurves[fcu.array_index] = fcu
 
     if not not_dummy:
         return None
     
-    return fcurves_animation(fcurves, expected_num, def_value, fn)
+    return fcurves_raw_animation(fcurves, expected_num, def_value)
 
 def extract_anim_float(action: Action, data_path: str, fn: KeyFrameValueTransform = lambda v: v) -> KeyFramePoints:
     return action_animation(action, data_path, 1, None, fn)
 
-def extract_anim_vec2(action: Action, data_path: str, def_value, fn: KeyFrameValueTransform = lambda v: v) -> KeyFramePoints:
-    return action_animation(action, data_path, 2, def_value, fn)
+def extract_anim_vec2(action: Action, data_path: str, def_value, fn: KeyFrameValueTransform = lambda v: v, action_index: ActionIndex = None) -> KeyFramePoints:
+    return action_animation(action, data_path, 2, def_value, fn, action_index)
 
-def extract_anim_vec3(action: Action, data_path: str, def_value, fn: KeyFrameValueTransform = lambda v: v) -> KeyFramePoints:
-    return action_animation(action, data_path, 3, def_value, fn)
+def extract_anim_vec3(action: Action, data_path: str, def_value, fn: KeyFrameValueTransform = lambda v: v, action_index: ActionIndex = None) -> KeyFramePoints:
+    return action_animation(action, data_path, 3, def_value, fn, action_index)
 
-def extract_anim_vec4(action: Action, data_path: str, def_value, fn: KeyFrameValueTransform = lambda v: v) -> KeyFramePoints:
-    return action_animation(action, data_path, 4, def_value, fn)
+def extract_anim_vec4(action: Action, data_path: str, def_value, fn: KeyFrameValueTransform = lambda v: v, action_index: ActionIndex = None) -> KeyFramePoints:
+    return action_animation(action, data_path, 4, def_value, fn, action_index)
 
 def euler_to_quat_anim(rot_anim):
     a = []
@@ -182,7 +211,7 @@ class AllowedAnimationsEnum(int, Enum):
     ROTATION    = 1 << 2
     ALL         = 0xffffffff
 
-def extract_transform_anim(parent: pyedm.Node, action, arg, mat, bmat, name, allowed_anims=AllowedAnimationsEnum.ALL, data_path_enum=Data_Path_Enum):
+def extract_transform_anim(parent: pyedm.Node, action, arg, mat, bmat, name, allowed_anims=AllowedAnimationsEnum.ALL, data_path_enum=Data_Path_Enum, action_index: ActionIndex = None):
     bmat_inv = bmat.inverted()
     bloc, brot, bsca = bmat.decompose()
     euler_brot = brot.to_euler()
@@ -190,25 +219,25 @@ def extract_transform_anim(parent: pyedm.Node, action, arg, mat, bmat, name, all
     al = ar = asc = None
 
     if allowed_anims & AllowedAnimationsEnum.LOCATION:
-        loc_keys = extract_anim_vec3(action, data_path_enum.LOCATION, bloc)
+        loc_keys = extract_anim_vec3(action, data_path_enum.LOCATION, bloc, action_index=action_index)
         if loc_keys != None:
             al = pyedm.AnimationNode('al_' + name)
             al.setPositionAnimation([[arg, loc_keys]])
     
     if allowed_anims & AllowedAnimationsEnum.SCALE:
-        scale_keys = extract_anim_vec3(action, data_path_enum.SCALE, bsca)
+        scale_keys = extract_anim_vec3(action, data_path_enum.SCALE, bsca, action_index=action_index)
         if scale_keys:
             asc = pyedm.AnimationNode('as_' + name)
             asc.setScaleAnimation([[arg, scale_keys]])
 
     if allowed_anims & AllowedAnimationsEnum.ROTATION:
-        rot_keys = extract_anim_vec3(action, data_path_enum.ROTATION_EULER, euler_brot)
+        rot_keys = extract_anim_vec3(action, data_path_enum.ROTATION_EULER, euler_brot, action_index=action_index)
         if rot_keys != None:
             anim = euler_to_quat_anim([arg, rot_keys])
             ar = pyedm.AnimationNode('ar_' + name)
             ar.setRotationAnimation([anim])
         else:
-            rot_keys = extract_anim_vec4(action, data_path_enum.ROTATION_QUAT, brot)
+            rot_keys = extract_anim_vec4(action, data_path_enum.ROTATION_QUAT, brot, action_index=action_index)
             if rot_keys:
                 ar = pyedm.AnimationNode('ar_' + name)
                 ar.setRotationAnimation([[arg, rot_keys]])
@@ -1,39 +1,160 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+
 import bpy
 
-from bpy.types import Operator, PropertyGroup
+from bpy.app.handlers import persistent
+from bpy.types import ID, Action, Collection, Material, NodeTree, Object, Operator, PropertyGroup, Scene
 from bpy.props import IntProperty, PointerProperty
 
 import utils
 
-def mute_action(action, mute):
-    for g in action.groups:
-        g.mute = mute
+## Animated datablocks of scene by argument number, so argument operators don't walk all objects
+## and f-curves of scene. Actions of objects and of their materials and material node trees are indexed.
+## Index is built on first use and dropped by depsgraph handler when animation layout of scene changes:
+## actions are assigned, renamed or get new f-curves, objects are added or removed.
+## Mute state changes don't drop it.
 
-    for fcu in action.fcurves:
-        fcu.mute = mute
+@dataclass
+class ArgAction:
+    action: Action
+    arg: int
+    fcurves_count: int
+    # Objects animated by action directly or through their materials.
+    objects: List[Object] = field(default_factory=list)
 
-def mute_anim(objects, mute):
-    for o in objects:
-        if not o.visible_get():
-            continue
+def get_id_action(id: ID) -> Action:
+    ad = id.animation_data
+    return ad.action if ad else None
 
-        ad = o.animation_data
-        if not ad or not ad.action:
+def get_material_ids(o: Object) -> List[ID]:
+    ids: List[ID] = []
+    for slot in o.material_slots:
+        material: Material = slot.material
+        if not material:
             continue
+        ids.append(material)
+        if material.node_tree:
+            ids.append(material.node_tree)
+    return ids
+
+class ArgIndex:
+    def __init__(self, scene: Scene) -> None:
+        self.scene_pointer: int = scene.as_pointer()
+        self.objects_count: int = len(scene.objects)
+        self.actions: Dict[Action, ArgAction] = {}
+        self.by_arg: Dict[int, List[ArgAction]] = {}
+        # Action of every indexed datablock, None for datablocks without action.
+        self.owners: Dict[ID, Action] = {}
+        self.materials: Dict[int, Set[Material]] = {}
+        # Scene is evaluated by 'EDM_PT_reset' and nothing changed since.
+        self.is_reset: bool = False
+
+        for o in scene.objects:
+            self.add(o, o)
+            for id in get_material_ids(o):
+                self.add(id, o)
+
+    def add(self, id: ID, o: Object) -> None:
+        action: Action = get_id_action(id)
+        self.owners[id] = action
+        if not action:
+            return
+
+        entry: ArgAction = self.actions.get(action)
+        if not entry:
+            entry = ArgAction(action, utils.extract_arg_number(action.name), len(action.fcurves))
+            self.actions[action] = entry
+            self.by_arg.setdefault(entry.arg, []).append(entry)
+        if o not in entry.objects:
+            entry.objects.append(o)
+        if isinstance(id, Material):
+            self.materials.setdefault(entry.arg, set()).add(id)
+
+    def is_valid_for(self, scene: Scene) -> bool:
+        return self.scene_pointer == scene.as_pointer()
+
+    # Returns False if update changes animation layout of scene.
+    def check_update(self, scene: Scene, id: ID) -> bool:
+        if isinstance(id, Action):
+            entry: ArgAction = self.actions.get(id)
+            return not entry or (entry.arg == utils.extract_arg_number(id.name) and entry.fcurves_count == len(id.fcurves))
+        if isinstance(id, (Scene, Collection)):
+            return not self.is_valid_for(scene) or self.objects_count == len(scene.objects)
+        if isinstance(id, Object) and id not in self.owners:
+            # object isn't in scene or it's new
+            return get_id_action(id) is None and not get_material_ids(id)
+        if isinstance(id, (Object, Material, NodeTree)):
+            return self.owners.get(id) == get_id_action(id)
+        return True
+
+arg_index: ArgIndex = None
+
+def get_arg_index(scene: Scene) -> ArgIndex:
+    global arg_index
+    if not arg_index or not arg_index.is_valid_for(scene):
+        arg_index = ArgIndex(scene)
+    return arg_index
+
+def reset_arg_index() -> None:
+    global arg_index
+    arg_index = None
+
+@persistent
+def on_depsgraph_update(scene, depsgraph) -> None:
+    if not arg_index:
+        return
+    arg_index.is_reset = False
+    try:
+        for update in depsgraph.updates:
+            if not arg_index.check_update(scene, update.id.original):
+                reset_arg_index()
+                return
+    except ReferenceError:
+        # indexed datablock is removed
+        reset_arg_index()
 
-        for g in ad.action.groups:
+@persistent
+def on_data_reload(*args) -> None:
+    reset_arg_index()
+
+HANDLERS = (
+    (bpy.app.handlers.depsgraph_update_post, on_depsgraph_update),
+    (bpy.app.handlers.load_post, on_data_reload),
+    (bpy.app.handlers.undo_post, on_data_reload),
+    (bpy.app.handlers.redo_post, on_data_reload),
+)
+
+def register_arg_index_handlers() -> None:
+    for handlers, fn in HANDLERS:
+        if fn not in handlers:
+            handlers.append(fn)
+
+def unregister_arg_index_handlers() -> None:
+    for handlers, fn in HANDLERS:
+        if fn in handlers:
+            handlers.remove(fn)
+    reset_arg_index()
+
+# Mute flags are written only if they differ, every write tags action for update.
+def mute_action(action, mute):
+    for g in action.groups:
+        if g.mute != mute:
             g.mute = mute
 
-        for fcu in ad.action.fcurves:
+    for fcu in action.fcurves:
+        if fcu.mute != mute:
             fcu.mute = mute
 
-def query_objects(objects, filter):
-    for o in objects:
-        if not o.visible_get():
-            continue
-
-        filter(o)
+def is_any_visible(objects: List[Object]) -> bool:
+    return any(o.visible_get() for o in objects)
 
+# Mutes actions of visible objects, only animated objects are checked.
+def mute_anim(scene: Scene, mute):
+    index: ArgIndex = get_arg_index(scene)
+    for entry in index.actions.values():
+        if is_any_visible(entry.objects):
+            mute_action(entry.action, mute)
 
 class EDMArgPropsGroup(PropertyGroup):
     bl_idname = "edm.EDMArgPropsGroup"
@@ -56,16 +177,11 @@ class EDM_PT_set_argument(Operator):
         
         props = get_arg_panel_props(context.scene)
         arg = props.CURRENT_ARG
-        for o in context.scene.objects:
-            ad = o.animation_data
-            if not ad or not ad.action:
-                continue
-
-            a = utils.extract_arg_number(ad.action.name)
-            if a == arg:
-                mute_action(ad.action, False)
-            else:
-                mute_action(ad.action, True)
+        index: ArgIndex = get_arg_index(context.scene)
+        # All indexed actions are set, mute flags can be changed by hand in between.
+        # Only differing flags are written, so actions already in place cost reads only.
+        for entry in index.actions.values():
+            mute_action(entry.action, entry.arg != arg)
         
         return {'FINISHED'}
 
@@ -79,7 +195,7 @@ class EDM_PT_mute_animations(Operator):
         if not context.scene:
             return {'FINISHED'}
         
-        mute_anim(context.scene.objects, True)
+        mute_anim(context.scene, True)
 
         return {'FINISHED'}
 
@@ -93,7 +209,7 @@ class EDM_PT_unmute_animations(Operator):
         if not context.scene:
             return {'FINISHED'}
         
-        mute_anim(context.scene.objects, False)
+        mute_anim(context.scene, False)
 
         return {'FINISHED'}
 
@@ -106,36 +222,42 @@ class EDM_PT_reset(Operator):
         if not context.scene:
             return {'FINISHED'}
         
+        index: ArgIndex = get_arg_index(context.scene)
         muted_groups = []
         muted_fcurves = []
-        def collect_muted(o):
-            nonlocal muted_groups, muted_fcurves
-
-            ad = o.animation_data
-            if not ad or not ad.action:
-                return
+        for entry in index.actions.values():
+            if not is_any_visible(entry.objects):
+                continue
 
-            for g in ad.action.groups:
+            for g in entry.action.groups:
                 if g.mute:
                     muted_groups.append(g)
                     g.mute = False
 
-            for fcu in ad.action.fcurves:
+            for fcu in entry.action.fcurves:
                 if fcu.mute:
                     muted_fcurves.append(fcu)
                     fcu.mute = False
 
-        query_objects(context.scene.objects, collect_muted)
-
-        context.scene.frame_set(100)
-        context.scene.frame_start = 0
-        context.scene.frame_end = 200
+        # Scene isn't evaluated again if it's evaluated at frame 100 with all animations on and nothing changed since.
+        # Frame range is written only if it differs, as every write is a scene update.
+        scene: Scene = context.scene
+        is_muted: bool = bool(muted_groups or muted_fcurves)
+        if is_muted or not index.is_reset or scene.frame_current != 100:
+            scene.frame_set(100)
+        if scene.frame_start != 0:
+            scene.frame_start = 0
+        if scene.frame_end != 200:
+            scene.frame_end = 200
 
         for fcu in muted_fcurves:
             fcu.mute = True
 
         for g in muted_groups:
             g.mute = True
+
+        # Restored mute state changes evaluated scene, so it's evaluated again next time.
+        index.is_reset = not is_muted
         
         return {'FINISHED'}
 
@@ -0,0 +1,122 @@
+import hashlib
+from typing import List, Tuple
+
+import bpy
+from bpy.types import PropertyGroup, Object, Collection, Panel
+from bpy.props import IntProperty, FloatProperty
+
+from mesh_storage import MeshStorage
+from export_cache import export_cache, get_object_deps
+
+## Lod chain generated at export time from source geometry of object.
+## Level 0 is source mesh, every next level keeps 'RATIO' of triangles of previous one.
+
+class EDMAutoLodPropsGroup(PropertyGroup):
+    bl_idname = "edm.EDMAutoLodPropsGroup"
+
+    LEVELS : IntProperty(
+        name = "Auto lod levels",
+        description = "Number of generated lod levels. 0 disables generation",
+        default = 0,
+        min = 0,
+        max = 8,
+    )
+
+    RATIO : FloatProperty(
+        name = "Triangles ratio",
+        description = "Part of triangles of previous level kept in next level",
+        default = 0.5,
+        min = 0.05,
+        max = 0.95,
+    )
+
+    DISTANCE : FloatProperty(
+        name = "Distance",
+        description = "Switch distance of source mesh, every next level switches at doubled distance",
+        default = 100.0,
+        min = 0.0,
+    )
+
+    def get_distances(self) -> List[float]:
+        return [self.DISTANCE * 2.0 ** i for i in range(self.LEVELS + 1)]
+
+def get_auto_lod_props(o) -> EDMAutoLodPropsGroup:
+    return o.AutoLodProps
+
+# Settings of object win, otherwise first collection of object with enabled generation is used.
+def get_object_auto_lod_props(obj: Object) -> EDMAutoLodPropsGroup:
+    props = get_auto_lod_props(obj)
+    if props.LEVELS > 0:
+        return props
+    for collection in obj.users_collection:
+        props = get_auto_lod_props(collection)
+        if props.LEVELS > 0:
+            return props
+    return None
+
+def get_storages_hash(storages: List[MeshStorage]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for storage in storages:
+        h.update(int(storage.material_index).to_bytes(4, "little"))
+        for array in (storage.positions, storage.normals, storage.indices, storage.damage_arguments):
+            h.update(array.tobytes())
+        for name in sorted(storage.uv.keys()):
+            h.update(storage.uv[name].tobytes())
+        if storage.armature:
+            h.update(storage.bone_indices.tobytes())
+            h.update(storage.bone_weights.tobytes())
+            # bone ids contain armature name
+            h.update(repr(sorted(storage.bones.items())).encode())
+    return h.hexdigest()
+
+def build_lod_chain(storages: List[MeshStorage], levels: int, ratio: float) -> List[List[MeshStorage]]:
+    # decimation is imported on first export, register of add-on loads only props and panels of this module
+    from mesh_decimation import decimate
+    result: List[List[MeshStorage]] = []
+    for _ in range(levels):
+        storages = [decimate(x, ratio) for x in storages]
+        result.append(storages)
+    return result
+
+# Returns storages of generated levels, source level is not included.
+# Chain is cached by hash of source geometry, so the same mesh shared by objects is decimated once.
+def build_lod_chain_cached(obj: Object, storages: List[MeshStorage], props: EDMAutoLodPropsGroup) -> List[List[MeshStorage]]:
+    levels: int = props.LEVELS
+    ratio: float = props.RATIO
+    key: Tuple = ('LOD', get_storages_hash(storages), levels, round(ratio, 4))
+    pointers = (obj.as_pointer(), obj.data.as_pointer())
+    def build() -> List[List[MeshStorage]]:
+        chain = build_lod_chain(storages, levels, ratio)
+        for level in chain:
+            for storage in level:
+                storage.release()
+        return chain
+
+    return export_cache.get(key, get_object_deps(obj), pointers, build)
+
+def draw_auto_lod_props(layout, props: EDMAutoLodPropsGroup) -> None:
+    row = layout.row()
+    row.prop(props, "LEVELS")
+    if props.LEVELS > 0:
+        row = layout.row()
+        row.prop(props, "RATIO")
+        row = layout.row()
+        row.prop(props, "DISTANCE")
+
+class EDM_PT_collection_auto_lod(Panel):
+    bl_label = "EDM Auto Lod"
+    bl_idname = "COLLECTION_PT_edm_auto_lod"
+    bl_space_type = 'PROPERTIES'
+    bl_region_type = 'WINDOW'
+    bl_context = 'collection'
+
+    @classmethod
+    def poll(cls, context):
+        return context.collection is not None
+
+    def draw(self, context):
+        collection: Collection = context.collection
+        draw_auto_lod_props(self.layout, get_auto_lod_props(collection))
+
+def get_auto_lod_classes():
+    return [EDMAutoLodPropsGroup, EDM_PT_collection_auto_lod]
@@ -0,0 +1,136 @@
+import importlib
+import sys
+import time
+from types import SimpleNamespace
+from typing import Callable, List, Tuple
+
+from bpy.types import Operator
+
+from pyedm_platform_selector import pyedm
+from logger import log
+from utils import EDMPath
+from materials import build_material_descriptions, load_pickled_description, get_matdesc_file_path
+from matdesc_format import MatDescFile
+from enums import NodeGroupTypeEnum, get_node_group_types
+from material_enum_index import read_enum_index, build_enum_index
+import custom_shader_group as custom_sg
+
+## Timings of add-on startup steps and object tree building.
+## Are run by dev mode operators 'edm.benchmark_startup' and 'edm.benchmark_object_tree'.
+
+def measure(fn: Callable[[], object], repeat: int) -> float:
+    best: float = float('inf')
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def unpickle_enum_items() -> None:
+    material_descs = build_material_descriptions()
+    custom_sg.get_enum_names_map(custom_sg.get_enum_names(material_descs))
+    custom_sg.get_enum_items(material_descs)
+
+def unpickle_descriptions() -> None:
+    for name in get_node_group_types():
+        load_pickled_description(name)
+
+def load_descriptions() -> None:
+    descs_file = MatDescFile(get_matdesc_file_path())
+    for name in descs_file:
+        descs_file[name]
+    descs_file.close()
+
+def load_default_description() -> None:
+    descs_file = MatDescFile(get_matdesc_file_path())
+    descs_file[NodeGroupTypeEnum.DEFAULT]
+    descs_file.close()
+
+# Returns (step name, best time in seconds) of every startup step.
+def benchmark_startup(repeat: int = 5) -> List[Tuple[str, float]]:
+    result: List[Tuple[str, float]] = [
+        ('enum items from index', measure(read_enum_index, repeat)),
+        ('enum items from descriptions', measure(unpickle_enum_items, repeat)),
+        ('enum index from loaded descriptions', measure(build_enum_index, repeat)),
+        ('all descriptions from pickles', measure(unpickle_descriptions, repeat)),
+        ('all descriptions from description file', measure(load_descriptions, repeat)),
+        ('default material description from description file', measure(load_default_description, repeat)),
+    ]
+
+    # Exporter modules are imported lazily, their import is measured only if export didn't run yet.
+    walker_name: str = EDMPath.plugin_name + '.collection_walker'
+    if walker_name not in sys.modules:
+        start: float = time.perf_counter()
+        importlib.import_module(walker_name)
+        result.append(('exporter import', time.perf_counter() - start))
+    return result
+
+## Synthetic scene for object tree benchmark: few parents with many children, parents of every pair
+## are lod 0 and lod 1 of one lod group. Only attributes used by tree building are set.
+def make_synthetic_context(nObjects: int, nParents: int = 8) -> SimpleNamespace:
+    def make_collection(name: str, children: List[SimpleNamespace]) -> SimpleNamespace:
+        return SimpleNamespace(name=name, children=children)
+
+    lod_collections: List[SimpleNamespace] = []
+    groups: List[SimpleNamespace] = []
+    for i in range(0, nParents, 2):
+        lods = [make_collection(f'Group{i}_LOD_{level}_{100 * (level + 1)}', []) for level in range(2)]
+        lod_collections.extend(lods)
+        groups.append(make_collection(f'Group{i}', lods))
+    scene_collection = make_collection('Scene Collection', groups)
+
+    objects: List[SimpleNamespace] = []
+    for i in range(nObjects):
+        parent = objects[i % nParents] if i >= nParents else None
+        collection = lod_collections[i % nParents] if i >= nParents else lod_collections[i]
+        objects.append(SimpleNamespace(name=f'Object{i}', parent=parent, users_collection=[collection], animation_data=None))
+
+    def make_layer_collection(collection: SimpleNamespace) -> SimpleNamespace:
+        return SimpleNamespace(collection=collection, visible_get=lambda: True, children=[make_layer_collection(x) for x in collection.children])
+
+    scene = SimpleNamespace(objects=objects, collection=scene_collection)
+    return SimpleNamespace(scene=scene, view_layer=SimpleNamespace(layer_collection=make_layer_collection(scene_collection)))
+
+# Returns (number of objects, time of tree building in seconds) for every size.
+def benchmark_object_tree(sizes: Tuple[int, ...] = (1000, 10000, 100000)) -> List[Tuple[int, float]]:
+    # exporter modules aren't imported on add-on startup
+    from object_node_tree import ObjectNodeTree
+
+    result: List[Tuple[int, float]] = []
+    for nObjects in sizes:
+        context = make_synthetic_context(nObjects)
+        def build() -> None:
+            tree = ObjectNodeTree(context)
+            tree.build()
+            tree.destroy()
+        result.append((nObjects, measure(build, 1)))
+    return result
+
+class EDM_OT_benchmark_startup(Operator):
+    bl_idname = "edm.benchmark_startup"
+    bl_label = "EDM startup benchmark"
+    bl_description = "Measure time of add-on startup steps"
+
+    def execute(self, context):
+        lines: List[str] = [f'{name}: {seconds * 1000.0:.2f} ms' for name, seconds in benchmark_startup()]
+        for line in lines:
+            log.info(line)
+        self.report({'INFO'}, '; '.join(lines))
+        return {'FINISHED'}
+
+class EDM_OT_benchmark_object_tree(Operator):
+    bl_idname = "edm.benchmark_object_tree"
+    bl_label = "EDM object tree benchmark"
+    bl_description = "Measure time of object tree building of synthetic scenes from 1k to 100k objects"
+
+    def execute(self, context):
+        lines: List[str] = [f'{nObjects} objects: {seconds * 1000.0:.1f} ms' for nObjects, seconds in benchmark_object_tree()]
+        for line in lines:
+            log.info(line)
+        self.report({'INFO'}, '; '.join(lines))
+        return {'FINISHED'}
+
+def get_benchmark_classes():
+    if pyedm.dev_mode():
+        return [EDM_OT_benchmark_startup, EDM_OT_benchmark_object_tree]
+    return []
@@ -318,9 +318,12 @@ def get_shadow_caster_value(shadow_caster_value) -> int:
         return 0
 
 
+def get_render_node_name(object: Object, mesh_storage: MeshStorage) -> str:
+    return mesh_storage.name or object.name
+
 def make_def_edm_mat_blocks(object: Object, material_wrap: DefMaterialWrap, mesh_storage: MeshStorage) -> pyedm.PBRNode:
     edm_props = get_edm_props(object)
-    edm_render_node = pyedm.PBRNode(object.name, material_wrap.material.name)
+    edm_render_node = pyedm.PBRNode(get_render_node_name(object, mesh_storage), material_wrap.material.name)
     edm_render_node.setIndices(mesh_storage.indices)
 
     blocks = create_blocks(mesh_storage, material_wrap, edm_props)
@@ -355,7 +358,7 @@ def make_def_edm_mat_blocks(object: Object, material_wrap: DefMaterialWrap, mesh
     return edm_render_node
 
 def make_deck_edm_mat_blocks(object: Object, material_wrap: DeckMaterialWrap, mesh_storage: MeshStorage, edm_props: EDMPropsGroup) -> pyedm.DeckNode:
-    edm_render_node = pyedm.DeckNode(object.name, material_wrap.material.name)
+    edm_render_node = pyedm.DeckNode(get_render_node_name(object, mesh_storage), material_wrap.material.name)
     edm_render_node.setPositions(mesh_storage.positions)
     edm_render_node.setNormals(mesh_storage.normals)
     edm_render_node.setIndices(mesh_storage.indices)
@@ -412,7 +415,7 @@ def make_deck_edm_mat_blocks(object: Object, material_wrap: DeckMaterialWrap, me
 
 def make_glass_edm_mat_blocks(object: Object, material_wrap: DefMaterialWrap, mesh_storage: MeshStorage) -> pyedm.PBRNode:
     edm_props = get_edm_props(object)
-    edm_render_node = pyedm.PBRNode(object.name, material_wrap.material.name)
+    edm_render_node = pyedm.PBRNode(get_render_node_name(object, mesh_storage), material_wrap.material.name)
     edm_render_node.setIndices(mesh_storage.indices)
 
     blocks = create_blocks(mesh_storage, material_wrap, edm_props)
@@ -433,7 +436,7 @@ def make_glass_edm_mat_blocks(object: Object, material_wrap: DefMaterialWrap, me
     return edm_render_node
 
 def make_mirror_edm_mat_blocks(object: Object, material_wrap: MirrorMaterialWrap, mesh_storage: MeshStorage) -> pyedm.MirrorNode:
-    edm_render_node = pyedm.MirrorNode(object.name, material_wrap.material.name)
+    edm_render_node = pyedm.MirrorNode(get_render_node_name(object, mesh_storage), material_wrap.material.name)
     edm_render_node.setPositions(mesh_storage.positions)
     edm_render_node.setNormals(mesh_storage.normals)
     edm_render_node.setIndices(mesh_storage.indices)
@@ -0,0 +1,95 @@
+from typing import List, Set
+
+import numpy as np
+from bpy.types import Object
+
+from logger import log
+from mesh_storage import MeshStorage
+
+## Splits skin storages referencing more bones than runtime bone palette holds.
+## Triangles with the same set of bones are grouped, groups are packed first fit by decreasing
+## number of bones to palettes of at most 'palette_size' bones. Every palette is separate storage
+## with its own bone numbering, vertices used by several palettes are duplicated.
+
+# Sets of bones of every triangle, rows are sorted and padded by -1.
+def get_triangle_bone_sets(storage: MeshStorage) -> np.ndarray:
+    triangles = storage.indices.reshape(-1, 3).astype(np.int64)
+    bones = storage.bone_indices.reshape(-1, 4).astype(np.int64)
+    weights = storage.bone_weights.reshape(-1, 4)
+    sets = np.where(weights > 0.0, bones, -1)[triangles].reshape(len(triangles), -1)
+    sets.sort(axis=1)
+    # duplicates inside row are replaced by padding and moved to the start
+    sets[:, 1:][sets[:, 1:] == sets[:, :-1]] = -1
+    sets.sort(axis=1)
+    return sets
+
+# Returns palette of every triangle.
+def pack_palettes(sets: np.ndarray, palette_size: int) -> np.ndarray:
+    unique_sets, group_of_triangle = np.unique(sets, axis=0, return_inverse=True)
+    group_of_triangle = group_of_triangle.reshape(-1)
+    group_bones: List[Set[int]] = [set(x for x in row if x >= 0) for row in unique_sets.tolist()]
+
+    palettes: List[Set[int]] = []
+    palette_of_group = np.empty(len(group_bones), dtype=np.int64)
+    for group in sorted(range(len(group_bones)), key=lambda x: -len(group_bones[x])):
+        bones = group_bones[group]
+        for i, palette in enumerate(palettes):
+            if len(palette | bones) <= palette_size:
+                palette |= bones
+                palette_of_group[group] = i
+                break
+        else:
+            palette_of_group[group] = len(palettes)
+            palettes.append(set(bones))
+    return palette_of_group[group_of_triangle]
+
+# Renumbers bones of storage to bones it uses.
+def remap_bones(storage: MeshStorage, bone_names: List[str]) -> None:
+    bones = storage.bone_indices.astype(np.int64)
+    used = storage.bone_weights > 0.0
+    ids = np.unique(bones[used])
+    local = np.zeros(len(bone_names), dtype=np.uint32)
+    local[ids] = np.arange(len(ids), dtype=np.uint32)
+    storage.bone_indices = np.where(used, local[bones], 0).astype(np.uint32)
+    storage.bones = {bone_names[x]: i for i, x in enumerate(ids.tolist())}
+    storage.cur_bone_index = len(ids)
+
+def split_bone_palettes(storage: MeshStorage, palette_size: int) -> List[MeshStorage]:
+    sets = get_triangle_bone_sets(storage)
+    palette_of_triangle = pack_palettes(sets, palette_size)
+    triangles = storage.indices.reshape(-1, 3)
+
+    # names of storage bones by their index
+    bone_names: List[str] = [None] * len(storage.bones)
+    for name, i in storage.bones.items():
+        bone_names[i] = name
+
+    result: List[MeshStorage] = []
+    for palette in range(int(palette_of_triangle.max()) + 1):
+        part = storage.extract(triangles[palette_of_triangle == palette].reshape(-1))
+        remap_bones(part, bone_names)
+        result.append(part)
+    return result
+
+## Returns storages of object with every skin storage split to bone palettes, source storages if splitting is off.
+def get_bone_palettes(obj: Object, storages: List[MeshStorage], palette_size: int) -> List[MeshStorage]:
+    if palette_size <= 0:
+        return storages
+
+    result: List[MeshStorage] = []
+    for storage in storages:
+        if not storage.armature or len(storage.bones) <= palette_size:
+            result.append(storage)
+            continue
+
+        palettes = split_bone_palettes(storage, palette_size)
+        nVerts: int = sum(x.nVerts for x in palettes)
+        sizes: List[int] = [len(x.bones) for x in palettes]
+        log.info(f"{obj.name}: skin with {len(storage.bones)} bones is split to {len(palettes)} palettes of {sizes} bones, "
+                 f"{nVerts - storage.nVerts} vertices are duplicated ({(nVerts - storage.nVerts) / max(storage.nVerts, 1):.1%}).")
+        if max(sizes) > palette_size:
+            log.warning(f"{obj.name}: some triangles are influenced by more than {palette_size} bones, their palettes are bigger.")
+        for i, part in enumerate(palettes):
+            part.name = f'{storage.name or obj.name}_{i}'
+        result.extend(palettes)
+    return result
@@ -3,7 +3,10 @@ import io
 import os.path
 import pstats
 import sys
+import time
 import traceback
+from dataclasses import dataclass
+from typing import Dict, List
 
 import bpy
 from mathutils import Matrix
@@ -16,23 +19,56 @@ from export_armature import export_armature, build_bone_id
 from block_builder import BlockEnum
 from edm_exception import EdmException
 from enums import NodeGroupTypeEnum, ObjectTypeEnum
-from export_lights import export_light, is_light
+from export_lights import LightData, LightProps, export_light, is_light, light_cache
 from export_connectors import export_connector, is_connector
-from export_fake_lights import is_fake_light
+from export_fake_lights import is_fake_light, get_vertices_positions
 from export_segments import create_segments_node, is_segment
-from logger import LogCtx, log
+from logger import LogCtx, LogLevel, BufferedSink, ConsoleSink, log
 from material_cache import MaterialCache
 from materials import get_material, Materials
-from math_tools import ROOT_TRANSFORM_MATRIX, get_aa_bb, IDENTITY_MATRIX
-from mesh_builder import buld_mesh
-from mesh_storage import get_armature_from_modifiers
+from math_tools import ROOT_TRANSFORM_MATRIX, get_aa_bb, IDENTITY_MATRIX, AaBb, merge_aa_bb, transform_aa_bb, get_positions_aa_bb
+from mesh_builder import build_mesh_cached
+from auto_lod import build_lod_chain_cached, get_object_auto_lod_props
+from mesh_clusters import get_mesh_clusters
+from bone_palettes import get_bone_palettes
+from light_bounds import LightBounds, LightGrid, get_light_bounds, build_light_grid, write_light_grid
+from shell_builder import ShellStorage, build_shell_cached
+from mesh_storage import MeshStorage, get_armature_from_modifiers
 from object_node import (DummyNode, LodLeaf, LodRoot, ObjectNodeCustomType, SceneRootNode)
 from object_node_tree import ObjectNodeTree
 from visibility_animation import extract_visibility_animation
 from dev_mode import get_dev_mode_props
 from arg_panel import get_arg_panel_props
+from export_scope import ExportScope
+import edm_reader
+from export_cache import export_cache
 import utils
 
+# Settings of single export run. Filled from addon preferences and scene properties.
+@dataclass
+class ExportOptions:
+    # Stable order of objects and bones, model isn't rewritten if content is the same.
+    # Only objects and bones need sorting: render nodes are added in order of objects, render nodes of object
+    # follow its material slots, clusters, bone palettes and light chunks, which are computed from mesh data only.
+    # Materials are written by name in render nodes, there is no table of materials which depends on scene order.
+    deterministic: bool = False
+    # Subset of objects to export, None exports whole scene.
+    scope: ExportScope = None
+    # Reuse mesh arrays and animation keys of objects which haven't changed since previous export.
+    incremental: bool = True
+    # Triangles of collision shells are written in order of BVH leaves.
+    shell_bvh: bool = False
+    # Influence bounds of lights and their grid are written to '<model>.lights.json'. pyedm can't store them in model.
+    light_grid: bool = False
+    # Max number of bones of skin render node, 0 means no limit.
+    bone_palette_size: int = 0
+    # Name of 'logger.LogLevel', messages below it aren't formatted.
+    log_level: str = 'INFO'
+    # Log is written to this file instead of console if it's set.
+    log_file: str = ''
+    # Exported objects are written to '<model>.objects.csv' instead of log.
+    object_table: bool = False
+
 def is_aa_bb(object: bpy.types.Object) -> bool:
     edm_props = get_edm_props(object)
     if object.type == ObjectTypeEnum.EMPTY and edm_props.SPECIAL_TYPE in ('USER_BOX', 'BOUNDING_BOX', 'LIGHT_BOX'):
@@ -55,13 +91,14 @@ def is_shell(object: bpy.types.Object) -> bool:
 # to build edm file.
 # We have to build wrapper tree as we add lod nodes and visibility info.
 class CollectionWalker:
-    def __init__(self, context: bpy.types.Context, model: pyedm.Model) -> None: 
+    def __init__(self, context: bpy.types.Context, model: pyedm.Model, options: ExportOptions = None) -> None: 
         self.profile = cProfile.Profile()
         self.context: bpy.types.Context = context
         self.model: pyedm.Model = model
+        self.options: ExportOptions = options if options else ExportOptions()
         self.material_cache = MaterialCache()
         self.obj_tree = ObjectNodeTree(context)
-        self.obj_tree.build()
+        self.obj_tree.build(self.options.deterministic, self.options.scope)
 
         # Dict of all bones. Each bone has 'BoneNode' type.
         # Bone have list of children, and every children has reference to parent. 
@@ -70,6 +107,13 @@ class CollectionWalker:
         self.bones = {} 
 
         self.skins = []
+
+        # Box covering render nodes, collision shells and fake lights in model space.
+        self.geometry_aa_bb: AaBb = None
+        self.has_bbox: bool = False
+        # Influence bounds of real lights by light name in model space and grid of lights of model, see 'ExportOptions.light_grid'.
+        self.light_bounds: Dict[str, LightBounds] = {}
+        self.light_grid: LightGrid = None
     
     def destroy(self):
         for key in self.bones:
@@ -86,7 +130,7 @@ class CollectionWalker:
             return None
 
         for o in obj.children:
-            self.enum_object(full_name, o, node, current_armature, skin_box)
+            yield from self.enum_object(full_name, o, node, current_armature, skin_box)
 
     def export_aabb(self, object: bpy.types.Object):
         aa_bb = get_aa_bb(object)
@@ -97,13 +141,48 @@ class CollectionWalker:
             self.model.setUserBox(aa_bb)
         elif edm_props.SPECIAL_TYPE == 'BOUNDING_BOX':
             self.model.setBBox(aa_bb)
+            self.has_bbox = True
         elif edm_props.SPECIAL_TYPE == 'LIGHT_BOX':
             self.model.setLightBox(aa_bb)
         
+    # Box in object space of render node, shell or fake lights is added to model box.
+    def add_geometry_bounds(self, obj: bpy.types.Object, aa_bb: AaBb) -> None:
+        if not aa_bb:
+            return
+        self.geometry_aa_bb = merge_aa_bb(self.geometry_aa_bb, transform_aa_bb(ROOT_TRANSFORM_MATRIX @ obj.matrix_world, aa_bb))
+
+    # Bounds are taken at current frame, animated transforms of light and its parents aren't covered.
+    def add_light_bounds(self, obj: bpy.types.Object, edm_light, light_data: LightData) -> None:
+        props: LightProps = light_data.props
+        self.light_bounds[edm_light.getName()] = get_light_bounds(ROOT_TRANSFORM_MATRIX @ obj.matrix_world, props.max_distance, props.max_cone_angle)
+
     def export_mesh(self, obj: bpy.types.Object, control_node: pyedm.Node, armature: bpy.types.Armature):
-        mesh_storages = buld_mesh(obj, armature)
+        mesh_storages = build_mesh_cached(obj, armature)
+        auto_lod_props = get_object_auto_lod_props(obj)
+        if not auto_lod_props:
+            return self.add_mesh_render_nodes(obj, mesh_storages, control_node)
+
+        # Generated levels are children of lod node, source mesh is the first level.
+        levels = [mesh_storages] + build_lod_chain_cached(obj, mesh_storages, auto_lod_props)
+        edm_lod = control_node.addChild(pyedm.Lod(obj.name + ' Auto Lod', auto_lod_props.get_distances()))
+        nTriangles = 0
+        edm_render_node = None
+        for i, level_storages in enumerate(levels):
+            edm_level = edm_lod.addChild(pyedm.Node(f'{obj.name} Lod {i}'))
+            nLevelTriangles, _, level_render_node = self.add_mesh_render_nodes(obj, level_storages, edm_level)
+            nTriangles += nLevelTriangles
+            edm_render_node = edm_render_node or level_render_node
+            log.info("%s lod %d: %d triangles.", obj.name, i, nLevelTriangles)
+
+        return (nTriangles, control_node, edm_render_node)
+
+    def add_mesh_render_nodes(self, obj: bpy.types.Object, mesh_storages: List[MeshStorage], control_node: pyedm.Node):
+        mesh_storages = get_mesh_clusters(obj, mesh_storages)
+        mesh_storages = get_bone_palettes(obj, mesh_storages, self.options.bone_palette_size)
         nTriangles = 0
         edm_render_node = None
+        # skin render nodes of object share control bone
+        skin_control_node: pyedm.Node = None
 
         edm_props = get_edm_props(obj)
 
@@ -120,19 +199,23 @@ class CollectionWalker:
                 if material_wrap.node_group_type == NodeGroupTypeEnum.DEFAULT:
                     utils.print_parents(obj)
                     edm_render_node = mat_fx.build_blocks(obj, material_wrap, mesh_storage)
+                    self.add_geometry_bounds(obj, mesh_storage.get_aa_bb())
                     if not edm_render_node.hasBlock(BlockEnum.BT_Bone):
                         edm_render_node.setControlNode(control_node)
                         err = self.model.addRenderNode(edm_render_node)
                         if err:
                             log.error(err)
                     else:
-                        edm_bone = pyedm.Bone('Fake Control Bone ' + control_node.getName(), obj.matrix_local)
-                        edm_bone.setInvertedBaseBoneMatrix(IDENTITY_MATRIX)
-                        control_node = control_node.addChild(edm_bone)
-                        edm_render_node.setControlNode(control_node)
+                        if not skin_control_node:
+                            edm_bone = pyedm.Bone('Fake Control Bone ' + control_node.getName(), obj.matrix_local)
+                            edm_bone.setInvertedBaseBoneMatrix(IDENTITY_MATRIX)
+                            skin_control_node = control_node.addChild(edm_bone)
+                            control_node = skin_control_node
+                        edm_render_node.setControlNode(skin_control_node)
                         self.skins.append(edm_render_node)
                 else:
                     edm_render_node = mat_fx.build_blocks(obj, material_wrap, mesh_storage, edm_props)
+                    self.add_geometry_bounds(obj, mesh_storage.get_aa_bb())
                     #edm_render_node.setControlNode(fake_control_node)
                     edm_render_node.setControlNode(control_node)
                     err = self.model.addRenderNode(edm_render_node)
@@ -149,30 +232,34 @@ class CollectionWalker:
         if not material_wrap or not material_wrap.is_valid():
             log.fatal(f"{obj.name} has no material.")
         
+        # Lights are at vertices or at centers of faces, both are inside box of vertices. Size of light sprites isn't added.
+        self.add_geometry_bounds(obj, get_positions_aa_bb(get_vertices_positions(bpy_mesh)))
+
         mat_fx: Materials = get_material(material_wrap.node_group_type)
         if mat_fx:
-            edm_render_node = mat_fx.build_blocks(obj, material_wrap, None)
-            edm_render_node.setControlNode(control_node)
-            err = self.model.addRenderNode(edm_render_node)
-            if err:
-                log.error(err)
+            # Lights can be split to spatial chunks, each one is separate render node.
+            for edm_render_node in mat_fx.build_blocks(obj, material_wrap, None):
+                edm_render_node.setControlNode(control_node)
+                err = self.model.addRenderNode(edm_render_node)
+                if err:
+                    log.error(err)
 
         return (nLights, control_node)
     
     def export_shell(self, obj: bpy.types.Object, control_node: pyedm.Node):
-        mesh_storages = buld_mesh(obj, None)
-        nTriangles = 0
-        for mesh_storage in mesh_storages:
-            nTriangles += mesh_storage.nTriangles
-            
-            edm_shell_node = pyedm.ShellNode(obj.name)
-            edm_shell_node.setIndices(mesh_storage.indices)
-            edm_shell_node.setPositions(mesh_storage.positions)
-            edm_shell_node.setControlNode(control_node)
-            self.model.addShellNode(edm_shell_node)
+        shell_storage: ShellStorage = build_shell_cached(obj, self.options.shell_bvh)
+
+        edm_shell_node = pyedm.ShellNode(obj.name)
+        edm_shell_node.setIndices(shell_storage.indices)
+        edm_shell_node.setPositions(shell_storage.positions)
+        edm_shell_node.setControlNode(control_node)
+        self.model.addShellNode(edm_shell_node)
+        self.add_geometry_bounds(obj, get_positions_aa_bb(shell_storage.positions))
 
-        return (nTriangles, control_node)
+        return (shell_storage.nTriangles, control_node)
 
+    # Generator, yields every exported scene object right after it was processed and before its children,
+    # so walking can be resumed between objects.
     def enum_object(self, parent_object_path: str, obj: ObjectNodeCustomType, edm_parent_node: pyedm.Node, current_armature: bpy.types.Armature, skin_box):
         logger.LOG_CTX.obj = obj
         try:
@@ -188,11 +275,12 @@ class CollectionWalker:
             elif type(obj) is LodLeaf:
                 edm_node = edm_parent_node.addChild(pyedm.Node(obj.name))
             if edm_node:
-                self.enum_children(full_name, obj, edm_node, current_armature)
+                yield from self.enum_children(full_name, obj, edm_node, current_armature)
                 return
 
             if not obj.visible:
-                self.enum_children(full_name, obj, edm_parent_node, current_armature)
+                yield obj
+                yield from self.enum_children(full_name, obj, edm_parent_node, current_armature)
                 return
 
             o: bpy.types.Object = obj.obj
@@ -214,29 +302,33 @@ class CollectionWalker:
                     tn = pyedm.Transform(f'End Of {bn.name}', Matrix.LocRotScale((0, bn.bone.length ,0), None, None))
                     ebn = bn.edm_node.addChild(tn)
                     edm_node = ebn.addChild(edm_node)
-                    log.debug(f'{o.parent_bone} --> {o.name}')
+                    log.debug('%s --> %s', o.parent_bone, o.name)
             
             sb = skin_box
             edm_props = get_edm_props(o)
-            if is_light(o):
-                l = export_light(o, edm_node)
+            if obj.transform_only and o.type != ObjectTypeEnum.ARMATURE and edm_props.SPECIAL_TYPE != 'SKIN_BOX':
+                log.object(full_name, 'transform')
+            elif is_light(o):
+                l, light_data = export_light(o, edm_node)
                 if l:
                     self.model.addLight(l)
-                    log.info(f"{full_name} as {l}")
+                    if self.options.light_grid:
+                        self.add_light_bounds(o, l, light_data)
+                    log.object(full_name, str(l))
             elif is_aa_bb(o):
                 self.export_aabb(o)
-                log.info(f"{full_name} as {o.type} {edm_props.SPECIAL_TYPE}")
+                log.object(full_name, o.type, edm_props.SPECIAL_TYPE)
             elif edm_props.SPECIAL_TYPE == 'SKIN_BOX':
                 sb = get_aa_bb(o)
-                log.info(f"{full_name} as {o.type} {edm_props.SPECIAL_TYPE}")
+                log.object(full_name, o.type, edm_props.SPECIAL_TYPE)
             elif is_connector(o):
                 c = export_connector(o, edm_node)
                 if c:
                     self.model.addConnector(c)
-                    log.info(f"{full_name} as {o.type} {edm_props.SPECIAL_TYPE}")
+                    log.object(full_name, o.type, edm_props.SPECIAL_TYPE)
             elif is_fake_light(o):  
                 nLights, edm_node = self.export_fake_light(o, edm_node)
-                log.info(f"{full_name} as {o.type}. Control node: {edm_node.getName()}. N triangles: {nLights}.")
+                log.object(full_name, o.type, control_node=edm_node.getName(), triangles=nLights)
             elif is_mesh(o):
                 nTriangles, edm_node, edm_render_node = self.export_mesh(o, edm_node, current_armature)
                 if edm_render_node and isinstance(edm_render_node, pyedm.PBRNode):
@@ -244,28 +336,29 @@ class CollectionWalker:
                     if sb and boneBlock:
                         boneBlock.setSkinBox(sb)
                         sb = None
-                log.info(f"{full_name} as {o.type}. Control node: {edm_node.getName()}. N triangles: {nTriangles}.")
+                log.object(full_name, o.type, control_node=edm_node.getName(), triangles=nTriangles)
             elif is_shell(o):
                 if get_armature_from_modifiers(o.modifiers):
                     log.fatal(f"Shell {obj.name} has bones.") # why?
                 nTriangles, edm_node = self.export_shell(o, edm_node)
-                log.info(f"{full_name} as {o.type} {nTriangles}")
+                log.object(full_name, o.type, triangles=nTriangles)
             elif is_segment(o):
                 segments_node = create_segments_node(o, obj.name, edm_node)
                 self.model.addSegmentsNode(segments_node)
             elif o.type == ObjectTypeEnum.ARMATURE:
                 current_armature = o
-                edm_node = export_armature(o, edm_node, self.bones)
-                log.info(f"{full_name} as {o.type}")
+                edm_node = export_armature(o, edm_node, self.bones, self.options.deterministic)
+                log.object(full_name, o.type)
             else:
-                log.info(f"{full_name} as {o.type}")
-            self.enum_children(full_name, obj, edm_node, current_armature, sb)
+                log.object(full_name, o.type)
+            yield obj
+            yield from self.enum_children(full_name, obj, edm_node, current_armature, sb)
 
         except EdmException as e:
             exc_type, exc_value, exc_traceback = sys.exc_info()
             res = ''.join(traceback.format_tb(exc_traceback, limit=1))
             res += ''.join(traceback.format_exception(exc_type, exc_value, exc_traceback, limit=2))
-            log.error(str(e), res)
+            log.error('%s\n%s', e, res)
             
     def build_skin(self):
         for skin in self.skins:
@@ -285,12 +378,26 @@ class CollectionWalker:
             if err:
                 log.error(f"Can't export skin node {skin.getName()}. Reason: {err}")
 
-    def do(self) -> None:
-        self.profile.enable()
+    # Generator, yields every exported scene object. Model is complete when generator is exhausted.
+    def do_iter(self):
         root = pyedm.Transform('', ROOT_TRANSFORM_MATRIX)
         self.model.getRootTransform().addChild(root)
-        self.enum_object('', self.obj_tree.obj_tree, root, None, None)
+        yield from self.enum_object('', self.obj_tree.obj_tree, root, None, None)
         self.build_skin()
+
+        if self.light_bounds:
+            self.light_grid = build_light_grid(self.light_bounds)
+            log.info(f"Light grid: {len(self.light_bounds)} lights in {'x'.join(map(str, self.light_grid.dims))} cells of size {self.light_grid.cell_size:.2f}.")
+
+        # Model without authored bounding box gets box of its geometry at current frame.
+        if not self.has_bbox and self.geometry_aa_bb:
+            self.model.setBBox(self.geometry_aa_bb)
+            log.info(f"Bounding box is computed from geometry: {self.geometry_aa_bb}.")
+
+    def do(self) -> None:
+        self.profile.enable()
+        for _ in self.do_iter():
+            pass
         self.profile.disable()
 
     def log_status(self) -> None:
@@ -300,30 +407,159 @@ class CollectionWalker:
         #ps.print_stats()
         #print(ios.getvalue())
 
-def _write(context: bpy.types.Context, edm_file_path: str) -> bool:
+def get_hash_file_path(edm_file_path: str) -> str:
+    return edm_file_path + '.sha256'
+
+def write_hash_file(edm_file_path: str, content_hash: str) -> None:
+    hash_file_path: str = get_hash_file_path(edm_file_path)
+    try:
+        with open(hash_file_path, 'r') as f:
+            if f.read().strip() == content_hash:
+                return
+    except OSError:
+        pass
+
+    with open(hash_file_path, 'w') as f:
+        f.write(content_hash + '\n')
 
-    logger.LOG_CTX = LogCtx()
+def get_object_table_path(edm_file_path: str) -> str:
+    return edm_file_path + '.objects.csv'
 
-    model = pyedm.Model()
+def get_light_grid_path(edm_file_path: str) -> str:
+    return edm_file_path + '.lights.json'
+
+# Grid of previous export is removed if model has no grid now, so it never describes other content of model.
+def write_light_grid_file(edm_file_path: str, walker: CollectionWalker) -> None:
+    path: str = get_light_grid_path(edm_file_path)
     try:
-        walker = CollectionWalker(context, model)
-        walker.do()
-        walker.log_status()
-
-        if not log.errors:
-            result_str: str = model.save(edm_file_path, 10)
-            if result_str:
-                log.fatal(f"Can't save model {edm_file_path}. Reason: {result_str}")
-    except Exception as e:
-        logger.LOG_CTX = None
-        raise e
-    finally:
-        walker.destroy()
-        del model
-        del walker
-        
+        if walker.light_grid:
+            write_light_grid(path, walker.light_bounds, walker.light_grid)
+        elif os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        log.warning(f"Can't write light grid {path}. Reason: {e}.")
+
+def get_temp_file_path(edm_file_path: str) -> str:
+    return edm_file_path + '.tmp'
+
+# One export run. Can be done at once ('_write') or step by step from modal operator.
+# Has to be destroyed with 'destroy()' in any case.
+class ExportJob:
+    def __init__(self, context: bpy.types.Context, edm_file_path: str, options: ExportOptions = None) -> None:
+        self.edm_file_path: str = edm_file_path
+        self.options: ExportOptions = options if options else ExportOptions()
+        self.walker: CollectionWalker = None
+        self.steps = None
+        self.done: int = 0
+        self.total: int = 0
+        self.finished: bool = False
+
+        logger.LOG_CTX = LogCtx()
+        log.set_level(LogLevel[self.options.log_level])
+        log.set_sink(BufferedSink(file_path=self.options.log_file or None))
+        if self.options.object_table:
+            log.start_object_table()
+        export_cache.enabled = self.options.incremental
+        if not export_cache.enabled:
+            export_cache.clear()
+        export_cache.reset_stats()
+        light_cache.clear()
+        light_cache.reset_stats()
+
+        self.model = pyedm.Model()
+        try:
+            self.walker = CollectionWalker(context, self.model, self.options)
+            self.steps = self.walker.do_iter()
+            self.total = len(self.walker.obj_tree.objects)
+        except Exception as e:
+            self.destroy()
+            raise e
+
+    # Walks objects until 'time_limit' seconds are spent, None means without limit.
+    # Returns True when all objects are processed.
+    def step(self, time_limit: float = None) -> bool:
+        if self.finished:
+            return True
+        deadline: float = time.perf_counter() + time_limit if time_limit is not None else None
+        self.walker.profile.enable()
+        try:
+            for _ in self.steps:
+                self.done += 1
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return False
+            self.finished = True
+            return True
+        finally:
+            self.walker.profile.disable()
+
+    def get_save_path(self) -> str:
+        if self.options.deterministic:
+            return get_temp_file_path(self.edm_file_path)
+        return self.edm_file_path
+
+    # Serializes model by native library. Doesn't touch blender data, so can be called from worker thread.
+    # Returns error string of native library.
+    def save_model(self) -> str:
+        return self.model.save(self.get_save_path(), 10)
+
+    # Processes result of 'save_model'. Returns True if model file was written.
+    def finish_save(self, result_str: str) -> bool:
+        save_path: str = self.get_save_path()
+        if result_str:
+            if save_path != self.edm_file_path and os.path.exists(save_path):
+                os.remove(save_path)
+            log.fatal(f"Can't save model {self.edm_file_path}. Reason: {result_str}")
+
+        ## Hash of content is stored to '<file>.sha256' on every save, so pipeline can skip repack of unchanged models
+        ## and sidecar never describes older content of rewritten model.
+        content_hash: str = edm_reader.content_hash(save_path)
+        write_light_grid_file(self.edm_file_path, self.walker)
+        if not self.options.deterministic:
+            write_hash_file(self.edm_file_path, content_hash)
+            return True
+
+        ## Saved model is compared with target file, target file is replaced only if content has changed.
+        if edm_reader.is_content_identical(save_path, self.edm_file_path):
+            os.remove(save_path)
+            write_hash_file(self.edm_file_path, content_hash)
+            log.info(f"Model {self.edm_file_path} is unchanged ({content_hash}).")
+            return False
+
+        os.replace(save_path, self.edm_file_path)
+        write_hash_file(self.edm_file_path, content_hash)
+        return True
+
+    # Destroys walker and partial model. Nothing is written if model wasn't saved before.
+    def destroy(self) -> None:
+        if self.steps:
+            self.steps.close()
+            self.steps = None
+
+        if self.walker:
+            self.walker.destroy()
+            self.walker = None
+        # cached light properties hold pyedm objects of model
+        light_cache.clear()
+        self.model = None
+
         nAlived = pyedm.get_num_alived_objects()
         if nAlived:
             log.warning(f"{nAlived} objects are still alive.")
-    
-    logger.LOG_CTX = None
\ No newline at end of file
+
+        log.write_object_table(get_object_table_path(self.edm_file_path))
+        log.set_sink(ConsoleSink())
+        log.set_level(LogLevel.DEBUG)
+        logger.LOG_CTX = None
+
+# Returns True if model file was written.
+def _write(context: bpy.types.Context, edm_file_path: str, options: ExportOptions = None) -> bool:
+    job = ExportJob(context, edm_file_path, options)
+    try:
+        job.step()
+        job.walker.log_status()
+
+        if log.errors:
+            return False
+        return job.finish_save(job.save_model())
+    finally:
+        job.destroy()
@@ -5,7 +5,7 @@ from serializer_tools import MatDesc
 from bpy.types import ShaderNode, ShaderNodeCustomGroup, Operator, ShaderNodeGroup
 from custom_sockets import ShadowCasterEnumItems, TransparencyEnumItems, DeckTransparencyEnumItems
 from enums import BpyShaderNode, NodeGroupTypeEnum
-from materials import build_material_descriptions
+from materials import get_material_descriptions
 from objects_custom_props import EDM_PropsEnumValues
 from utils import make_socket_map
 
@@ -141,7 +141,7 @@ class EPSHADER_PT_EnumPanel(bpy.types.Panel):
 
     def __init__(self) -> None:
         super().__init__()
-        self.material_desc: Dict[NodeGroupTypeEnum, MatDesc] = build_material_descriptions()
+        self.material_desc: Dict[NodeGroupTypeEnum, MatDesc] = get_material_descriptions()
         self.prop_names = get_enum_items(self.material_desc)
 
     @classmethod
@@ -197,7 +197,7 @@ class GPSHADER_PT_GroupPanel(bpy.types.Panel):
     
     def __init__(self) -> None:
         super().__init__()
-        self.material_desc: Dict[NodeGroupTypeEnum, MatDesc] = build_material_descriptions()
+        self.material_desc: Dict[NodeGroupTypeEnum, MatDesc] = get_material_descriptions()
         self.prop_names = get_enum_items(self.material_desc)
         self.names: Dict[str, Dict[str, str]] = get_enum_names(self.material_desc)
 
@@ -8,7 +8,7 @@ from serializer_tools import MatDesc
 from custom_shader_group import EdmMatrialShaderNode, EdmDefaultShaderNode, EdmDeckShaderNode, EdmFakeOmniShaderNode, EdmFakeSpotShaderNode
 
 import enums
-from materials import build_material_descriptions
+from materials import get_material_descriptions
 
 def unselect_shading_nodes(context):
     for node in context.space_data.node_tree.nodes:
@@ -46,7 +46,7 @@ class NODE_OT_EDM_Deck_add(Operator):
     
     def __init__(self) -> None:
         super().__init__()
-        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = build_material_descriptions()
+        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = get_material_descriptions()
     
     def execute(self, context: Context) -> typing.Union[typing.Set[int], typing.Set[str]]:
         deck_group: ShaderNodeGroup = context.space_data.node_tree.nodes.new(type = enums.BpyShaderNode.NODE_GROUP)
@@ -73,7 +73,7 @@ class NODE_OT_EDM_DeckNew_add(Operator):
     
     def __init__(self) -> None:
         super().__init__()
-        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = build_material_descriptions()
+        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = get_material_descriptions()
 
     def execute(self, context: Context) -> typing.Union[typing.Set[int], typing.Set[str]]:
         pbr_group: EdmDeckShaderNode = context.space_data.node_tree.nodes.new(type = enums.BpyShaderNode.NODE_GROUP_DECK)
@@ -95,7 +95,7 @@ class NODE_OT_EDM_DefaultNew_add(Operator):
     
     def __init__(self) -> None:
         super().__init__()
-        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = build_material_descriptions()
+        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = get_material_descriptions()
 
     def execute(self, context: Context) -> typing.Union[typing.Set[int], typing.Set[str]]:
         pbr_group: EdmDefaultShaderNode = context.space_data.node_tree.nodes.new(type = enums.BpyShaderNode.NODE_GROUP_DEFAULT)
@@ -117,7 +117,7 @@ class NODE_OT_EDM_Default_add(Operator):
     
     def __init__(self) -> None:
         super().__init__()
-        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = build_material_descriptions()
+        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = get_material_descriptions()
 
     def execute(self, context: Context) -> typing.Union[typing.Set[int], typing.Set[str]]:
         pbr_group: ShaderNodeGroup = context.space_data.node_tree.nodes.new(type = enums.BpyShaderNode.NODE_GROUP)
@@ -144,7 +144,7 @@ class NODE_OT_EDM_Omni_add(Operator):
     
     def __init__(self) -> None:
         super().__init__()
-        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = build_material_descriptions()
+        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = get_material_descriptions()
 
     def execute(self, context: Context) -> typing.Union[typing.Set[int], typing.Set[str]]:
         omni_group: ShaderNodeGroup = context.space_data.node_tree.nodes.new(type = enums.BpyShaderNode.NODE_GROUP)
@@ -171,7 +171,7 @@ class NODE_OT_EDM_OmniNew_add(Operator):
     
     def __init__(self) -> None:
         super().__init__()
-        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = build_material_descriptions()
+        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = get_material_descriptions()
 
     def execute(self, context: Context) -> typing.Union[typing.Set[int], typing.Set[str]]:
         pbr_group: EdmFakeOmniShaderNode = context.space_data.node_tree.nodes.new(type = enums.BpyShaderNode.NODE_GROUP_FAKE_OMNI)
@@ -193,7 +193,7 @@ class NODE_OT_EDM_Spot_add(Operator):
     
     def __init__(self) -> None:
         super().__init__()
-        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = build_material_descriptions()
+        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = get_material_descriptions()
 
     def execute(self, context: Context) -> typing.Union[typing.Set[int], typing.Set[str]]:
         spot_group: ShaderNodeGroup = context.space_data.node_tree.nodes.new(type = enums.BpyShaderNode.NODE_GROUP)
@@ -218,7 +218,7 @@ class NODE_OT_EDM_SpotNew_add(Operator):
     
     def __init__(self) -> None:
         super().__init__()
-        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = build_material_descriptions()
+        self.material_desc: Dict[enums.NodeGroupTypeEnum, MatDesc] = get_material_descriptions()
 
     def execute(self, context: Context) -> typing.Union[typing.Set[int], typing.Set[str]]:
         pbr_group: EdmFakeSpotShaderNode = context.space_data.node_tree.nodes.new(type = enums.BpyShaderNode.NODE_GROUP_FAKE_SPOT)
@@ -0,0 +1,328 @@
+import hashlib
+import mmap
+import os.path
+import struct
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from edm_exception import EdmException
+
+## Read-only access to exported .edm files.
+## File layout that is read here:
+##   'EDM' magic, uint16 version,
+##   (version 10) uint32 size of string table and null separated strings,
+##   two type index maps: uint32 count, then (string, uint32) pairs,
+##   payload: node tree, render nodes and their buffers.
+## Strings are uint32 indices into string table for version 10 and uint32 length prefixed bytes for older versions.
+## Scope: reader parses header only (version, string table, type index maps), it doesn't build node tree,
+## render nodes or their vertex and index buffers. Records of payload have no size prefix, so skipping one needs
+## parser of every node type of native writer, which isn't documented. Payload is exposed as zero-copy views instead.
+## Diff is header and chunk level: payload is split to content-defined chunks, boundaries are found by rolling hash
+## of bytes, so inserted or removed bytes change only chunks around them and the rest of file still matches.
+## It tells which types, names and byte ranges changed, not which node changed.
+
+EDM_MAGIC = b'EDM'
+EDM_STRING_TABLE_VERSION = 10
+BLOCK_SIZE = 64 * 1024
+
+# Chunk ends where gear hash of last 'GEAR_WINDOW' bytes has 'CHUNK_AVG_BITS' zero bits, about every 8 KB.
+GEAR_WINDOW = 32
+CHUNK_AVG_BITS = 13
+CHUNK_MIN_SIZE = 2 * 1024
+CHUNK_MAX_SIZE = 64 * 1024
+# Payload is hashed by segments, so memory doesn't grow with size of file.
+GEAR_SEGMENT_SIZE = 4 * 1024 * 1024
+# Fixed random value of every byte, it must not change: chunks of files are compared between runs.
+GEAR_TABLE = np.random.default_rng(0x45444D).integers(0, 1 << 32, 256, dtype=np.uint64)
+
+KeyCounts = Dict[str, int]
+
+class EdmFile:
+    def __init__(self, file_path: str) -> None:
+        self.file_path: str = file_path
+        self.size: int = os.path.getsize(file_path)
+        self._file = open(file_path, 'rb')
+        self._mm: mmap.mmap = None
+        if self.size:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._parsed: bool = False
+        self._version: int = -1
+        self._strings: List[str] = []
+        self._key_counts: List[KeyCounts] = []
+        self._payload_offset: int = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        if self._mm:
+            try:
+                self._mm.close()
+            except BufferError:
+                # Numpy views are still alive, mapping is released with them.
+                pass
+            self._mm = None
+        self._file.close()
+
+    def _read_uint32(self, offset: int) -> Tuple[int, int]:
+        if offset + 4 > self.size:
+            raise EdmException(f'{self.file_path} is truncated at {offset}.')
+        return struct.unpack_from('<I', self._mm, offset)[0], offset + 4
+
+    def _read_string(self, offset: int) -> Tuple[str, int]:
+        value, offset = self._read_uint32(offset)
+        if self._version >= EDM_STRING_TABLE_VERSION:
+            if value >= len(self._strings):
+                raise EdmException(f'{self.file_path} has invalid string index {value} at {offset - 4}.')
+            return self._strings[value], offset
+        if offset + value > self.size:
+            raise EdmException(f'{self.file_path} is truncated at {offset}.')
+        return bytes(self._mm[offset : offset + value]).decode('utf-8', 'replace'), offset + value
+
+    def _read_map(self, offset: int) -> Tuple[KeyCounts, int]:
+        count, offset = self._read_uint32(offset)
+        result: KeyCounts = {}
+        for _ in range(count):
+            key, offset = self._read_string(offset)
+            value, offset = self._read_uint32(offset)
+            result[key] = value
+        return result, offset
+
+    def _parse(self) -> None:
+        if self._parsed:
+            return
+        self._parsed = True
+
+        if self.size < 5 or self._mm[:3] != EDM_MAGIC:
+            raise EdmException(f'{self.file_path} is not edm file.')
+        self._version = struct.unpack_from('<H', self._mm, 3)[0]
+        offset = 5
+
+        if self._version >= EDM_STRING_TABLE_VERSION:
+            table_size, offset = self._read_uint32(offset)
+            if offset + table_size > self.size:
+                raise EdmException(f'{self.file_path} has truncated string table.')
+            table: bytes = self._mm[offset : offset + table_size]
+            self._strings = [x.decode('utf-8', 'replace') for x in table.split(b'\0')]
+            if self._strings and not self._strings[-1]:
+                self._strings.pop()
+            offset += table_size
+
+        for _ in range(2):
+            key_counts, offset = self._read_map(offset)
+            self._key_counts.append(key_counts)
+
+        self._payload_offset = offset
+
+    @property
+    def version(self) -> int:
+        self._parse()
+        return self._version
+
+    ## Strings of string table: node, material and texture names. Empty for old versions.
+    @property
+    def strings(self) -> List[str]:
+        self._parse()
+        return self._strings
+
+    ## Type index maps of file. Counts of every node, render node and property type.
+    @property
+    def key_counts(self) -> List[KeyCounts]:
+        self._parse()
+        return self._key_counts
+
+    @property
+    def payload_offset(self) -> int:
+        self._parse()
+        return self._payload_offset
+
+    ## Returns zero-copy view of 'count' items of 'dtype' starting at absolute 'offset'.
+    def array(self, offset: int, dtype, count: int = -1) -> np.ndarray:
+        if not self._mm:
+            return np.empty(0, dtype=dtype)
+        return np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset)
+
+    ## Returns zero-copy view of payload (everything after header and type index maps).
+    def payload(self, dtype=np.uint8) -> np.ndarray:
+        offset: int = self.payload_offset
+        itemsize: int = np.dtype(dtype).itemsize
+        return self.array(offset, dtype, (self.size - offset) // itemsize)
+
+    ## Returns content-defined chunks of payload, offsets are absolute.
+    def chunks(self) -> List['Chunk']:
+        payload: np.ndarray = self.payload()
+        result: List[Chunk] = []
+        start: int = 0
+        for end in get_chunk_ends(payload):
+            result.append(Chunk(self.payload_offset + start, end - start, hashlib.blake2b(payload[start:end], digest_size=16).hexdigest()))
+            start = end
+        return result
+
+    def content_hash(self) -> str:
+        h = hashlib.sha256()
+        if self._mm:
+            h.update(self._mm)
+        return h.hexdigest()
+
+@dataclass
+class Chunk:
+    offset: int
+    size: int
+    hash: str
+
+# Hash of every byte over window of last 'GEAR_WINDOW' bytes: sum of gear[data[i - k]] << k.
+# Bits above 'GEAR_WINDOW' don't depend on window, so boundary mask is taken below it.
+def get_gear_hashes(data: np.ndarray) -> np.ndarray:
+    gear = GEAR_TABLE[data]
+    n: int = len(data)
+    result = np.zeros(n, dtype=np.uint64)
+    for k in range(min(GEAR_WINDOW, n)):
+        result[k:] += gear[:n - k] << np.uint64(k)
+    return result
+
+# Ends of content-defined chunks of 'data', the last one is len(data).
+def get_chunk_ends(data: np.ndarray) -> List[int]:
+    n: int = len(data)
+    mask = np.uint64(((1 << CHUNK_AVG_BITS) - 1) << (GEAR_WINDOW - CHUNK_AVG_BITS))
+    candidates: List[int] = []
+    for segment in range(0, n, GEAR_SEGMENT_SIZE):
+        # segment starts with window of previous bytes, so hashes don't depend on segmentation
+        lo: int = max(0, segment - GEAR_WINDOW + 1)
+        hashes = get_gear_hashes(data[lo : segment + GEAR_SEGMENT_SIZE])[segment - lo:]
+        candidates.extend((np.flatnonzero((hashes & mask) == 0) + segment + 1).tolist())
+
+    ends: List[int] = []
+    start: int = 0
+    for end in candidates + [n]:
+        while end - start > CHUNK_MAX_SIZE:
+            start += CHUNK_MAX_SIZE
+            ends.append(start)
+        if end - start >= CHUNK_MIN_SIZE or (end == n and end > start):
+            ends.append(end)
+            start = end
+    return ends
+
+# Merges chunks following each other to (offset, size) ranges.
+def get_chunk_ranges(chunks: List[Chunk]) -> List[Tuple[int, int]]:
+    ranges: List[Tuple[int, int]] = []
+    for chunk in chunks:
+        if ranges and ranges[-1][0] + ranges[-1][1] == chunk.offset:
+            ranges[-1] = (ranges[-1][0], ranges[-1][1] + chunk.size)
+        else:
+            ranges.append((chunk.offset, chunk.size))
+    return ranges
+
+@dataclass
+class EdmDiff:
+    file_a: str
+    file_b: str
+    size: Tuple[int, int] = (0, 0)
+    version: Tuple[int, int] = (0, 0)
+    # type name -> (count in a, count in b), only changed ones.
+    key_counts: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    strings_added: List[str] = field(default_factory=list)
+    strings_removed: List[str] = field(default_factory=list)
+    # True if both files have the same names but in other order.
+    strings_reordered: bool = False
+    # (offset, size) ranges of payload of a which aren't in b and of b which aren't in a.
+    removed_ranges: List[Tuple[int, int]] = field(default_factory=list)
+    added_ranges: List[Tuple[int, int]] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return (self.size[0] == self.size[1] and self.version[0] == self.version[1] and not self.key_counts
+            and not self.strings_added and not self.strings_removed and not self.strings_reordered and not self.removed_ranges and not self.added_ranges)
+
+    def __str__(self) -> str:
+        if self.is_empty():
+            return f'{self.file_a} and {self.file_b} are identical.'
+        out: List[str] = [f'--- {self.file_a}', f'+++ {self.file_b}']
+        if self.version[0] != self.version[1]:
+            out.append(f'version: {self.version[0]} -> {self.version[1]}')
+        if self.size[0] != self.size[1]:
+            out.append(f'size: {self.size[0]} -> {self.size[1]}')
+        for name, (a, b) in self.key_counts.items():
+            out.append(f'count {name}: {a} -> {b}')
+        for name in self.strings_removed:
+            out.append(f'- {name}')
+        for name in self.strings_added:
+            out.append(f'+ {name}')
+        if self.strings_reordered:
+            out.append('names are reordered')
+        for offset, size in self.removed_ranges:
+            out.append(f'- bytes {offset}..{offset + size} of {self.file_a}')
+        for offset, size in self.added_ranges:
+            out.append(f'+ bytes {offset}..{offset + size} of {self.file_b}')
+        return '\n'.join(out)
+
+def merge_key_counts(key_counts: List[KeyCounts]) -> KeyCounts:
+    result: KeyCounts = {}
+    for counts in key_counts:
+        for name, count in counts.items():
+            result[name] = result.get(name, 0) + count
+    return result
+
+## Header and chunk level diff of two edm files: type counts, names and payload chunks.
+## Changed node can be told only by changed counts and names, changed chunks give byte ranges to look at.
+def diff(file_path_a: str, file_path_b: str) -> EdmDiff:
+    with EdmFile(file_path_a) as a, EdmFile(file_path_b) as b:
+        result = EdmDiff(file_path_a, file_path_b, (a.size, b.size), (a.version, b.version))
+
+        counts_a: KeyCounts = merge_key_counts(a.key_counts)
+        counts_b: KeyCounts = merge_key_counts(b.key_counts)
+        for name in sorted(set(counts_a) | set(counts_b)):
+            count_a: int = counts_a.get(name, 0)
+            count_b: int = counts_b.get(name, 0)
+            if count_a != count_b:
+                result.key_counts[name] = (count_a, count_b)
+
+        strings_a = set(a.strings)
+        strings_b = set(b.strings)
+        result.strings_added = sorted(strings_b - strings_a)
+        result.strings_removed = sorted(strings_a - strings_b)
+        result.strings_reordered = not result.strings_added and not result.strings_removed and a.strings != b.strings
+
+        chunks_a: List[Chunk] = a.chunks()
+        chunks_b: List[Chunk] = b.chunks()
+        hashes_a = {x.hash for x in chunks_a}
+        hashes_b = {x.hash for x in chunks_b}
+        result.removed_ranges = get_chunk_ranges([x for x in chunks_a if x.hash not in hashes_b])
+        result.added_ranges = get_chunk_ranges([x for x in chunks_b if x.hash not in hashes_a])
+
+    return result
+
+## Fast check that two files have the same bytes. Doesn't parse files.
+def is_content_identical(file_path_a: str, file_path_b: str) -> bool:
+    if not os.path.isfile(file_path_a) or not os.path.isfile(file_path_b):
+        return False
+    if os.path.getsize(file_path_a) != os.path.getsize(file_path_b):
+        return False
+    if os.path.samefile(file_path_a, file_path_b):
+        return True
+
+    with EdmFile(file_path_a) as a, EdmFile(file_path_b) as b:
+        if not a._mm:
+            return True
+        for i in range(0, a.size, BLOCK_SIZE):
+            if a._mm[i : i + BLOCK_SIZE] != b._mm[i : i + BLOCK_SIZE]:
+                return False
+    return True
+
+def content_hash(file_path: Union[str, None]) -> str:
+    if not file_path or not os.path.isfile(file_path):
+        return ''
+    with EdmFile(file_path) as f:
+        return f.content_hash()
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: edm_reader.py first.edm second.edm')
+        sys.exit(2)
+    edm_diff: EdmDiff = diff(sys.argv[1], sys.argv[2])
+    print(edm_diff)
+    sys.exit(0 if edm_diff.is_empty() else 1)
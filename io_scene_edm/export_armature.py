@@ -1,11 +1,15 @@
 import re
+from dataclasses import dataclass
 from enum import Enum
+from typing import Dict, List
+import numpy as np
 import bpy
+from mathutils import Matrix
 
 from pyedm_platform_selector import pyedm
 from logger import log
 from tree_node import TreeNode
-from animation import has_transform_anim, extract_transform_anim, AllowedAnimationsEnum
+from animation import has_transform_anim, extract_transform_anim, AllowedAnimationsEnum, ActionIndex
 from math_tools import IDENTITY_MATRIX, ROOT_TRANSFORM_MATRIX, RIGHT_TRANSFORM_MATRIX
 
 def build_bone_id(armature_name, bone_name):
@@ -18,40 +22,89 @@ def split_data_path(data_path):
         return (None, data_path)
     return (m.group(1), m.group(2))
 
+## Rest and pose matrices of bone relative to its parent, see 'BoneNode.update_matrices'.
+@dataclass
+class BoneMatrices:
+    mat: Matrix
+    pmat: Matrix
+    mat_inv: Matrix
+
+def to_matrices(arr: np.ndarray) -> List[Matrix]:
+    return [Matrix(x) for x in arr.tolist()]
+
+# Blender matrices are read in column major order, result is (n, 4, 4) of row major matrices.
+def read_matrices(collection, attr: str) -> np.ndarray:
+    buf = np.empty(len(collection) * 16, dtype=np.float32)
+    collection.foreach_get(attr, buf)
+    return buf.reshape((-1, 4, 4)).transpose((0, 2, 1)).astype(np.float64)
+
+## Matrices of all pose bones of armature are read in bulk and inverted in one batch.
+def get_bone_matrices(armature: bpy.types.Object, pbones: List[bpy.types.PoseBone]) -> Dict[str, BoneMatrices]:
+    rest_bones = armature.data.bones
+    pose_bones = armature.pose.bones
+    rest = read_matrices(rest_bones, 'matrix_local')
+    pose = read_matrices(pose_bones, 'matrix')
+    rest_index: Dict[str, int] = {b.name: i for i, b in enumerate(rest_bones)}
+    pose_index: Dict[str, int] = {b.name: i for i, b in enumerate(pose_bones)}
+
+    names: List[str] = [b.name for b in pbones]
+    own = np.array([pose_index[x] for x in names], dtype=np.int64)
+    own_rest = np.array([rest_index[x] for x in names], dtype=np.int64)
+    # bone without parent is related to itself, its parent matrix is replaced by identity below
+    parent = np.array([pose_index[b.parent.name] if b.parent else pose_index[b.name] for b in pbones], dtype=np.int64)
+    parent_rest = np.array([rest_index[b.parent.name] if b.parent else rest_index[b.name] for b in pbones], dtype=np.int64)
+    has_parent = np.array([b.parent is not None for b in pbones], dtype=bool)
+
+    pose_inv = np.linalg.inv(pose)
+    rest_inv = np.linalg.inv(rest)
+    identity = np.identity(4)
+    parent_rest_inv = np.where(has_parent[:, None, None], rest_inv[parent_rest], identity)
+    parent_pose_inv = np.where(has_parent[:, None, None], pose_inv[parent], identity)
+
+    mats = to_matrices(parent_rest_inv @ rest[own_rest])
+    pmats = to_matrices(parent_pose_inv @ pose[own])
+    mats_inv = to_matrices(pose_inv[own])
+    return {name: BoneMatrices(m, pm, mi) for name, m, pm, mi in zip(names, mats, pmats, mats_inv)}
+
 class BoneNode(TreeNode):
-    def __init__(self, pbone: bpy.types.PoseBone, armature: bpy.types.Armature) -> None:
+    def __init__(self, pbone: bpy.types.PoseBone, armature: bpy.types.Armature, matrices: BoneMatrices = None) -> None:
         super().__init__()
         self.name = build_bone_id(armature.name, pbone.name)
         self.armature = armature
         self.pbone = pbone
         self.bone = pbone.bone # rest bone
         self.edm_node = None
-        self.update_matrices()
+        if matrices:
+            self.mat = matrices.mat
+            self.pmat = matrices.pmat
+            self.mat_inv = matrices.mat_inv
+        else:
+            self.update_matrices()
 
-    def build_bones(self, parent: pyedm.Node):
-        self.edm_node = extract_bone_animation(parent, self)
+    def build_bones(self, parent: pyedm.Node, anim=(None, -1), action_index: ActionIndex = None):
+        self.edm_node = extract_bone_animation(parent, self, anim=anim, action_index=action_index)
         for i in self.children:
-            i.build_bones(self.edm_node)
+            i.build_bones(self.edm_node, anim, action_index)
 
     def update_matrices(self):
         if self.bone.parent:
             self.mat = self.bone.parent.matrix_local.inverted() @ self.bone.matrix_local
-            self.mat_inv = self.mat.inverted()
-            #self.mat_inv = (self.bone.matrix_local).inverted()
         else:
             self.mat = self.bone.matrix_local
-            self.mat_inv = (self.bone.matrix_local).inverted()
 
         if self.pbone.parent:
             self.pmat = self.pbone.parent.matrix.inverted() @ self.pbone.matrix
         else:
             self.pmat = self.pbone.matrix
         self.mat_inv = (self.pbone.matrix).inverted()
-        
+
+def get_bones_anim(armature, allowed_args=None):
+    return has_transform_anim(armature, lambda x: split_data_path(x)[1], allowed_args=allowed_args)
 
 # allowed_args == None means any args are allowed
-def extract_bone_animation(parent: pyedm.Node, bone: BoneNode, allowed_args=None):
-    action, arg = has_transform_anim(bone.armature, lambda x: split_data_path(x)[1], allowed_args=allowed_args)
+# anim is (action, arg) of armature, it's the same for all bones and is looked up if not passed.
+def extract_bone_animation(parent: pyedm.Node, bone: BoneNode, allowed_args=None, anim=None, action_index: ActionIndex = None):
+    action, arg = anim if anim else get_bones_anim(bone.armature, allowed_args)
     if not action:
         parent = parent.addChild(pyedm.Bone(bone.name, bone.pmat, bone.mat_inv))
         return parent
@@ -62,31 +115,38 @@ def extract_bone_animation(parent: pyedm.Node, bone: BoneNode, allowed_args=None
         ROTATION_EULER  = 'pose.bones["' + bone.bone.name + '"].rotation_euler'
         SCALE           = 'pose.bones["' + bone.bone.name + '"].scale'
 
-    a = extract_transform_anim(parent, action, arg, bone.mat, bone.armature.matrix_local, bone.name, AllowedAnimationsEnum.ALL, DPE)
+    a = extract_transform_anim(parent, action, arg, bone.mat, bone.armature.matrix_local, bone.name, AllowedAnimationsEnum.ALL, DPE, action_index)
 
     a = a.addChild(pyedm.Bone(bone.name, IDENTITY_MATRIX, bone.mat_inv))
     
     return a
 
 # we need to build tree because blender holds bones in a flat list
-def build_bones_tree(parent, bones_list, armature):
-    bones = [BoneNode(b, armature) for b in bones_list]
-
+def build_bones_tree(parent, bones_list, armature, deterministic=False):
+    if deterministic:
+        bones_list = sorted(bones_list, key=lambda x: x.name)
+    matrices = get_bone_matrices(armature, bones_list)
+    bones = [BoneNode(b, armature, matrices[b.name]) for b in bones_list]
+    nodes_by_name: Dict[str, BoneNode] = {b.pbone.name: b for b in bones}
+
+    # children are added in order of bones list, as blender lists children of pose bone
     for b in bones:
-        for c in b.pbone.children:
-            for bb in bones:
-                if c == bb.pbone:
-                    b.add_child(bb)
-                    break
+        pbone_parent = b.pbone.parent
+        if pbone_parent:
+            parent_node = nodes_by_name.get(pbone_parent.name)
+            if parent_node:
+                parent_node.add_child(b)
 
     roots = [b for b in bones if b.parent == None]
 
+    anim = get_bones_anim(armature)
+    action_index = ActionIndex(anim[0]) if anim[0] else None
     for r in roots:
-        r.build_bones(parent)
+        r.build_bones(parent, anim, action_index)
 
     return bones
 
-def export_armature(armature, parent, bones_dict):
+def export_armature(armature, parent, bones_dict, deterministic=False):
     # Pose bones contain pose data for the current frame, while regular bone objects store the default state of the bone.
     pose_bones = armature.pose.bones
     if not pose_bones:
@@ -98,7 +158,7 @@ def export_armature(armature, parent, bones_dict):
     #root = pyedm.Transform(f'Armature {armature.name} Root', armature.matrix_local)
     #parent = parent.addChild(root)
     
-    bone_nodes = build_bones_tree(parent, pose_bones, armature)
+    bone_nodes = build_bones_tree(parent, pose_bones, armature, deterministic)
     
     bones_dict.update({(x.name, x) for x in bone_nodes})
     
@@ -0,0 +1,127 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Set, Tuple
+
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import ID, Object
+
+## Export products which don't depend on pyedm model: mesh arrays and raw animation keys.
+## They are kept between export runs and dropped when any datablock they were built from changes.
+## Changes are tracked by depsgraph update handler, cache is cleared on file load and undo/redo
+## as blender datablocks are reallocated there.
+## Dependencies are keyed by datablock address, so renamed datablock still invalidates its products.
+
+IdKey = int
+CacheKey = Hashable
+
+def get_id_key(id: ID) -> IdKey:
+    return id.as_pointer()
+
+@dataclass
+class CacheEntry:
+    value: Any
+    build_time: float
+    deps: Set[IdKey]
+    pointers: Tuple[int, ...]
+
+@dataclass
+class CacheStats:
+    clean: int = 0
+    dirty: int = 0
+    saved_time: float = 0.0
+
+    def __str__(self) -> str:
+        return f'{self.clean} clean, {self.dirty} dirty, {self.saved_time:.2f}s saved'
+
+## Cache keys are tuples, first item is kind of product: 'MESH', 'ANIM'.
+def get_kind(key: CacheKey) -> str:
+    return key[0] if isinstance(key, tuple) else str(key)
+
+class ExportCache:
+    def __init__(self) -> None:
+        self.enabled: bool = True
+        self.entries: Dict[CacheKey, CacheEntry] = {}
+        self.by_dep: Dict[IdKey, Set[CacheKey]] = {}
+        self.stats: Dict[str, CacheStats] = {}
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.by_dep.clear()
+
+    def invalidate(self, id_key: IdKey) -> None:
+        keys = self.by_dep.pop(id_key, None)
+        if not keys:
+            return
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def reset_stats(self) -> None:
+        self.stats = {}
+
+    def get_stats_string(self) -> str:
+        return '; '.join(f'{kind.lower()}: {stats}' for kind, stats in self.stats.items())
+
+    # Returns cached value or builds it by 'build'.
+    # 'deps' are datablocks value is built from, 'pointers' are checked on hit to catch datablock which took name
+    # used in key by another one.
+    def get(self, key: CacheKey, deps: Set[IdKey], pointers: Tuple[int, ...], build: Callable[[], Any]) -> Any:
+        stats: CacheStats = self.stats.setdefault(get_kind(key), CacheStats())
+        if self.enabled:
+            entry: CacheEntry = self.entries.get(key)
+            if entry and entry.pointers == pointers:
+                stats.clean += 1
+                stats.saved_time += entry.build_time
+                return entry.value
+
+        start: float = time.perf_counter()
+        value = build()
+        build_time: float = time.perf_counter() - start
+        stats.dirty += 1
+
+        if self.enabled:
+            self.entries[key] = CacheEntry(value, build_time, deps, pointers)
+            for dep in deps:
+                self.by_dep.setdefault(dep, set()).add(key)
+        return value
+
+export_cache = ExportCache()
+
+def get_object_deps(obj: Object) -> Set[IdKey]:
+    deps: Set[IdKey] = {get_id_key(obj)}
+    if obj.data:
+        deps.add(get_id_key(obj.data))
+    return deps
+
+@persistent
+def on_depsgraph_update(scene, depsgraph) -> None:
+    for update in depsgraph.updates:
+        id: ID = update.id.original
+        if isinstance(id, bpy.types.Scene):
+            continue
+        # Selection and visibility changes don't touch export products of object.
+        if isinstance(id, Object) and not update.is_updated_geometry and not update.is_updated_transform:
+            continue
+        export_cache.invalidate(get_id_key(id))
+
+@persistent
+def on_data_reload(*args) -> None:
+    export_cache.clear()
+
+HANDLERS = (
+    (bpy.app.handlers.depsgraph_update_post, on_depsgraph_update),
+    (bpy.app.handlers.load_post, on_data_reload),
+    (bpy.app.handlers.undo_post, on_data_reload),
+    (bpy.app.handlers.redo_post, on_data_reload),
+)
+
+def register_export_cache_handlers() -> None:
+    for handlers, fn in HANDLERS:
+        if fn not in handlers:
+            handlers.append(fn)
+
+def unregister_export_cache_handlers() -> None:
+    for handlers, fn in HANDLERS:
+        if fn in handlers:
+            handlers.remove(fn)
+    export_cache.clear()
@@ -14,7 +14,7 @@ from objects_custom_props import get_edm_props
 from pyedm_platform_selector import pyedm
 from logger import log
 from material_wrap import (FakeOmniLightMaterialWrap, FakeSpotLightMaterialWrap, g_missing_texture_name)
-from mesh_storage import MeshStorage
+from mesh_storage import MeshStorage, VertexGroupTable
 from math_tools import RIGHT_TRANSFORM_MATRIX
 import utils
 
@@ -31,26 +31,17 @@ def is_fake_light(object: bpy.types.Object) -> bool:
         return True
     return False
 
-def get_delay_anim_list(lights_anim_delay_list: List[FakeLightDelay], key_list: anim.KeyFramePoints) -> FakeLightIdxToFrameList:
-    fake_lights_anim_list: List[FakeLightIndex, anim.KeyFramePoints] = []
+# Every light gets key_list shifted by its delay. Times of all lights are computed as one (lights, keys) array.
+def get_delay_anim_list(lights_anim_delay_list: Union[List[FakeLightDelay], np.ndarray], key_list: anim.KeyFramePoints) -> FakeLightIdxToFrameList:
     if not key_list:
-        return fake_lights_anim_list
-    first_key_frame: anim.KeyFramePoint = key_list[0]
-    for fake_light_index in range(0, len(lights_anim_delay_list)):
-        delay: float = lights_anim_delay_list[fake_light_index]
-        new_key_frame_points: anim.KeyFramePoints = []
-        for key_frame_index in range(0, len(key_list)):
-            key_frame: anim.KeyFramePoint = key_list[key_frame_index]
-            #old_key_fame_time = key_frame[0]
-            old_key_fame_time = key_frame[0] - first_key_frame[0]
-            old_key_fame_point = key_frame[1]
-            new_key_fame_time: float = np.clip(old_key_fame_time + delay, -1.0, 1.0)
-            #new_key_fame_time_normalized: float = (new_key_fame_time + 1.0) * 0.5
-            new_key_fame_time_normalized: float = new_key_fame_time * 0.5
-            new_key: anim.KeyFrameTime = new_key_fame_time_normalized
-            new_key_frame_points.append((new_key, old_key_fame_point))
-        fake_lights_anim_list.append((fake_light_index, new_key_frame_points))
-    return fake_lights_anim_list
+        return []
+    delays = np.asarray(lights_anim_delay_list, dtype=np.float64)
+    times = np.array([x[0] for x in key_list], dtype=np.float64)
+    values = [x[1] for x in key_list]
+
+    # time is relative to the first key
+    new_times = np.clip((times - times[0])[np.newaxis, :] + delays[:, np.newaxis], -1.0, 1.0) * 0.5
+    return [(i, list(zip(light_times, values))) for i, light_times in enumerate(new_times.tolist())]
 
 def get_pos(vertex: MeshVertex) -> Tuple[float, float, float]:
     pos_x: float = vertex.co[0]
@@ -123,11 +114,22 @@ def convert_coordinates(normals: np.array, object: Object) -> Tuple[float, float
     normals = [tuple(vec) for vec in normals]
     return normals
     
-## method returns dict of uv coordinates. 
-def parse_uv_coords(bpy_mesh: Mesh, indxs_of_vertices: np.array):
-    nVertex_in_face = 4
-    uv_coords_dim = 2
+## Loops of polygons in face order: 'order' gathers mesh loops so loops of every face are contiguous,
+## 'starts' are offsets of faces in gathered arrays. Polygons can have any number of vertices.
+def get_face_loops(bpy_mesh: Mesh) -> Tuple[np.ndarray, np.ndarray]:
     faces_count = len(bpy_mesh.polygons)
+    loop_start = np.empty(faces_count, dtype=np.int64)
+    loop_total = np.empty(faces_count, dtype=np.int64)
+    bpy_mesh.polygons.foreach_get('loop_start', loop_start)
+    bpy_mesh.polygons.foreach_get('loop_total', loop_total)
+
+    starts = np.cumsum(loop_total) - loop_total
+    order = np.repeat(loop_start - starts, loop_total) + np.arange(int(loop_total.sum()), dtype=np.int64)
+    return order, starts
+
+## method returns dict of uv coordinates: (faces, [min, max], uv) bounds of uv of every face.
+def parse_uv_coords(bpy_mesh: Mesh, order: np.ndarray, starts: np.ndarray):
+    uv_coords_dim = 2
     
     # check texture layers names
     max_possible_layers = 2
@@ -156,35 +158,20 @@ def parse_uv_coords(bpy_mesh: Mesh, indxs_of_vertices: np.array):
     uvs = {}
     for uv_key, uv_name in layers_uv_names.items():
         uv_loop = uv_layers[uv_name]
-        if len(uv_loop.uv) == 0:
+        if len(uv_loop.uv) == 0 or len(starts) == 0:
             uvs[uv_key] = np.array([], dtype=np.float32)
             continue
-        # maximum number of uv coords = faces_count * nVertex_in_face * uv_coords_dim, but it could be less in some cases.
-        buf = np.empty(faces_count * nVertex_in_face * uv_coords_dim, dtype=np.float32)
-        
-        # parse uv coords values
+        # uv are stored per loop
+        buf = np.empty(len(uv_loop.uv) * uv_coords_dim, dtype=np.float32)
         uv_loop.uv.foreach_get('vector', buf)
-        buf = np.reshape(buf, (buf.size // uv_coords_dim, uv_coords_dim))
-
-        uv_coords = np.zeros(shape=(faces_count, nVertex_in_face, uv_coords_dim),  dtype=np.float32)
-        for j in range(nVertex_in_face):
-            uv_coords[:, j, :] = buf[indxs_of_vertices[:, j]]
-
-        res_map = np.zeros(shape=(faces_count, 2, uv_coords_dim), dtype=np.float32)
-        # TODO: range(faces_count)... it is better to avoid loop trough faces
-        for i in range(faces_count):
-            x_min = np.min(uv_coords[i, :, 0], axis=0)
-            x_max = np.max(uv_coords[i, :, 0], axis=0)
-            y_min = np.min(uv_coords[i, :, 1], axis=0)
-            y_max = np.max(uv_coords[i, :, 1], axis=0)
+        uv_coords = np.reshape(buf, (-1, uv_coords_dim))[order]
 
-            res_map[i] = np.array([[x_min, y_min], [x_max, y_max]])
-        
-        uvs[uv_key] = res_map    
+        uvs[uv_key] = np.stack((np.minimum.reduceat(uv_coords, starts), np.maximum.reduceat(uv_coords, starts)), axis=1)
    
     return uvs
 
 ## parse faces of object and return center of each face, normal vectors, size of light.
+## Light size is the biggest distance from the first vertex of face to its other vertices (diagonal for quads).
 def parse_faces(bpy_mesh: Mesh, object: Object):
     dim = 3
     faces_count = len(bpy_mesh.polygons)
@@ -205,27 +192,116 @@ def parse_faces(bpy_mesh: Mesh, object: Object):
     bpy_mesh.vertices.foreach_get('co', vertices) 
     vertices = np.reshape(vertices, (vert_count, dim), order='C')
 
-    points_count = 4     # each face has 4 vertices (this is expected)
-    # for each face get np.array with indxes of vertices in this face.
-    indxs = np.empty(faces_count * points_count, dtype=np.int32)
-    bpy_mesh.polygons.foreach_get('vertices', indxs)
-    indxs_of_vertices = np.reshape(indxs, (faces_count, points_count), order='C')
-    uvs = parse_uv_coords(bpy_mesh, indxs_of_vertices)
+    order, starts = get_face_loops(bpy_mesh)
+    uvs = parse_uv_coords(bpy_mesh, order, starts)
+
+    if faces_count == 0:
+        return centers, normals, np.empty(0, dtype=np.float32), uvs
 
-    # calculate diagonal of each polygon by finding light_sizes=maximum(|p0-p1|, |p0-p2|, |p0-p3|)
-    indxs = np.reshape(indxs, (points_count, faces_count), order='F')
-    sides_polygons = np.zeros(shape=(faces_count, 3))
-    for i in range(0, points_count-1):
-        sides_polygons[:, i] = np.linalg.norm(vertices[indxs[0]] - vertices[indxs[i+1]], axis=1)
+    loop_vertices = np.empty(len(bpy_mesh.loops), dtype=np.int32)
+    bpy_mesh.loops.foreach_get('vertex_index', loop_vertices)
+    face_vertices = vertices[loop_vertices[order]]
 
-    light_sizes = np.max(sides_polygons, axis=1)
+    # distance of every loop to the first loop of its face
+    first_vertices = np.repeat(face_vertices[starts], np.diff(np.append(starts, len(order))), axis=0)
+    distances = np.linalg.norm(face_vertices - first_vertices, axis=1)
+    light_sizes = np.maximum.reduceat(distances, starts)
 
     return centers, normals, light_sizes, uvs
 
-def make_fake_omni_edm_mat_blocks(object: Object, material_wrap: FakeOmniLightMaterialWrap, mesh_storage: MeshStorage) -> pyedm.FakeOmniLights:
+## Bulk constructors of fake lights.
+## positions: (n, 3), sizes: (n) or scalar, uv rects: (n, 2, 2) or single ((u0, v0), (u1, v1)).
+## Arrays are converted to python lists at once, so there are no numpy scalars conversions per light.
+def make_fake_omni_lights(positions: np.ndarray, sizes, uv_rects) -> List[pyedm.FakeOmniLight]:
+    n: int = len(positions)
+    positions = np.asarray(positions, dtype=np.float64).tolist()
+    sizes = np.broadcast_to(np.asarray(sizes, dtype=np.float64), (n,)).tolist()
+    uv_rects = np.broadcast_to(np.asarray(uv_rects, dtype=np.float64), (n, 2, 2)).tolist()
+
+    fake_lights: List[pyedm.FakeOmniLight] = []
+    for pos, size, (pt1, pt2) in zip(positions, sizes, uv_rects):
+        edm_fake_omni = pyedm.FakeOmniLight()
+        edm_fake_omni.setSize(size)
+        edm_fake_omni.setPos(tuple(pos))
+        edm_fake_omni.setUV(tuple(pt1), tuple(pt2))
+        fake_lights.append(edm_fake_omni)
+    return fake_lights
+
+## back_uv_rects == None doesn't set back uv.
+def make_fake_spot_lights(positions: np.ndarray, sizes, uv_rects, back_side: bool, back_uv_rects = None) -> List[pyedm.FakeSpotLight]:
+    n: int = len(positions)
+    positions = np.asarray(positions, dtype=np.float64).tolist()
+    sizes = np.broadcast_to(np.asarray(sizes, dtype=np.float64), (n,)).tolist()
+    uv_rects = np.broadcast_to(np.asarray(uv_rects, dtype=np.float64), (n, 2, 2)).tolist()
+    if back_uv_rects is not None:
+        back_uv_rects = np.broadcast_to(np.asarray(back_uv_rects, dtype=np.float64), (n, 2, 2)).tolist()
+
+    fake_lights: List[pyedm.FakeSpotLight] = []
+    for i, (pos, size, (pt1, pt2)) in enumerate(zip(positions, sizes, uv_rects)):
+        edm_fake_spot = pyedm.FakeSpotLight()
+        edm_fake_spot.setSize(size)
+        edm_fake_spot.setPos(tuple(pos))
+        edm_fake_spot.setUV(tuple(pt1), tuple(pt2))
+        edm_fake_spot.setBackSide(back_side)
+        if back_uv_rects is not None:
+            (pt1, pt2) = back_uv_rects[i]
+            edm_fake_spot.setBackUV(tuple(pt1), tuple(pt2))
+        fake_lights.append(edm_fake_spot)
+    return fake_lights
+
+## Splits lights to spatial chunks by k-d median splits along the longest axis
+## until every chunk has at most 'max_lights' lights and is not longer than 'max_extent' (0 means no limit).
+## Returns indices of lights of every chunk in original order, chunks are ordered along split planes.
+def cluster_lights(positions: np.ndarray, max_lights: int, max_extent: float) -> List[np.ndarray]:
+    result: List[np.ndarray] = []
+    stack: List[np.ndarray] = [np.arange(len(positions))]
+    while stack:
+        indices = stack.pop()
+        points = positions[indices]
+        extent = points.max(axis=0) - points.min(axis=0) if len(indices) else np.zeros(3)
+        axis = int(np.argmax(extent))
+        is_too_many: bool = max_lights > 0 and len(indices) > max_lights
+        is_too_big: bool = max_extent > 0.0 and extent[axis] > max_extent
+        if len(indices) < 2 or not (is_too_many or is_too_big):
+            result.append(np.sort(indices))
+            continue
+
+        half: int = len(indices) // 2
+        split = np.argpartition(points[:, axis], half)
+        stack.append(indices[split[half:]])
+        stack.append(indices[split[:half]])
+    return result
+
+## Returns (render node name, light indices) of chunks of fake light object.
+## Indices are None if object isn't split.
+def get_fake_light_chunks(object: Object, positions: np.ndarray) -> List[Tuple[str, Union[np.ndarray, None]]]:
+    edm_props = get_edm_props(object)
+    if not edm_props.CLUSTER_LIGHTS or len(positions) < 2:
+        return [(object.name, None)]
+
+    chunks: List[np.ndarray] = cluster_lights(np.asarray(positions, dtype=np.float64), edm_props.CLUSTER_MAX_LIGHTS, edm_props.CLUSTER_MAX_EXTENT)
+    if len(chunks) == 1:
+        return [(object.name, None)]
+    log.info(f"{object.name} is split to {len(chunks)} chunks of lights.")
+    return [(f'{object.name}_{i}', x) for i, x in enumerate(chunks)]
+
+def get_chunk(items, indices: Union[np.ndarray, None]):
+    if indices is None:
+        return items
+    if isinstance(items, np.ndarray):
+        return items[indices]
+    return [items[i] for i in indices.tolist()]
+
+def get_vertices_positions(bpy_mesh: Mesh) -> np.ndarray:
+    positions = np.empty(len(bpy_mesh.vertices) * 3, dtype=np.float32)
+    bpy_mesh.vertices.foreach_get('co', positions)
+    return positions.reshape(-1, 3)
+
+# Returns render node for every chunk of lights, single one if clustering is off.
+def make_fake_omni_edm_mat_blocks(object: Object, material_wrap: FakeOmniLightMaterialWrap, mesh_storage: MeshStorage) -> List[pyedm.FakeOmniLights]:
     if material_wrap.node_group_type != NodeGroupTypeEnum.FAKE_OMNI:
         log.warning(f"{object.name} has no fake omni material.")
-        return None
+        return []
 
     edm_props = get_edm_props(object)
     
@@ -240,7 +316,8 @@ def make_fake_omni_edm_mat_blocks(object: Object, material_wrap: FakeOmniLightMa
     max_distance: float = material_wrap.values.max_distance.value
     shift_to_camera: float = material_wrap.values.shift_to_camera.value
     luminance: float = material_wrap.values.luminance.value
-    edm_luminance_prop = pyedm.PropertyFloat(luminance)
+    # Every render node gets its own property.
+    luminance_prop_args = (luminance,)
     luminance_animation_path: str = material_wrap.values.luminance.anim_path if material_wrap.valid else None
     is_luminance_animated: bool = luminance_animation_path and anim.has_path_anim(material_wrap.material.node_tree.animation_data, luminance_animation_path)
     brightness_animation_path: str = 'EDMProps.ANIMATED_BRIGHTNESS'
@@ -254,6 +331,7 @@ def make_fake_omni_edm_mat_blocks(object: Object, material_wrap: FakeOmniLightMa
         light_size: float = edm_props.SIZE 
    
     fake_lights: List[pyedm.FakeOmniLight] = []
+    positions: np.ndarray = np.empty((0, 3), dtype=np.float32)
     is_vertex_group_set: bool = False
     
     if object.type == ObjectTypeEnum.MESH:
@@ -261,32 +339,14 @@ def make_fake_omni_edm_mat_blocks(object: Object, material_wrap: FakeOmniLightMa
 
         if edm_props.SURFACE_MODE:  
             centers, normals, light_sizes, uv_layers = parse_faces(bpy_mesh, object)   
-            uvs = uv_layers['front']
-
-            for center, light_size, uv in zip(centers, light_sizes, uvs):
-                ## create omni light
-                edm_fake_omni = pyedm.FakeOmniLight()
-                edm_fake_omni.setSize(float(light_size))
-                edm_fake_omni.setPos(tuple(center))
-                (pt1, pt2) = tuple(map(tuple, uv))
-                edm_fake_omni.setUV(pt1, pt2)
-                fake_lights.append(edm_fake_omni)      
+            positions = centers
+            fake_lights = make_fake_omni_lights(centers, light_sizes, uv_layers['front'])
         else:
-            lights_anim_delay_list: List[FakeLightDelay] = []
-            FakeLightIndex = 0
-            for vertex in bpy_mesh.vertices:
-                pos: Tuple[float, float, float] = get_pos(vertex)
-                edm_fake_omni = pyedm.FakeOmniLight()
-                edm_fake_omni.setSize(light_size)
-                edm_fake_omni.setPos(pos)
-                edm_fake_omni.setUV(uv_start, uv_end)
-                fake_lights.append(edm_fake_omni)
-                if len(vertex.groups) > 0:
-                    is_vertex_group_set = True
-                    lights_anim_delay_list.append(vertex.groups[0].weight)
-                else:
-                    lights_anim_delay_list.append(0.0)
-                FakeLightIndex += 1
+            positions = get_vertices_positions(bpy_mesh)
+            fake_lights = make_fake_omni_lights(positions, light_size, (uv_start, uv_end))
+            vertex_groups = VertexGroupTable(bpy_mesh.vertices)
+            is_vertex_group_set = vertex_groups.has_groups()
+            lights_anim_delay_list: np.ndarray = vertex_groups.first_weights()
     elif object.type == ObjectTypeEnum.CURVE:
         pass
 
@@ -300,37 +360,44 @@ def make_fake_omni_edm_mat_blocks(object: Object, material_wrap: FakeOmniLightMa
     if is_luminance_animated and edm_props.LUMINANCE_ARG != -1:
         key_list: anim.KeyFramePoints = anim.extract_anim_float(material_wrap.material.node_tree.animation_data.action, luminance_animation_path)
         arg_n: int = edm_props.LUMINANCE_ARG
-        edm_luminance_prop = pyedm.PropertyFloat(arg_n, key_list)
-    
-    if is_brightness_animated and brightness_arg_n != -1 and is_vertex_group_set:
-        if object.type == edm_props.SURFACE_MODE:
-            log.debug("vertex groups are not supported for surface mode right now.")
-        else:
-            edm_render_node = pyedm.AnimatedFakeOmniLight(object.name)
-            key_list: anim.KeyFramePoints = anim.extract_anim_float(object.animation_data.action, brightness_animation_path)
-            fake_lights_anim_list: List[FakeLightIndex, anim.KeyFramePoints] = get_delay_anim_list(lights_anim_delay_list, key_list)
-            edm_render_node.setAnimationArg(brightness_arg_n)
-            edm_render_node.setLightsAnimation(fake_lights_anim_list)
+        luminance_prop_args = (arg_n, key_list)
+
+    is_rabbit: bool = is_brightness_animated and brightness_arg_n != -1 and is_vertex_group_set
+    if is_rabbit and edm_props.SURFACE_MODE:
+        log.debug("vertex groups are not supported for surface mode right now.")
+        is_rabbit = False
+    if is_rabbit:
+        brightness_key_list: anim.KeyFramePoints = anim.extract_anim_float(object.animation_data.action, brightness_animation_path)
     elif is_brightness_animated and brightness_arg_n != -1 and not is_vertex_group_set:
-        edm_render_node = pyedm.FakeOmniLights(object.name)
         key_list: anim.KeyFramePoints = anim.extract_anim_float(object.animation_data.action, brightness_animation_path)
-        edm_luminance_prop = pyedm.PropertyFloat(brightness_arg_n, key_list)
-    else:
-        edm_render_node = pyedm.FakeOmniLights(object.name)
+        luminance_prop_args = (brightness_arg_n, key_list)
+
+    edm_render_nodes: List[pyedm.FakeOmniLights] = []
+    for name, indices in get_fake_light_chunks(object, positions):
+        chunk_lights = get_chunk(fake_lights, indices)
+        if is_rabbit:
+            edm_render_node = pyedm.AnimatedFakeOmniLight(name)
+            fake_lights_anim_list: List[FakeLightIndex, anim.KeyFramePoints] = get_delay_anim_list(get_chunk(lights_anim_delay_list, indices), brightness_key_list)
+            edm_render_node.setAnimationArg(brightness_arg_n)
+            edm_render_node.setLightsAnimation(fake_lights_anim_list)
+        else:
+            edm_render_node = pyedm.FakeOmniLights(name)
 
-    edm_render_node.setMinSizeInPixels(min_size_pixels)
-    edm_render_node.setShiftToCamera(shift_to_camera)
-    edm_render_node.setLuminance(edm_luminance_prop)
-    edm_render_node.setTexture(light_texture)
-    edm_render_node.setMaxDistance(max_distance)
-    edm_render_node.set(fake_lights)
+        edm_render_node.setMinSizeInPixels(min_size_pixels)
+        edm_render_node.setShiftToCamera(shift_to_camera)
+        edm_render_node.setLuminance(pyedm.PropertyFloat(*luminance_prop_args))
+        edm_render_node.setTexture(light_texture)
+        edm_render_node.setMaxDistance(max_distance)
+        edm_render_node.set(chunk_lights)
+        edm_render_nodes.append(edm_render_node)
 
-    return edm_render_node
+    return edm_render_nodes
 
-def make_fake_spot_edm_mat_blocks(object: Object, material_wrap: FakeSpotLightMaterialWrap, mesh_storage: MeshStorage) -> pyedm.FakeSpotLights:
+# Returns render node for every chunk of lights, single one if clustering is off.
+def make_fake_spot_edm_mat_blocks(object: Object, material_wrap: FakeSpotLightMaterialWrap, mesh_storage: MeshStorage) -> List[pyedm.FakeSpotLights]:
     if material_wrap.node_group_type != NodeGroupTypeEnum.FAKE_SPOT:
         log.warning(f"{object.name} has no fake spot material.")
-        return None
+        return []
     
     edm_props = get_edm_props(object)
 
@@ -352,7 +419,8 @@ def make_fake_spot_edm_mat_blocks(object: Object, material_wrap: FakeSpotLightMa
     is_brightness_animated: bool = anim.has_path_anim(object.animation_data, brightness_animation_path)
     brightness_arg_n: int = utils.extract_arg_number(object.animation_data.action.name) if is_brightness_animated else -1
     
-    edm_luminance_prop = pyedm.PropertyFloat(luminance)
+    # Every render node gets its own property.
+    luminance_prop_args = (luminance,)
 
     # spot light characteristics
     phi: float = material_wrap.values.phi.value
@@ -376,11 +444,11 @@ def make_fake_spot_edm_mat_blocks(object: Object, material_wrap: FakeSpotLightMa
         light_direction = get_fake_light_direction(object) #: Tuple[float, float, float]
 
     fake_lights: List[pyedm.FakeSpotLight] = []
+    positions: np.ndarray = np.empty((0, 3), dtype=np.float32)
     lights_anim_delay_list: List[FakeLightDelay] = [] # only for rabbit lights
     is_vertex_group_set: bool = False
     
     if object.type == ObjectTypeEnum.MESH:
-        FakeLightIndex = 0
         bpy_mesh = get_mesh(object)
 
         if edm_props.SURFACE_MODE:
@@ -388,42 +456,18 @@ def make_fake_spot_edm_mat_blocks(object: Object, material_wrap: FakeSpotLightMa
             # TODO add support for multiple light direction in cpp native code
             light_direction = normals[0]
 
-            uvs_front = uv_layers['front']
-
-            for i, (center, light_size, uv_f) in enumerate(zip(centers, light_sizes, uvs_front)):
-                edm_fake_spot = pyedm.FakeSpotLight()
-                edm_fake_spot.setSize(float(light_size))
-                edm_fake_spot.setPos(tuple(center))
-                (pt1, pt2) = tuple(map(tuple, uv_f))
-                edm_fake_spot.setUV(pt1, pt2)         
-                if len(uv_layers) > 1:
-                    edm_fake_spot.setBackSide(True)
-                    (pt1, pt2) = tuple(map(tuple, uv_layers['back'][i]))
-                    edm_fake_spot.setBackUV(pt1, pt2)
-                else:
-                    edm_fake_spot.setBackSide(False)
-                
-                fake_lights.append(edm_fake_spot)
-
-                # TODO: not sure this is needed for surface mode
-                lights_anim_delay_list.append(0.0)
-                FakeLightIndex += 1
+            is_back_side: bool = len(uv_layers) > 1
+            positions = centers
+            fake_lights = make_fake_spot_lights(centers, light_sizes, uv_layers['front'], is_back_side, uv_layers['back'] if is_back_side else None)
+
+            # TODO: not sure this is needed for surface mode
+            lights_anim_delay_list = [0.0] * len(fake_lights)
         else:
-            for vertex in bpy_mesh.vertices:
-                pos: Tuple[float, float, float] = get_pos(vertex)
-                edm_fake_spot = pyedm.FakeSpotLight()
-                edm_fake_spot.setSize(light_size)
-                edm_fake_spot.setPos(pos)
-                edm_fake_spot.setUV(uv_start, uv_end)
-                edm_fake_spot.setBackSide(two_sided)
-                edm_fake_spot.setBackUV(uv_start_back, uv_end_back)
-                fake_lights.append(edm_fake_spot)
-                if len(vertex.groups) > 0:
-                    is_vertex_group_set = True
-                    lights_anim_delay_list.append(vertex.groups[0].weight)
-                else:
-                    lights_anim_delay_list.append(0.0)
-                FakeLightIndex += 1
+            positions = get_vertices_positions(bpy_mesh)
+            fake_lights = make_fake_spot_lights(positions, light_size, (uv_start, uv_end), two_sided, (uv_start_back, uv_end_back))
+            vertex_groups = VertexGroupTable(bpy_mesh.vertices)
+            is_vertex_group_set = vertex_groups.has_groups()
+            lights_anim_delay_list = vertex_groups.first_weights()
     elif object.type == ObjectTypeEnum.CURVE:
         pass
 
@@ -437,34 +481,40 @@ def make_fake_spot_edm_mat_blocks(object: Object, material_wrap: FakeSpotLightMa
     if is_luminance_animated and edm_props.LUMINANCE_ARG != -1:
         key_list: anim.KeyFramePoints = anim.extract_anim_float(material_wrap.material.node_tree.animation_data.action, luminance_animation_path)
         arg_n: int = edm_props.LUMINANCE_ARG
-        edm_luminance_prop = pyedm.PropertyFloat(arg_n, key_list)
+        luminance_prop_args = (arg_n, key_list)
 
     # light animation: rabbit lights
-    if is_brightness_animated and brightness_arg_n != -1 and is_vertex_group_set:
-        edm_render_node = pyedm.AnimatedFakeSpotLight(object.name)
-        key_list: anim.KeyFramePoints = anim.extract_anim_float(object.animation_data.action, brightness_animation_path)
-        fake_lights_anim_list: List[FakeLightIndex, anim.KeyFramePoints] = get_delay_anim_list(lights_anim_delay_list, key_list)
-        edm_render_node.setAnimationArg(brightness_arg_n)
-        edm_render_node.setLightsAnimation(fake_lights_anim_list)
+    is_rabbit: bool = is_brightness_animated and brightness_arg_n != -1 and is_vertex_group_set
+    if is_rabbit:
+        brightness_key_list: anim.KeyFramePoints = anim.extract_anim_float(object.animation_data.action, brightness_animation_path)
     # light animation: flashing lamp
     elif is_brightness_animated and brightness_arg_n != -1 and not is_vertex_group_set:
-        edm_render_node = pyedm.FakeSpotLights(object.name)
         key_list: anim.KeyFramePoints = anim.extract_anim_float(object.animation_data.action, brightness_animation_path)
-        edm_luminance_prop = pyedm.PropertyFloat(brightness_arg_n, key_list)
-    # no animation
-    else:
-        edm_render_node = pyedm.FakeSpotLights(object.name)
+        luminance_prop_args = (brightness_arg_n, key_list)
+
+    edm_render_nodes: List[pyedm.FakeSpotLights] = []
+    for name, indices in get_fake_light_chunks(object, positions):
+        chunk_lights = get_chunk(fake_lights, indices)
+        if is_rabbit:
+            edm_render_node = pyedm.AnimatedFakeSpotLight(name)
+            fake_lights_anim_list: List[FakeLightIndex, anim.KeyFramePoints] = get_delay_anim_list(get_chunk(lights_anim_delay_list, indices), brightness_key_list)
+            edm_render_node.setAnimationArg(brightness_arg_n)
+            edm_render_node.setLightsAnimation(fake_lights_anim_list)
+        # no animation or flashing lamp
+        else:
+            edm_render_node = pyedm.FakeSpotLights(name)
 
-    edm_render_node.setMinSizeInPixels(min_size_pixels)
-    edm_render_node.setShiftToCamera(shift_to_camera)
-    edm_render_node.setLuminance(edm_luminance_prop)
-    edm_render_node.setConeSetup(cone_setup)
-    edm_render_node.setDirection(light_direction)
-    edm_render_node.setMaxDistance(max_distance)    
-    edm_render_node.setTexture(light_texture)
-    edm_render_node.set(fake_lights)
+        edm_render_node.setMinSizeInPixels(min_size_pixels)
+        edm_render_node.setShiftToCamera(shift_to_camera)
+        edm_render_node.setLuminance(pyedm.PropertyFloat(*luminance_prop_args))
+        edm_render_node.setConeSetup(cone_setup)
+        edm_render_node.setDirection(light_direction)
+        edm_render_node.setMaxDistance(max_distance)    
+        edm_render_node.setTexture(light_texture)
+        edm_render_node.set(chunk_lights)
+        edm_render_nodes.append(edm_render_node)
 
-    return edm_render_node
+    return edm_render_nodes
 
 class FakeLightChildPanel(bpy.types.Panel):
     bl_label = "Fake light type Properties"
@@ -524,3 +574,12 @@ class FakeLightChildPanel(bpy.types.Panel):
         
         row = layout.row()        
         row.prop(props, "ANIMATED_BRIGHTNESS")
+
+        box = layout.box()
+        row = box.row()
+        row.prop(props, "CLUSTER_LIGHTS")
+        if props.CLUSTER_LIGHTS:
+            row = box.row()
+            row.prop(props, "CLUSTER_MAX_LIGHTS")
+            row = box.row()
+            row.prop(props, "CLUSTER_MAX_EXTENT")
@@ -162,11 +162,15 @@ def light_animation_terms(object: Object) -> Set[str]:
         anim_ch_paths = anim.get_anim_ch_paths(action)
     return anim_ch_paths
 
-class LightData:
-    def __init__(self, object: Object, transform_node: pyedm.Node) -> None:
-        self.light_transform = pyedm.Transform('Fake Light Transform', Matrix.Rotation(radians(90.0), 4, 'Y'))
-        transform_node.addChild(self.light_transform)
+def get_max_key_value(keys: anim.KeyFramePoints, value: float) -> float:
+    return max([value] + [v for _, v in keys]) if keys else value
 
+LIGHT_ARG_PROPS = ('LIGHT_COLOR_ARG', 'LIGHT_POWER_ARG', 'LIGHT_DISTANCE_ARG', 'LIGHT_SPECULAR_ARG', 'LIGHT_PHY_ARG', 'LIGHT_THETA_ARG')
+
+## Properties of light datablock with their animation. They depend only on datablock and light args of object,
+## so they are shared by all objects using the same datablock with the same args.
+class LightProps:
+    def __init__(self, object: Object) -> None:
         self.blender_lamp: Light = object.data
         edm_props = get_edm_props(object)
         anim_ch_paths: Set[str] = light_animation_terms(object)
@@ -196,12 +200,14 @@ class LightData:
         else:
             self.edm_intensity_prop = pyedm.PropertyFloat(self.light_intensity)
 
-        if not self.blender_lamp.use_custom_distance:
-            log.warning(f"{object.name} light has no custom distance set.")
         self.light_distance = gather_range(self.blender_lamp)
+        # bounds of light influence cover all animated values
+        self.max_distance: float = self.light_distance
+        self.max_cone_angle: float = None
         if terms_map[anim.Data_Path_Enum.CUTOFF_DISTANCE]:
             distance_keys = anim.extract_anim_float(action, anim.Data_Path_Enum.CUTOFF_DISTANCE)
             self.edm_distance_prop = pyedm.PropertyFloat(edm_props.LIGHT_DISTANCE_ARG, distance_keys)
+            self.max_distance = get_max_key_value(distance_keys, self.light_distance)
         else:
             self.edm_distance_prop = pyedm.PropertyFloat(self.light_distance)
 
@@ -216,9 +222,11 @@ class LightData:
             blender_spot_light: SpotLight = self.blender_lamp
 
             self.phy = gather_outer_cone_angle(blender_spot_light)
+            self.max_cone_angle = self.phy
             if terms_map[anim.Data_Path_Enum.SPOT_SIZE]:
                 spot_size_keys = anim.extract_anim_float(action, anim.Data_Path_Enum.SPOT_SIZE, phy_angle_clamp)
                 self.edm_phy_prop = pyedm.PropertyFloat(edm_props.LIGHT_PHY_ARG, spot_size_keys, False)
+                self.max_cone_angle = get_max_key_value(spot_size_keys, self.phy)
             else:
                 self.edm_phy_prop = pyedm.PropertyFloat(self.phy)
             
@@ -231,8 +239,58 @@ class LightData:
             else:
                 self.edm_blend_prop = pyedm.PropertyFloat(self.theta)
 
-def make_spot_light(object: Object, transform_node: pyedm.Node) -> pyedm.SpotLight:
-    light_data: LightData = LightData(object, transform_node)
+## Light properties of current export by light datablock and light args.
+## Holds pyedm objects, so it's cleared when export job is destroyed.
+class LightCache:
+    def __init__(self) -> None:
+        self.props: Dict[Tuple[Light, Tuple[int, ...]], LightProps] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def clear(self) -> None:
+        self.props.clear()
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats_string(self) -> str:
+        return f'{self.hits} of {self.hits + self.misses} lights reused cached properties'
+
+    def get(self, object: Object) -> LightProps:
+        edm_props = get_edm_props(object)
+        key = (object.data, tuple(getattr(edm_props, x) for x in LIGHT_ARG_PROPS))
+        props: LightProps = self.props.get(key)
+        if props:
+            self.hits += 1
+            return props
+
+        props = LightProps(object)
+        self.props[key] = props
+        self.misses += 1
+        return props
+
+light_cache = LightCache()
+
+class LightData:
+    def __init__(self, object: Object, transform_node: pyedm.Node) -> None:
+        self.light_transform = pyedm.Transform('Fake Light Transform', Matrix.Rotation(radians(90.0), 4, 'Y'))
+        transform_node.addChild(self.light_transform)
+
+        self.props: LightProps = light_cache.get(object)
+        self.blender_lamp: Light = self.props.blender_lamp
+        if not self.blender_lamp.use_custom_distance:
+            log.warning(f"{object.name} light has no custom distance set.")
+
+        self.edm_color_prop = self.props.edm_color_prop
+        self.edm_intensity_prop = self.props.edm_intensity_prop
+        self.edm_distance_prop = self.props.edm_distance_prop
+        self.edm_specular_prop = self.props.edm_specular_prop
+        if self.blender_lamp.type == LampTypeEnum.SPOT:
+            self.edm_phy_prop = self.props.edm_phy_prop
+            self.edm_blend_prop = self.props.edm_blend_prop
+
+def make_spot_light(object: Object, light_data: LightData) -> pyedm.SpotLight:
     edm_props = get_edm_props(object)
 
     softness_animation_path: str = 'EDMProps.LIGHT_SOFTNESS'
@@ -257,8 +315,7 @@ def make_spot_light(object: Object, transform_node: pyedm.Node) -> pyedm.SpotLig
 
     return edm_light
 
-def make_point_light(object: Object, transform_node: pyedm.Node) -> pyedm.OmniLight:
-    light_data: LightData = LightData(object, transform_node)
+def make_point_light(object: Object, light_data: LightData) -> pyedm.OmniLight:
     edm_props = get_edm_props(object)
 
     softness_animation_path: str = 'EDMProps.LIGHT_SOFTNESS'
@@ -281,15 +338,19 @@ def make_point_light(object: Object, transform_node: pyedm.Node) -> pyedm.OmniLi
 
     return edm_light
 
-def export_light(object: Object, transform_node: pyedm.Node):
-    edm_light = None
+# Returns (edm light, light data), edm light is None if type of light isn't supported.
+def export_light(object: Object, transform_node: pyedm.Node) -> Tuple[pyedm.Node, LightData]:
     blender_lamp: Light = object.data
+    if blender_lamp.type not in (LampTypeEnum.SPOT, LampTypeEnum.POINT):
+        return None, None
+
+    light_data: LightData = LightData(object, transform_node)
     if blender_lamp.type == LampTypeEnum.SPOT:
-        edm_light = make_spot_light(object, transform_node)
-    elif blender_lamp.type == LampTypeEnum.POINT:
-        edm_light = make_point_light(object, transform_node)
+        edm_light = make_spot_light(object, light_data)
+    else:
+        edm_light = make_point_light(object, light_data)
             
-    return edm_light
+    return edm_light, light_data
 
 def is_light(object: Object) -> bool:
     if object.type == ObjectTypeEnum.LIGHT or object.type == ObjectTypeEnum.LAMP:
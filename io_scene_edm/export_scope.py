@@ -0,0 +1,134 @@
+import os.path
+import re
+from dataclasses import dataclass, field
+from typing import List, Set
+
+from bpy.types import PropertyGroup, Scene, Object, Context, Collection
+from bpy.props import EnumProperty, IntProperty
+
+from objects_custom_props import get_edm_props
+from enums import ObjectTypeEnum
+from utils import extract_lod
+
+class EDMExportScopePropsGroup(PropertyGroup):
+    bl_idname = "edm.EDMExportScopePropsGroup"
+
+    SCOPE : EnumProperty(
+        name = "Export scope",
+        description = "Which objects are exported. Objects they depend on are exported too",
+        items = [
+            ('SCENE',       'Scene',                "Whole scene",                                          0),
+            ('SELECTED',    'Selected',             "Selected objects",                                     1),
+            ('COLLECTION',  'Active collection',    "Objects of active collection and its children",        2),
+            ('LOD',         'Lod',                  "Objects of lod collections with given lod id",         3),
+        ],
+        default = 'SCENE',
+        options = {'SKIP_SAVE'},
+    ) # type: ignore
+
+    LOD_ID : IntProperty(
+        name = "Lod id",
+        default = 0,
+        min = 0,
+        options = {'SKIP_SAVE'},
+    )
+
+def get_export_scope_props(o: Scene) -> EDMExportScopePropsGroup:
+    return o.EDMExportScopeProps
+
+# Suffix of file of scoped export, None for whole scene.
+def get_scope_suffix(context: Context, props: EDMExportScopePropsGroup) -> str:
+    if props.SCOPE == 'SELECTED':
+        return 'selected'
+    if props.SCOPE == 'COLLECTION':
+        name: str = context.view_layer.active_layer_collection.collection.name
+        return re.sub(r'[^\w\-]+', '_', name)
+    if props.SCOPE == 'LOD':
+        return f'lod{props.LOD_ID}'
+    return None
+
+## Scoped export is written to '<name>.<scope>.edm' next to full model,
+## so full model and its '.sha256' and '.objects.csv' files aren't replaced by subset of scene.
+def get_scope_file_path(context: Context, file_path: str) -> str:
+    if not context.scene:
+        return file_path
+    suffix: str = get_scope_suffix(context, get_export_scope_props(context.scene))
+    if not suffix:
+        return file_path
+    root, ext = os.path.splitext(file_path)
+    return f'{root}.{suffix}{ext}'
+
+def get_export_scope_classes():
+    return [EDMExportScopePropsGroup]
+
+## Subset of scene objects to export.
+## 'objects' is closed under dependencies: every object has its parent in the set.
+## 'transform_only' objects are exported only as transforms to place their children, their geometry is skipped.
+@dataclass
+class ExportScope:
+    objects: Set[str] = field(default_factory=set)
+    transform_only: Set[str] = field(default_factory=set)
+
+def is_scope_box(obj: Object) -> bool:
+    return obj.type == ObjectTypeEnum.EMPTY and get_edm_props(obj).SPECIAL_TYPE in ('USER_BOX', 'BOUNDING_BOX', 'LIGHT_BOX')
+
+def get_lod_objects(scene: Scene, lod_id: int) -> List[Object]:
+    result: List[Object] = []
+    for collection in scene.collection.children_recursive:
+        lod = extract_lod(collection.name)
+        if lod and lod.id == lod_id:
+            result.extend(collection.all_objects)
+    return result
+
+def get_scope_objects(context: Context, props: EDMExportScopePropsGroup) -> List[Object]:
+    if props.SCOPE == 'SELECTED':
+        return list(context.selected_objects)
+    if props.SCOPE == 'COLLECTION':
+        collection: Collection = context.view_layer.active_layer_collection.collection
+        return list(collection.all_objects)
+    if props.SCOPE == 'LOD':
+        return get_lod_objects(context.scene, props.LOD_ID)
+    return []
+
+## Builds minimal dependency closure of objects in scope:
+## objects themselves, armatures of their skins with parent chains, model boxes of scene.
+## Parents which are only needed to place children are exported as transforms.
+## Returns None if whole scene is exported.
+def build_export_scope(context: Context) -> ExportScope:
+    if not context.scene:
+        return None
+    props = get_export_scope_props(context.scene)
+    if props.SCOPE == 'SCENE':
+        return None
+
+    # mesh modules are imported on first export, register of add-on loads only props of this module
+    from mesh_storage import get_armature_from_modifiers
+    scope = ExportScope()
+    scene_objects: Set[str] = {x.name for x in context.scene.objects}
+
+    def add_object(obj: Object, transform_only: bool) -> None:
+        while obj and obj.name in scene_objects:
+            if obj.name in scope.objects:
+                if not transform_only:
+                    scope.transform_only.discard(obj.name)
+                return
+            scope.objects.add(obj.name)
+            if transform_only:
+                scope.transform_only.add(obj.name)
+            # Bones of skin live in armature, it's exported fully.
+            if obj.type == ObjectTypeEnum.MESH:
+                armature = get_armature_from_modifiers(obj.modifiers)
+                if armature:
+                    add_object(armature, False)
+            obj = obj.parent
+            transform_only = True
+
+    for obj in get_scope_objects(context, props):
+        add_object(obj, False)
+
+    # Model boxes are cheap and scope without them gets default boxes.
+    for obj in context.scene.objects:
+        if is_scope_box(obj):
+            add_object(obj, False)
+
+    return scope
@@ -0,0 +1,121 @@
+import json
+from dataclasses import dataclass
+from math import ceil, cos, pi, sin
+from typing import Dict, List, Tuple
+
+import numpy as np
+from mathutils import Matrix
+
+from math_tools import AaBb
+
+## Influence volumes of real lights and their assignment to uniform grid of model.
+## They are computed at export, so client doesn't build them when model is loaded.
+## Model format has no place for them, they are written to '<model>.lights.json' next to model.
+## Omni light influences sphere of its range, spot light influences spherical sector of its range
+## and cone angle, it's bounded by the smallest sphere containing the sector.
+## Animated range and cone angle are bounded by their maximum over keys.
+
+# Average number of lights in cell grid resolution is chosen for.
+GRID_LIGHTS_PER_CELL = 4
+GRID_MAX_CELLS_PER_AXIS = 64
+
+@dataclass
+class LightBounds:
+    center: Tuple[float, float, float]
+    radius: float
+    aa_bb: AaBb
+
+## Lights of cell 'i' are 'light_indices[cell_offsets[i] : cell_offsets[i + 1]]', indices are in 'names' order.
+## Cell (x, y, z) has index x + dims[0] * (y + dims[1] * z).
+@dataclass
+class LightGrid:
+    origin: Tuple[float, float, float]
+    cell_size: float
+    dims: Tuple[int, int, int]
+    names: List[str]
+    cell_offsets: np.ndarray
+    light_indices: np.ndarray
+
+    def get_cell_lights(self, cell: int) -> List[str]:
+        return [self.names[i] for i in self.light_indices[self.cell_offsets[cell] : self.cell_offsets[cell + 1]]]
+
+# Smallest sphere containing spherical sector with apex, unit axis, radius and half angle.
+def get_sector_sphere(apex: np.ndarray, axis: np.ndarray, radius: float, half_angle: float) -> Tuple[np.ndarray, float]:
+    if half_angle >= pi * 0.25:
+        # sphere around base disc contains apex and cap of sector
+        return apex + axis * (radius * cos(half_angle)), radius * sin(half_angle)
+    # sphere through apex and base circle
+    sphere_radius: float = radius / (2.0 * cos(half_angle))
+    return apex + axis * sphere_radius, sphere_radius
+
+## Bounds of light in space of 'matrix'. Blender light shines along -Z of its object.
+## 'cone_angle' is full angle of spot light cone, None for omni light. Range is scaled with light transform.
+def get_light_bounds(matrix: Matrix, distance: float, cone_angle: float = None) -> LightBounds:
+    m = np.array(matrix, dtype=np.float64)
+    position: np.ndarray = m[:3, 3]
+    radius: float = distance * float(np.max(np.linalg.norm(m[:3, :3], axis=0)))
+    if cone_angle is None or radius <= 0.0:
+        center = position
+    else:
+        axis: np.ndarray = -m[:3, 2]
+        length: float = float(np.linalg.norm(axis))
+        if length > 0.0:
+            center, radius = get_sector_sphere(position, axis / length, radius, cone_angle * 0.5)
+        else:
+            center = position
+    aa_bb: AaBb = tuple((center - radius).tolist() + (center + radius).tolist())
+    return LightBounds(tuple(center.tolist()), radius, aa_bb)
+
+## Assigns lights to cells of uniform grid over their bounds, light is in every cell its sphere touches.
+def build_light_grid(bounds: Dict[str, LightBounds]) -> LightGrid:
+    names: List[str] = list(bounds.keys())
+    centers = np.array([bounds[x].center for x in names], dtype=np.float64).reshape((-1, 3))
+    radii = np.array([bounds[x].radius for x in names], dtype=np.float64)
+    lo: np.ndarray = (centers - radii[:, None]).min(axis=0)
+    extent: np.ndarray = np.maximum((centers + radii[:, None]).max(axis=0) - lo, 1.0e-6)
+
+    cells_count: float = max(1.0, len(names) / GRID_LIGHTS_PER_CELL)
+    cell_size: float = float(np.cbrt(np.prod(extent) / cells_count))
+    cell_size = max(cell_size, float(extent.max()) / GRID_MAX_CELLS_PER_AXIS)
+    dims = np.array([max(1, ceil(x / cell_size)) for x in extent], dtype=np.int64)
+
+    cell_ids: List[np.ndarray] = []
+    light_ids: List[np.ndarray] = []
+    for i in range(len(names)):
+        first = np.clip(((centers[i] - radii[i] - lo) / cell_size).astype(np.int64), 0, dims - 1)
+        last = np.clip(((centers[i] + radii[i] - lo) / cell_size).astype(np.int64), 0, dims - 1)
+        xyz = np.stack(np.meshgrid(*[np.arange(a, b + 1) for a, b in zip(first, last)], indexing='ij'), axis=-1).reshape((-1, 3))
+
+        # keep cells whose box is within light radius of light center
+        cell_lo = lo + xyz * cell_size
+        nearest = np.clip(centers[i], cell_lo, cell_lo + cell_size)
+        xyz = xyz[np.sum((nearest - centers[i]) ** 2, axis=1) <= radii[i] * radii[i]]
+
+        cell_ids.append(xyz[:, 0] + dims[0] * (xyz[:, 1] + dims[1] * xyz[:, 2]))
+        light_ids.append(np.full(len(xyz), i, dtype=np.int64))
+
+    cells = np.concatenate(cell_ids) if cell_ids else np.empty(0, dtype=np.int64)
+    lights = np.concatenate(light_ids) if light_ids else np.empty(0, dtype=np.int64)
+    order = np.argsort(cells, kind='stable')
+    cell_offsets = np.zeros(int(np.prod(dims)) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cells, minlength=int(np.prod(dims))), out=cell_offsets[1:])
+    return LightGrid(tuple(lo.tolist()), cell_size, tuple(dims.tolist()), names, cell_offsets, lights[order])
+
+LIGHT_GRID_FORMAT_VERSION = 1
+
+def get_light_grid_dict(bounds: Dict[str, LightBounds], grid: LightGrid) -> dict:
+    return {
+        'version': LIGHT_GRID_FORMAT_VERSION,
+        'lights': [{'name': x, 'center': list(bounds[x].center), 'radius': bounds[x].radius, 'aa_bb': list(bounds[x].aa_bb)} for x in grid.names],
+        'origin': list(grid.origin),
+        'cell_size': grid.cell_size,
+        'dims': list(grid.dims),
+        'cell_offsets': grid.cell_offsets.tolist(),
+        'light_indices': grid.light_indices.tolist(),
+    }
+
+# Lights are in order of 'grid.names', lights of cell are indices into them.
+def write_light_grid(file_path: str, bounds: Dict[str, LightBounds], grid: LightGrid) -> None:
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(get_light_grid_dict(bounds, grid), f, separators=(',', ':'))
+        f.write('\n')
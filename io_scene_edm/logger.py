@@ -1,3 +1,8 @@
+import csv
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import List, Tuple
+
 from pyedm_platform_selector import pyedm
 from edm_exception import EdmFatalException, EdmException
 
@@ -24,38 +29,166 @@ class LogCtx:
 
 LOG_CTX = None
 
+class LogLevel(IntEnum):
+    DEBUG   = 10
+    INFO    = 20
+    WARNING = 30
+    ERROR   = 40
+
+## Writes every message to console of native library at once.
+class ConsoleSink:
+    def write(self, level: LogLevel, msg: str) -> None:
+        if level >= LogLevel.ERROR:
+            pyedm.log_error(msg)
+        elif level >= LogLevel.WARNING:
+            pyedm.log_warning(msg)
+        elif level >= LogLevel.INFO:
+            pyedm.log_info(msg)
+        else:
+            pyedm.log_debug(msg)
+
+    def flush(self) -> None:
+        pass
+
+## Keeps messages and writes them in batches: to file if 'file_path' is set, to console otherwise.
+## Consecutive console messages of the same level are joined to one call.
+class BufferedSink:
+    def __init__(self, batch_size: int = 256, file_path: str = None) -> None:
+        self.batch_size = batch_size
+        self.file_path = file_path
+        self.messages: List[Tuple[LogLevel, str]] = []
+        self.console = ConsoleSink()
+
+    def write(self, level: LogLevel, msg: str) -> None:
+        self.messages.append((level, msg))
+        if len(self.messages) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.messages:
+            return
+        messages, self.messages = self.messages, []
+        if self.file_path:
+            try:
+                with open(self.file_path, 'a', encoding='utf-8') as f:
+                    f.writelines(f'{level.name}: {msg}\n' for level, msg in messages)
+                return
+            except OSError as e:
+                self.file_path = None
+                messages.append((LogLevel.WARNING, f"Can't write log file. Reason: {e}."))
+        start: int = 0
+        for i in range(1, len(messages) + 1):
+            if i == len(messages) or messages[i][0] != messages[start][0]:
+                self.console.write(messages[start][0], '\n'.join(msg for _, msg in messages[start:i]))
+                start = i
+
+## Exported object for table of objects.
+@dataclass
+class ObjectRecord:
+    name: str
+    kind: str
+    details: str = ''
+    control_node: str = ''
+    triangles: int = None
+
+    def __str__(self) -> str:
+        out: str = f'{self.name} as {self.kind}'
+        if self.details:
+            out += f' {self.details}'
+        if self.control_node:
+            out += f'. Control node: {self.control_node}'
+        if self.triangles is not None:
+            out += f'. N triangles: {self.triangles}.'
+        return out
+
+OBJECT_TABLE_COLUMNS = ('name', 'kind', 'details', 'control_node', 'triangles')
+
+## Messages are checked against 'level' before formatting, '%' arguments are formatted only for written messages.
+## Errors are always written through sink like other messages and flush it, so they aren't delayed.
 class Logger:
 
     def __init__(self) -> None:
         self.errors = []
         self.warnings = []
+        self.level: LogLevel = LogLevel.DEBUG
+        self.sink = ConsoleSink()
+        # exported objects are collected here instead of being written when it isn't None
+        self.objects: List[ObjectRecord] = None
 
     def reset(self):
         self.errors = []
         self.warnings = []
 
-    def fatal(self, msg):
-        emsg = f'{LOG_CTX if LOG_CTX else ""}{msg}'
+    def set_level(self, level: LogLevel) -> None:
+        self.level = level
+
+    def is_enabled_for(self, level: LogLevel) -> bool:
+        return level >= self.level
+
+    # Previous sink is flushed.
+    def set_sink(self, sink) -> None:
+        self.sink.flush()
+        self.sink = sink
+
+    def flush(self) -> None:
+        self.sink.flush()
+
+    def format(self, msg, args) -> str:
+        if args:
+            msg = msg % args
+        return f'{LOG_CTX if LOG_CTX else ""}{msg}'
+
+    def write_error(self, emsg: str) -> None:
         self.errors.append(emsg)
-        pyedm.log_error(emsg)
+        self.sink.write(LogLevel.ERROR, emsg)
+        self.sink.flush()
+
+    def fatal(self, msg, *args):
+        emsg = self.format(msg, args)
+        self.write_error(emsg)
         raise EdmFatalException(emsg)
 
-    def error(self, msg):
-        emsg = f'{LOG_CTX if LOG_CTX else ""}{msg}'
-        self.errors.append(emsg)
-        pyedm.log_error(emsg)
+    def error(self, msg, *args):
+        emsg = self.format(msg, args)
+        self.write_error(emsg)
 #        raise EdmException(emsg)
 
-    def warning(self, msg, verbosity_level = 0):
-        emsg = f'{LOG_CTX if LOG_CTX else ""}{msg}'
-        pyedm.log_warning(emsg)
+    def warning(self, msg, *args):
+        if self.level > LogLevel.WARNING:
+            return
+        self.sink.write(LogLevel.WARNING, self.format(msg, args))
+
+    def info(self, msg, *args):
+        if self.level > LogLevel.INFO:
+            return
+        self.sink.write(LogLevel.INFO, self.format(msg, args))
+
+    def debug(self, msg, *args):
+        if self.level > LogLevel.DEBUG:
+            return
+        self.sink.write(LogLevel.DEBUG, self.format(msg, args))
+
+    ## Exported object, is added to table of objects if it's collected, written as info otherwise.
+    def object(self, name: str, kind: str, details: str = '', control_node: str = '', triangles: int = None) -> None:
+        if self.objects is not None:
+            self.objects.append(ObjectRecord(name, kind, details, control_node, triangles))
+        elif self.level <= LogLevel.INFO:
+            self.sink.write(LogLevel.INFO, self.format(ObjectRecord(name, kind, details, control_node, triangles), None))
 
-    def info(self, msg, verbosity_level = 0):
-        emsg = f'{LOG_CTX if LOG_CTX else ""}{msg}'
-        pyedm.log_info(emsg)
+    def start_object_table(self) -> None:
+        self.objects = []
 
-    def debug(self, msg):
-        emsg = f'{LOG_CTX if LOG_CTX else ""}{msg}'
-        pyedm.log_debug(emsg)
+    # Writes collected objects to csv file and stops collecting.
+    def write_object_table(self, path: str) -> None:
+        objects, self.objects = self.objects, None
+        if objects is None:
+            return
+        try:
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(OBJECT_TABLE_COLUMNS)
+                writer.writerows((x.name, x.kind, x.details, x.control_node, '' if x.triangles is None else x.triangles) for x in objects)
+        except OSError as e:
+            self.warning("Can't write table of objects %s. Reason: %s.", path, e)
 
-log = Logger()
\ No newline at end of file
+log = Logger()
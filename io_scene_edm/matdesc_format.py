@@ -0,0 +1,295 @@
+import importlib
+import marshal
+import mmap
+import pickle
+import struct
+from collections import deque
+from collections.abc import Mapping
+from typing import Any, Callable, Deque, Dict, Iterator, List, Tuple
+
+## Compact material description format, replaces pickled 'MatDesc' files.
+## Description objects ('MatDesc', 'SNode*', 'SLink', 'SInput', 'SOutput', 'ramp_type') are stored
+## as flat tables of objects and their fields, so file doesn't depend on class layout beyond field names
+## and every material is decoded on its own. File is read through mmap.
+##
+## What it buys over pickles:
+##   - loading runs no code from file: only classes of 'TYPE_TAGS' are created, field values are plain marshal data;
+##   - classes are stored by stable type tags, so they can be moved or renamed by updating 'TYPE_TAGS' only;
+##   - single material is decoded without reading others.
+## It isn't faster on full load, decoding of all materials is a bit slower than C unpickle, see 'benchmarks'.
+##
+## Layout, little endian:
+##   header:     magic 'EDMD', u32 version, u32 materials count, u32 strings offset
+##   directory:  per material: u32 name string, u32 section offset, u32 section size
+##   sections:   per material:
+##       u32 objects count, u32 fields count, u32 references count, u32 values size
+##       objects:    per object: u32 type tag string, u32 first field, u32 fields count
+##       fields:     per field: u32 name string
+##       references: per field referencing objects: u32 field, u32 owner object, u32 kind, see 'FieldKind'
+##       values:     values of all fields in field order, marshal list of version 'MARSHAL_VERSION'
+##   strings:    u32 count, u32 offsets[count + 1], utf-8 data
+## Object 0 of section is 'MatDesc' of material.
+## Every object is stored once and referenced by its index in section, so objects shared by several fields
+## and reference cycles are restored as they were. Objects aren't shared between materials.
+## Values are plain python data: None, bool, int, float, str, tuples and lists of them.
+
+MAGIC = b'EDMD'
+FORMAT_VERSION = 2
+MARSHAL_VERSION = 4
+
+HEADER = struct.Struct('<4sIII')
+DIRECTORY_ROW = struct.Struct('<III')
+SECTION_HEADER = struct.Struct('<IIII')
+OBJECT_ROW = struct.Struct('<III')
+FIELD_ROW = struct.Struct('<I')
+REFERENCE_ROW = struct.Struct('<III')
+U32 = struct.Struct('<I')
+
+class FieldKind:
+    OBJECT  = 1     # value is index of object
+    OBJECTS = 2     # value is list of indices of objects
+
+## Stable type tags of description classes: tag -> (module, class name).
+## Tags are stored in file instead of class paths, only these classes can be created by loader.
+TYPE_TAGS: Dict[str, Tuple[str, str]] = {
+    'MatDesc':              ('serializer_tools', 'MatDesc'),
+    'SLink':                ('serializer', 'SLink'),
+    'SInput':               ('serializer', 'SInput'),
+    'SOutput':              ('serializer', 'SOutput'),
+    'ramp_type':            ('serializer', 'ramp_type'),
+    'SNode':                ('serializer', 'SNode'),
+    'SNodeMixRGB':          ('serializer', 'SNodeMixRGB'),
+    'SNodeMix':             ('serializer', 'SNodeMix'),
+    'SNodeSeparateColor':   ('serializer', 'SNodeSeparateColor'),
+    'SNodeSeparateRGB':     ('serializer', 'SNodeSeparateRGB'),
+    'SNodeColorRamp':       ('serializer', 'SNodeColorRamp'),
+    'SNodeInvert':          ('serializer', 'SNodeInvert'),
+    'SNodeCombineRGB':      ('serializer', 'SNodeCombineRGB'),
+    'SNodeNormalMap':       ('serializer', 'SNodeNormalMap'),
+    'SNodeBsdfPrincipled':  ('serializer', 'SNodeBsdfPrincipled'),
+    'SNodeGroupInput':      ('serializer', 'SNodeGroupInput'),
+    'SNodeGroupOutput':     ('serializer', 'SNodeGroupOutput'),
+    'SNodeReroute':         ('serializer', 'SNodeReroute'),
+    'SShaderNode':          ('serializer', 'SShaderNode'),
+    'SShaderNodeMath':      ('serializer', 'SShaderNodeMath'),
+}
+
+TAG_OF_CLASS: Dict[Tuple[str, str], str] = {v: k for k, v in TYPE_TAGS.items()}
+
+# Modules of pickled classes, they are read as plain records by 'RecordUnpickler'.
+CLASS_MODULES = ('serializer', 'serializer_tools')
+
+def get_type_tag(o: Any) -> str:
+    tag: str = TAG_OF_CLASS.get((type(o).__module__, type(o).__name__))
+    if tag is None:
+        raise ValueError(f"Class {type(o).__module__}.{type(o).__name__} has no type tag in material description format.")
+    return tag
+
+def resolve_type_tag(tag: str) -> type:
+    entry = TYPE_TAGS.get(tag)
+    if entry is None:
+        raise ValueError(f"Type tag {tag} is unknown in material description.")
+    module, cls = entry
+    return getattr(importlib.import_module(module), cls)
+
+def is_object(v: Any) -> bool:
+    return hasattr(v, '__dict__')
+
+class StringTable:
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def add(self, s: str) -> int:
+        i = self.ids.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.ids[s] = i
+            self.strings.append(s)
+        return i
+
+    def to_bytes(self) -> bytes:
+        data = [s.encode('utf-8') for s in self.strings]
+        offsets = [0]
+        for d in data:
+            offsets.append(offsets[-1] + len(d))
+        return U32.pack(len(data)) + struct.pack(f'<{len(offsets)}I', *offsets) + b''.join(data)
+
+class SectionWriter:
+    def __init__(self, strings: StringTable) -> None:
+        self.strings = strings
+        self.objects: List[Tuple[int, int, int]] = []
+        self.fields: List[int] = []
+        self.references: List[Tuple[int, int, int]] = []
+        self.values: List[Any] = []
+        self.pending: Deque[Tuple[int, Any]] = deque()
+        # Index of every added object by its id, objects are alive while root is written.
+        self.indices: Dict[int, int] = {}
+
+    # Reserves index of object, its fields are written after fields of current object.
+    # Object which is already added gets its index back, so shared objects and cycles are stored once.
+    def add_object(self, o: Any) -> int:
+        index = self.indices.get(id(o))
+        if index is not None:
+            return index
+        index = len(self.objects)
+        self.indices[id(o)] = index
+        self.objects.append(None)
+        self.pending.append((index, o))
+        return index
+
+    def add_field(self, owner: int, name: str, value: Any) -> None:
+        if is_object(value):
+            self.references.append((len(self.fields), owner, FieldKind.OBJECT))
+            value = self.add_object(value)
+        elif isinstance(value, list) and value and all(is_object(x) for x in value):
+            self.references.append((len(self.fields), owner, FieldKind.OBJECTS))
+            value = [self.add_object(x) for x in value]
+        self.fields.append(self.strings.add(name))
+        self.values.append(value)
+
+    def write(self, root: Any) -> None:
+        self.add_object(root)
+        while self.pending:
+            index, o = self.pending.popleft()
+            items = list(vars(o).items())
+            first = len(self.fields)
+            for name, value in items:
+                self.add_field(index, name, value)
+            self.objects[index] = (self.strings.add(get_type_tag(o)), first, len(items))
+
+    def to_bytes(self) -> bytes:
+        try:
+            values: bytes = marshal.dumps(self.values, MARSHAL_VERSION)
+        except ValueError as e:
+            raise ValueError(f"Material description has value which can't be stored: {e}.")
+        out = bytearray(SECTION_HEADER.pack(len(self.objects), len(self.fields), len(self.references), len(values)))
+        for row in self.objects:
+            out += OBJECT_ROW.pack(*row)
+        out += struct.pack(f'<{len(self.fields)}I', *self.fields)
+        for row in self.references:
+            out += REFERENCE_ROW.pack(*row)
+        out += values
+        return bytes(out)
+
+## Returns file content with descriptions of materials by material name.
+def write_matdesc_bytes(descs: Dict[str, Any]) -> bytes:
+    strings = StringTable()
+    names: List[int] = []
+    sections: List[bytes] = []
+    for name, desc in descs.items():
+        names.append(strings.add(str(name)))
+        writer = SectionWriter(strings)
+        writer.write(desc)
+        sections.append(writer.to_bytes())
+
+    offset = HEADER.size + DIRECTORY_ROW.size * len(sections)
+    directory = bytearray()
+    for name, section in zip(names, sections):
+        directory += DIRECTORY_ROW.pack(name, offset, len(section))
+        offset += len(section)
+    return HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), offset) + bytes(directory) + b''.join(sections) + strings.to_bytes()
+
+def write_matdesc_file(descs: Dict[str, Any], path: str) -> None:
+    data = write_matdesc_bytes(descs)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+## Material descriptions file. Only header, directory and strings are read on open,
+## every material is decoded on first access.
+class MatDescFile(Mapping):
+    def __init__(self, path: str, class_resolver: Callable[[str], type] = resolve_type_tag) -> None:
+        self.resolve_class = class_resolver
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, strings_offset = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} isn't material description file.")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has version {version}, expected {FORMAT_VERSION}.")
+
+        nStrings: int = U32.unpack_from(self.data, strings_offset)[0]
+        offsets = struct.unpack_from(f'<{nStrings + 1}I', self.data, strings_offset + U32.size)
+        base: int = strings_offset + U32.size * (nStrings + 2)
+        self.strings: List[str] = [self.data[base + a : base + b].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+        self.classes: Dict[int, type] = {}
+
+        self.sections: Dict[str, Tuple[int, int]] = {}
+        for i in range(count):
+            name, offset, size = DIRECTORY_ROW.unpack_from(self.data, HEADER.size + i * DIRECTORY_ROW.size)
+            self.sections[self.strings[name]] = (offset, size)
+        self.loaded: Dict[str, Any] = {}
+
+    def get_class(self, i: int) -> type:
+        cls = self.classes.get(i)
+        if cls is None:
+            cls = self.resolve_class(self.strings[i])
+            self.classes[i] = cls
+        return cls
+
+    def load(self, name: str) -> Any:
+        offset, _ = self.sections[name]
+        nObjects, nFields, nReferences, values_size = SECTION_HEADER.unpack_from(self.data, offset)
+        offset += SECTION_HEADER.size
+        objects_table = struct.unpack_from(f'<{nObjects * 3}I', self.data, offset)
+        offset += nObjects * OBJECT_ROW.size
+        fields_table = struct.unpack_from(f'<{nFields}I', self.data, offset)
+        offset += nFields * FIELD_ROW.size
+        references_table = struct.unpack_from(f'<{nReferences * 3}I', self.data, offset)
+        offset += nReferences * REFERENCE_ROW.size
+        values: List[Any] = marshal.loads(self.data[offset : offset + values_size])
+
+        classes = objects_table[0::3]
+        class_of_string: Dict[int, type] = {i: self.get_class(i) for i in set(classes)}
+        objects: List[Any] = [cls.__new__(cls) for cls in map(class_of_string.__getitem__, classes)]
+
+        # Fields of every object are contiguous, object references are patched afterwards.
+        names: List[str] = list(map(self.strings.__getitem__, fields_table))
+        for o, first, count in zip(objects, objects_table[1::3], objects_table[2::3]):
+            o.__dict__.update(zip(names[first : first + count], values[first : first + count]))
+        for i in range(0, len(references_table), 3):
+            field, owner, kind = references_table[i : i + 3]
+            if kind == FieldKind.OBJECT:
+                objects[owner].__dict__[names[field]] = objects[values[field]]
+            else:
+                objects[owner].__dict__[names[field]] = [objects[x] for x in values[field]]
+        return objects[0]
+
+    def __getitem__(self, name: str) -> Any:
+        desc = self.loaded.get(name)
+        if desc is None:
+            desc = self.load(name)
+            self.loaded[name] = desc
+        return desc
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.sections)
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    # Loaded descriptions stay valid, other materials can't be loaded after file is closed.
+    def close(self) -> None:
+        self.data.close()
+
+## Pickled descriptions are read as plain records, so pickles can be converted without blender.
+class RecordUnpickler(pickle.Unpickler):
+    record_classes: Dict[Tuple[str, str], type] = {}
+
+    def find_class(self, module: str, name: str) -> type:
+        if module not in CLASS_MODULES:
+            return super().find_class(module, name)
+        key = (module, name)
+        cls = self.record_classes.get(key)
+        if cls is None:
+            cls = type(name, (), {'__module__': module})
+            self.record_classes[key] = cls
+        return cls
+
+def read_pickle_records(path: str) -> Any:
+    with open(path, 'rb') as f:
+        return RecordUnpickler(f).load()
+
+## Converts pickled descriptions {material name: pickle path} to description file.
+def convert_pickles(pickle_paths: Dict[str, str], path: str) -> None:
+    write_matdesc_file({name: read_pickle_records(x) for name, x in pickle_paths.items()}, path)
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os.path
+from typing import Any, Dict, List, Tuple
+
+from enums import NodeGroupTypeEnum, get_node_group_types
+from logger import log
+from materials import get_material, get_material_descriptions, get_matdesc_file_path, MATDESC_FILE_NAME
+from utils import EDMPath
+import custom_shader_group as custom_sg
+
+## Socket enum items of material descriptions are needed to register enum properties of shader nodes.
+## They are kept in small json index next to description files, so register doesn't load descriptions.
+## Index is shipped with add-on. It stores content hash of every description file it was built from,
+## so it stays valid after install or checkout, it's rebuilt only if content of any file or index version changes.
+## Rebuilt index is used from memory if add-on folder is read-only.
+
+INDEX_VERSION = 2
+INDEX_FILE_NAME = 'data/material_enums.json'
+
+EnumItems = Dict[custom_sg.MaterialNameType, Dict[custom_sg.SocketNameType, List[Tuple[str, str, str, int]]]]
+EnumNames = Dict[custom_sg.MaterialNameType, Dict[custom_sg.SocketNameType, str]]
+
+def get_index_path() -> str:
+    return os.path.join(EDMPath.full_plugin_path, INDEX_FILE_NAME)
+
+def get_file_hash(path: str) -> str:
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+# Content hash of description file of every material and of common description file.
+def get_source_hashes() -> Dict[str, str]:
+    hashes: Dict[str, str] = {}
+    for name in get_node_group_types():
+        hashes[name.value] = get_file_hash(os.path.join(EDMPath.full_plugin_path, get_material(name).description_file_name))
+    hashes[MATDESC_FILE_NAME] = get_file_hash(get_matdesc_file_path())
+    return hashes
+
+def build_enum_index() -> Dict[str, Any]:
+    material_descs = get_material_descriptions()
+    items: EnumItems = custom_sg.get_enum_items(material_descs)
+    names: EnumNames = custom_sg.get_enum_names(material_descs)
+    return {
+        'version': INDEX_VERSION,
+        'sources': get_source_hashes(),
+        'items': {mat_name.value: {socket: [list(x) for x in values] for socket, values in sockets.items()} for mat_name, sockets in items.items()},
+        'names': {mat_name.value: sockets for mat_name, sockets in names.items()},
+    }
+
+def read_enum_index() -> Dict[str, Any]:
+    try:
+        with open(get_index_path(), 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get('version') != INDEX_VERSION or index.get('sources') != get_source_hashes():
+        return None
+    return index
+
+def write_enum_index(index: Dict[str, Any]) -> None:
+    try:
+        with open(get_index_path(), 'w') as f:
+            json.dump(index, f, indent=1)
+            f.write('\n')
+    except OSError as e:
+        log.info(f"Can't write material enum index {get_index_path()}, rebuilt index is used from memory. Reason: {e}.")
+
+## Returns enum items and socket names of materials in the same layout as 'custom_sg.get_enum_items' and 'custom_sg.get_enum_names'.
+def load_enum_index() -> Tuple[EnumItems, EnumNames]:
+    index = read_enum_index()
+    if not index:
+        index = build_enum_index()
+        write_enum_index(index)
+
+    items: EnumItems = {NodeGroupTypeEnum(mat_name): {socket: [tuple(x) for x in values] for socket, values in sockets.items()} for mat_name, sockets in index['items'].items()}
+    names: EnumNames = {NodeGroupTypeEnum(mat_name): sockets for mat_name, sockets in index['names'].items()}
+    return items, names
@@ -1,10 +1,11 @@
 import os.path
 import re
 import uuid
-import pickle
+import time
+from dataclasses import dataclass, field
 
 import bpy
-from typing import List, Union, Dict, Sequence, Tuple, Optional
+from typing import List, Union, Dict, Sequence, Tuple, Optional, Set
 from version_specific import InterfaceNodeSocket, get_version
 
 from bpy.types import Operator, Material, ShaderNodeGroup, Action, FCurve, NodeTree, NodeSocket, Node, ShaderNode
@@ -13,8 +14,9 @@ from typing import List, Union, Dict, NamedTuple, Callable, Type
 from utils import print_node, EDMPath
 from enums import BpyShaderNode, NodeSocketInDefaultEnum, NodeGroupTypeEnum, get_node_group_types
 from logger import log
-from materials import Materials, build_material_descriptions, filter_materials, filter_materials_re, check_md5, get_material
-from serializer import SNode, SOutput, SInput, SLink
+from materials import Materials, DefaultsRemap, remap_links, get_material_descriptions, reset_material_descriptions, filter_materials, filter_materials_re, check_md5, get_material, get_matdesc_file_path
+from matdesc_format import convert_pickles
+from serializer import SNode, SOutput, SInput, SLink, SocketIndex
 from serializer_tools import collect_nodetree_links, extract_group_inputs, MatDesc, serialize_group
 from material_wrap import get_edm_node_group, get_edm_node_group_re, get_list_edm_node_group_re, get_list_free_edm_node_group_re
 from edm_materials import EdmMatrialShaderNode
@@ -86,8 +88,9 @@ def move_links(mat: Material) -> List[SLink]:
     return links
 
 def restore_links(mat: Material, links: List[SLink]):
+    socket_indices: Dict[Tuple[str, bool], SocketIndex] = {}
     for link in links:
-        link.create(mat.node_tree, mat.node_tree.nodes)
+        link.create(mat.node_tree, mat.node_tree.nodes, socket_indices)
 
 def get_actual_version(node_group: ShaderNodeGroup) -> int:
     if not node_group:
@@ -123,46 +126,6 @@ def get_fc_list(action: Action, path: str) -> Sequence[FCurve]:
     result: Sequence[FCurve] = [fc for fc in action.fcurves if fc.data_path == path]
     return result
 
-def replace_group(old_node_tree: NodeTree, new_node_tree: NodeTree, new_mat_desc: MatDesc, group_node_type_name: NodeGroupTypeEnum):
-    if not new_node_tree:
-        return
-    node_tree_regex = re.compile(f'[A-Za-z0-9_-]*{str(group_node_type_name.value)[3:]}[A-Za-z0-9_.-]*')
-    mats: List[Material] = filter_materials_re(node_tree_regex)
-
-    log.info("+ Tree: " + str(group_node_type_name.value) + " has " + str(len(mats)) + " materials")
-
-    mat_links_map: Dict[str, List[SLink]] = {}
-    mat_input_map: Dict[str, List[SInput]] = {}
-    for material in mats:
-        links: List[SLink] = move_links(material)
-        mat_links_map[material.name] = links
-        old_node_group: ShaderNodeGroup = get_edm_node_group_re(material, node_tree_regex)
-        input_list: List[SInput] = extract_group_inputs(old_node_group)
-        mat_input_map[material.name] = input_list
-    
-    replace_materials_re(mats, node_tree_regex, new_node_tree, new_mat_desc)
-
-    # restore connections
-    for material in mats:
-        log.info("+ Tree " + str(group_node_type_name.value) + " process " + material.name + " material")
-
-        links: List[SLink] = mat_links_map[material.name]
-        inputs: List[SInput] = mat_input_map[material.name]
-        mat_fx: Materials = get_material(group_node_type_name)
-        if mat_fx:
-            links = mat_fx.process_links(links, get_version(old_node_tree), group_node_type_name)
-            #old_node_group: ShaderNodeGroup = get_edm_node_group_re(material, node_tree_regex)
-            new_node_group: ShaderNodeGroup = get_edm_node_group(material, group_node_type_name)
-            mat_fx.restore_defaults(inputs, new_node_group, get_version(old_node_tree), group_node_type_name)
-        try:
-            restore_links(material, links)
-        except:
-            if old_node_tree:
-                log.info(f'=== Old: {old_node_tree.name} ===\n')
-            print_node(old_node_tree)
-            log.info(f'\n=== New: {new_node_tree.name} ===\n')
-            print_node(new_node_tree)
-
 def check_materials_validity() -> None: 
     broken_mat_regex_map = {}
     for node_tree_name in NodeGroupTypeEnum:
@@ -180,14 +143,9 @@ def check_materials_validity() -> None:
         mat_list: List[Material] = filter_materials(node_tree_name)
 
         if len(mat_list) > 0:
-            pickle_file_name: str = os.path.join(EDMPath.full_plugin_path, get_material(node_tree_name).description_file_name)
-            try:
-                f = open(pickle_file_name, 'rb')
-                ref_mat_desc = pickle.load(f)
-            except:
-                log.fatal(f'Could not open reference material to check md5: "{pickle_file_name}"')
-            finally:
-                f.close()
+            ref_mat_desc: MatDesc = get_material_descriptions().get(node_tree_name)
+            if not ref_mat_desc:
+                log.fatal(f'Could not open reference material to check md5: "{get_material(node_tree_name).description_file_name}"')
 
             for i in bpy.data.node_groups:
                 if i.name == node_tree_name.value:
@@ -204,64 +162,143 @@ def check_materials_validity() -> None:
             if current_mat_ver > ref_mat_desc.version:
                 log.fatal(f"Material {material.name} has newer version. Expected version is {current_mat_ver}, got {ref_mat_desc.version}. Please update edm plugin!")
 
-def check_plugin_version(ref_mat_desc_map: Dict[str, MatDesc]) -> None:
-    mat_regex_map = {}
-    for node_tree_name in NodeGroupTypeEnum:
-        mat_regex_map[node_tree_name] = re.compile(f'[A-Za-z0-9_-]*{str(node_tree_name.value)[3:]}[A-Za-z0-9_.-]*')
-
-    for node_tree_name in NodeGroupTypeEnum:
-        ref_mat_desc: MatDesc = ref_mat_desc_map.get(node_tree_name)
-        if not ref_mat_desc:
-            continue
-        mat_regex = mat_regex_map.get(node_tree_name)
-        mat_list: List[Material] = filter_materials_re(mat_regex)
-        for material in mat_list:
-            edm_shader_node_group: ShaderNodeGroup = get_edm_node_group_re(material, mat_regex)
-            current_mat_ver = get_version(edm_shader_node_group.node_tree)
-            if current_mat_ver > ref_mat_desc.version:
-                log.fatal(f"Material {material.name} has newer version. Expected version is {current_mat_ver}, got {ref_mat_desc.version}. Please update edm plugin!")
-
-def count_materials_to_update(ref_mat_desc_map: Dict[str, MatDesc]) -> None:
-    tree_ct: int = 0
-    mat_ct: int = 0
-    tree_list: List[str] = []
-    mat_map: Dict[str, int] = {}
-
-    node_group_types = get_node_group_types()
-    for k in node_group_types:
-        material = get_material(k)
-        material_desc: MatDesc = ref_mat_desc_map.get(material.name)
+EDM_GROUP_NODE_TYPES = (BpyShaderNode.NODE_GROUP, BpyShaderNode.NODE_GROUP_EDM, BpyShaderNode.NODE_GROUP_DEFAULT, BpyShaderNode.NODE_GROUP_DECK, BpyShaderNode.NODE_GROUP_FAKE_OMNI, BpyShaderNode.NODE_GROUP_FAKE_SPOT)
+CUSTOM_GROUP_NODE_TYPES = (BpyShaderNode.NODE_GROUP_EDM, BpyShaderNode.NODE_GROUP_DEFAULT, BpyShaderNode.NODE_GROUP_DECK, BpyShaderNode.NODE_GROUP_FAKE_OMNI, BpyShaderNode.NODE_GROUP_FAKE_SPOT)
+
+## Materials using node group of one type and version.
+@dataclass
+class UpgradeGroup:
+    group_type: NodeGroupTypeEnum
+    old_version: int
+    materials: List[Material] = field(default_factory=list)
+
+## Upgrade of all EDM materials of blend file in one pass. Materials are collected by single traversal
+## and grouped by (group type, version of their node group). Link and defaults remaps are computed
+## once per group and applied to all its materials. Every material is processed once per group type
+## even if it has several matching group nodes, versions of shared node trees are read once.
+class MaterialUpgradePass:
+    def __init__(self, material_descs: Dict[str, MatDesc]) -> None:
+        self.material_descs = material_descs
+        self.regexes = {k: re.compile(f'[A-Za-z0-9_-]*{str(k.value)[3:]}[A-Za-z0-9_.-]*') for k in get_node_group_types()}
+        self.groups: Dict[Tuple[NodeGroupTypeEnum, int], UpgradeGroup] = {}
+        # group types used by plain node groups, they are upgraded without version check
+        self.old_rw_types: Set[NodeGroupTypeEnum] = set()
+        self.tree_versions: Dict[str, int] = {}
+        self.timings: Dict[str, float] = {}
+        self.upgraded: Dict[NodeGroupTypeEnum, int] = {}
+
+    def add_time(self, stage: str, start: float) -> None:
+        self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - start
+
+    def get_tree_version(self, node_tree: NodeTree) -> int:
+        version: int = self.tree_versions.get(node_tree.name)
+        if version is None:
+            version = get_version(node_tree)
+            self.tree_versions[node_tree.name] = version
+        return version
+
+    def collect(self) -> None:
+        start: float = time.perf_counter()
+        for material in bpy.data.materials:
+            if not (material.use_nodes and material.node_tree):
+                continue
+            tree_names: Set[str] = {x.node_tree.name for x in material.node_tree.nodes if x.bl_idname in EDM_GROUP_NODE_TYPES and x.node_tree}
+            for group_type, regex in self.regexes.items():
+                if not any(re.match(regex, x) for x in tree_names):
+                    continue
+                group_node: ShaderNodeGroup = get_edm_node_group_re(material, regex)
+                if group_node.bl_idname not in CUSTOM_GROUP_NODE_TYPES:
+                    self.old_rw_types.add(group_type)
+                key: Tuple[NodeGroupTypeEnum, int] = (group_type, self.get_tree_version(group_node.node_tree))
+                group: UpgradeGroup = self.groups.get(key)
+                if not group:
+                    group = UpgradeGroup(*key)
+                    self.groups[key] = group
+                group.materials.append(material)
+        self.add_time('collect', start)
+
+    def check_versions(self) -> None:
+        for (group_type, version), group in self.groups.items():
+            material_desc: MatDesc = self.material_descs.get(group_type)
+            if material_desc and version > material_desc.version:
+                log.fatal(f"Material {group.materials[0].name} has newer version. Expected version is {version}, got {material_desc.version}. Please update edm plugin!")
+
+    def upgrade_type(self, group_type: NodeGroupTypeEnum) -> None:
+        material: Materials = get_material(group_type)
+        log.info("Processing tree: " + group_type)
+        material_desc: MatDesc = self.material_descs.get(group_type)
         if not material_desc:
-            continue
-        old_node_tree: NodeTree = bpy.data.node_groups.get(material.name)
+            log.info("- Tree: " + group_type + " has no material description.")
+            return
+
+        start: float = time.perf_counter()
+        old_node_tree: NodeTree = bpy.data.node_groups.get(group_type)
         if not old_node_tree:
-            continue
-        version: int = get_version(old_node_tree)
-        if version == material_desc.version:
-            continue
-        tree_ct = tree_ct + 1
-        tree_list.append(material.name.value)
-        node_tree_regex = re.compile(f'[A-Za-z0-9_-]*{str(material.name.value)[3:]}[A-Za-z0-9_.-]*')
-        mats: List[Material] = filter_materials_re(node_tree_regex)
-        current_mat_count: int = len(mats)
-        mat_ct = mat_ct + current_mat_count
-        mat_map.update({material.name.value : current_mat_count})
-    log.info("Blend file has " + str(tree_ct) + " old NodeTrees and " + str(mat_ct) + " materials to update.")
-    for tree_name in tree_list:
-        kv_mat_ct: int = mat_map.get(tree_name)
-        if kv_mat_ct:
-            log.info("Blend file has " + tree_name + " tree and " + str(kv_mat_ct) + " materials with it to update.")
-        else:
-            log.info("Blend file has " + tree_name + " tree and zero materials with it ti update.")
-
-def has_old_rw_group(material_name: str) -> bool:
-    node_tree_regex = re.compile(f'[A-Za-z0-9_-]*{material_name[3:]}[A-Za-z0-9_.-]*')
-    mat_list: List[Material] = filter_materials_re(node_tree_regex)
-    for material in mat_list:
-        edm_shader_node_group: ShaderNodeGroup = get_edm_node_group_re(material, node_tree_regex)
-        if not edm_shader_node_group.bl_idname in (BpyShaderNode.NODE_GROUP_EDM,  BpyShaderNode.NODE_GROUP_DEFAULT, BpyShaderNode.NODE_GROUP_DECK, BpyShaderNode.NODE_GROUP_FAKE_OMNI, BpyShaderNode.NODE_GROUP_FAKE_SPOT):
-            return True
-    return False
+            log.info("- Blend file has no tree for " + group_type)
+        new_node_tree: NodeTree = update_tree(old_node_tree, material_desc, group_type not in self.old_rw_types)
+        self.add_time('trees', start)
+        if not new_node_tree:
+            log.info("- Tree update break: " + group_type)
+            return
+        log.info("+ Tree update succeeded: " + group_type)
+
+        regex = self.regexes[group_type]
+        groups: List[UpgradeGroup] = [x for x in self.groups.values() if x.group_type == group_type]
+        mats: List[Material] = [m for x in groups for m in x.materials]
+        log.info("+ Tree: " + str(group_type.value) + " has " + str(len(mats)) + " materials")
+
+        start = time.perf_counter()
+        mat_links_map: Dict[str, List[SLink]] = {}
+        mat_input_map: Dict[str, List[SInput]] = {}
+        for mat in mats:
+            mat_links_map[mat.name] = move_links(mat)
+            mat_input_map[mat.name] = extract_group_inputs(get_edm_node_group_re(mat, regex))
+        self.add_time('move links', start)
+
+        start = time.perf_counter()
+        replace_materials_re(mats, regex, new_node_tree, material_desc)
+        self.add_time('replace nodes', start)
+
+        start = time.perf_counter()
+        for group in groups:
+            link_remap: Dict[str, str] = material.get_link_remap(group.old_version)
+            defaults_remap: DefaultsRemap = None
+            for mat in group.materials:
+                new_node_group: ShaderNodeGroup = get_edm_node_group(mat, group_type)
+                if not defaults_remap and new_node_group:
+                    defaults_remap = material.get_defaults_remap(new_node_group, group.old_version, group_type)
+                links: List[SLink] = remap_links(mat_links_map[mat.name], link_remap)
+                material.restore_defaults(mat_input_map[mat.name], new_node_group, group.old_version, group_type, defaults_remap)
+                try:
+                    restore_links(mat, links)
+                except:
+                    if old_node_tree:
+                        log.info(f'=== Old: {old_node_tree.name} ===\n')
+                    print_node(old_node_tree)
+                    log.info(f'\n=== New: {new_node_tree.name} ===\n')
+                    print_node(new_node_tree)
+        self.add_time('restore', start)
+
+        if old_node_tree:
+            bpy.data.node_groups.remove(old_node_tree)
+        new_node_tree.name = group_type
+        self.upgraded[group_type] = len(mats)
+
+    # Returns short summary, full report is written to log.
+    def report(self) -> str:
+        for (group_type, version), group in sorted(self.groups.items()):
+            log.info(f"{group_type.value} version {version}: {len(group.materials)} materials.")
+        for stage, seconds in self.timings.items():
+            log.info(f"Material upgrade {stage}: {seconds:.3f} s.")
+        total: float = sum(self.timings.values())
+        return f"Upgraded {sum(self.upgraded.values())} materials of {len(self.upgraded)} types in {total:.2f} s."
+
+    def run(self) -> str:
+        self.collect()
+        self.check_versions()
+        for group_type in get_node_group_types():
+            self.upgrade_type(group_type)
+        return self.report()
 
 class EDM_PT_import_materials(Operator):
     bl_idname = "edm.import_matrials"
@@ -270,47 +307,17 @@ class EDM_PT_import_materials(Operator):
 
     def __init__(self) -> None:
         super().__init__()
-        self.material_descs: Dict[str, MatDesc] = build_material_descriptions()
+        self.material_descs: Dict[str, MatDesc] = get_material_descriptions()
 
     def execute(self, context):
-        check_plugin_version(self.material_descs)
-        count_materials_to_update(self.material_descs)
-
-        node_group_types = get_node_group_types()
-        for k in node_group_types:
-            material = get_material(k)
-            log.info("Processing tree: " + material.name)
-
-            material_desc: MatDesc = self.material_descs.get(material.name)
-            if not material_desc:
-                log.info("- Tree: " + material.name + " has no material description.")
-                continue
-            
-            # здесь вроде есть проблема - если используются старые материалы(Олины) типа ED_Default_Material8 то материал не обновиться
-            old_node_tree: NodeTree = bpy.data.node_groups.get(material.name)
-            if not old_node_tree:
-                log.info("- Blend file has no tree for " + material.name)
-
-            is_version_check: bool = not has_old_rw_group(material.name)
-            new_node_tree: NodeTree = update_tree(old_node_tree, material_desc, is_version_check)
-            if not new_node_tree:
-                log.info("- Tree update break: " + material.name)
-                continue
-            else:
-                log.info("+ Tree update succeeded: " + material.name)
-
-            replace_group(old_node_tree, new_node_tree, material_desc, material.name)
-
-            if old_node_tree:
-                bpy.data.node_groups.remove(old_node_tree)
-            new_node_tree.name = material.name
-
+        summary: str = MaterialUpgradePass(self.material_descs).run()
+        self.report({'INFO'}, summary)
         return {'FINISHED'}
     
 class EDM_PT_export_materials(Operator):
     bl_idname = "edm.export_matrials" 
     bl_label = "Export EDM materials"
-    bl_description = "Export reference materials to pickle file"
+    bl_description = "Export reference materials to pickle files and material description file"
 
     def execute(self, context):
         for bpy_material in (m for m in bpy.data.materials if m.use_nodes and m.node_tree.nodes['Group']):
@@ -322,6 +329,15 @@ class EDM_PT_export_materials(Operator):
                 buf: bytes = serialize_group(bpy_material.node_tree.nodes['Group'], full_blend_file_path)
                 f.write(buf)    
 
+        # description file is rebuilt from all pickles, materials which weren't exported now are kept.
+        # Loaded descriptions are reset first to unmap description file.
+        reset_material_descriptions()
+        pickle_paths: Dict[str, str] = {}
+        for name in get_node_group_types():
+            pickle_file_name: str = os.path.join(EDMPath.full_plugin_path, get_material(name).description_file_name)
+            if os.path.isfile(pickle_file_name):
+                pickle_paths[name.value] = pickle_file_name
+        convert_pickles(pickle_paths, get_matdesc_file_path())
         return {'FINISHED'}
 
 tool_classes = (
@@ -5,7 +5,9 @@ import os.path
 import pickle
 import copy
 from collections import namedtuple
-from typing import List, Union, Dict, NamedTuple, Callable, Type
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import List, Union, Dict, NamedTuple, Callable, Type, Iterator
 from abc import ABC, abstractmethod
 
 import block_builder
@@ -16,6 +18,7 @@ from logger import log
 from material_wrap import MaterialWrap, DefMaterialWrap, DeckMaterialWrap, GlassMaterialWrap, MirrorMaterialWrap, MaterialWrapCustomType, FakeOmniLightMaterialWrap, FakeSpotLightMaterialWrap
 from mesh_storage import MeshStorage
 from serializer_tools import MatDesc
+from matdesc_format import MatDescFile
 from version_specific import InterfaceNodeSocket, get_version, IS_BLENDER_4, IS_BLENDER_3
 from bpy.types import Object, ShaderNodeGroup, Material
 from custom_sockets import TransparencyEnumItems, ShadowCasterEnumItems
@@ -28,6 +31,31 @@ def get_first_socket_by_name(sockest_list: List[SInput], name: str) -> Union[SIn
             return socket
     return None
 
+def remap_links(old_links: List[SLink], remap: Dict[str, str]) -> List[SLink]:
+    if not remap:
+        return list(old_links)
+    new_links: List[SLink] = []
+    for link in old_links:
+        if link.to_type == 'ShaderNodeGroup' and link.to_socket in remap:
+            link = copy.copy(link)
+            link.to_socket = remap[link.to_socket]
+        new_links.append(link)
+    return new_links
+
+## Data of new node group used to restore defaults of old sockets.
+@dataclass
+class DefaultsRemap:
+    version_new: int
+    socket_map: Dict[str, Dict[str, str]]
+    socket_acro_map: Dict[str, str]
+
+# Old sockets by name, first socket of the same name wins as in 'get_first_socket_by_name'.
+def get_sockets_by_name(sockest_list: List[SInput]) -> Dict[str, SInput]:
+    sockets: Dict[str, SInput] = {}
+    for socket in sockest_list:
+        sockets.setdefault(socket.name, socket)
+    return sockets
+
 ## base material class 
 class Materials(ABC):
     """
@@ -43,24 +71,59 @@ class Materials(ABC):
  
     @classmethod
     @abstractmethod
-    def build_blocks(cls, obj: Object, wrap: MaterialWrap, storage: MeshStorage) -> pyedm.IRenderNode:
+    def build_blocks(cls, obj: Object, wrap: MaterialWrap, storage: MeshStorage) -> Union[pyedm.IRenderNode, List[pyedm.IRenderNode]]:
         """
         Create render node that can be imported to edm. 
         Once 'pyedm.IRenderNode' was created, you need to set control node to it and add render node to model. 
+        Fake light materials return list of render nodes instead, one for every chunk of lights, 'storage' is None for them.
         """
         pass
 
     @classmethod
-    @abstractmethod
+    def get_link_remap(cls, old_version: int) -> Dict[str, str]:
+        """
+        Returns new names of group input sockets by their names in 'old_version'.
+        Remap is the same for all materials of one version, so it's computed once per version by upgrade pass.
+        """
+        return {}
+
+    @classmethod
     def process_links(cls, links: List[SLink], version: int, group_node_type_name: str)-> List[SLink]:
-        pass
+        return remap_links(links, cls.get_link_remap(version))
+
+    @classmethod
+    def get_defaults_remap(cls, new_node_group: ShaderNodeGroup, old_version: int, material_name: str) -> 'DefaultsRemap':
+        """
+        Returns data of new node group 'restore_defaults' needs. It's the same for all materials of one version.
+        """
+        return DefaultsRemap(get_version(new_node_group.node_tree), {}, {})
 
     @classmethod
     @abstractmethod
     def restore_defaults(cls, old_sockest: List[SInput], 
-                         new_node_group: ShaderNodeGroup, old_version: int, material_name: str) -> None:
+                         new_node_group: ShaderNodeGroup, old_version: int, material_name: str, remap: 'DefaultsRemap' = None) -> None:
         pass
 
+# New names of group input sockets linked in old versions.
+# TODO: 'Normal  (Non-Color)' - looks strange, it has 2 spaces. is it ok?
+DEFAULT_NORMAL_LINK_REMAP: Dict[str, str] = {
+    'Normal': NodeSocketInDefaultEnum.NORMAL,
+    'Normal  (Non-Color)': NodeSocketInDefaultEnum.NORMAL,
+    'Normal (Non color)': NodeSocketInDefaultEnum.NORMAL,
+}
+DEFAULT_DAMAGE_LINK_REMAP: Dict[str, str] = {
+    'Damage Color': NodeSocketInDefaultEnum.DAMAGE_COLOR,
+    'Damage Map': NodeSocketInDeckEnum.DAMAGE_MASK,
+    'Damage Map (Non-Color)': NodeSocketInDeckEnum.DAMAGE_MASK,
+    'Damage Normal': NodeSocketInDefaultEnum.DAMAGE_NORMAL,
+}
+DECK_DAMAGE_LINK_REMAP: Dict[str, str] = {
+    'Damage Color': NodeSocketInDefaultEnum.DAMAGE_COLOR,
+    'Damage Map': NodeSocketInDeckEnum.DAMAGE_MASK,
+    'Damage Map (Non-Color)': NodeSocketInDeckEnum.DAMAGE_MASK,
+    'Damage Normal': NodeSocketInDeckEnum.DAMAGE_NORMAL,
+}
+
 # --- implementation of materials --- #
 # --- Omni 
 class OmniFakeLightsMaterial(Materials):
@@ -77,7 +140,7 @@ class OmniFakeLightsMaterial(Materials):
         return old_links
     
     @classmethod
-    def restore_defaults(cls, old_sockest, new_node_group, old_version, material_name):
+    def restore_defaults(cls, old_sockest, new_node_group, old_version, material_name, remap = None):
         pass
 
 # --- Spot
@@ -95,7 +158,7 @@ class SpotFakeLightsMaterial(Materials):
         return old_links
     
     @classmethod
-    def restore_defaults(cls, old_sockest, new_node_group, old_version, material_name):
+    def restore_defaults(cls, old_sockest, new_node_group, old_version, material_name, remap = None):
         pass
 
 # --- Default
@@ -109,47 +172,32 @@ class DefaultMaterial(Materials):
         return block_builder.make_def_edm_mat_blocks(obj, wrap, storage)
     
     @classmethod
-    def process_links(cls, old_links, old_version, group_node_type_name):
-        new_links: List[SLink] = []
-        
+    def get_link_remap(cls, old_version):
         if old_version == 0 or old_version == 1:
-            for link in old_links:
-                if link.to_type == 'ShaderNodeGroup':
-                    # TODO: 'Normal  (Non-Color)' - looks strange, it has 2 spaces. is it ok?
-                    if link.to_socket == 'Normal' or link.to_socket == 'Normal  (Non-Color)' or link.to_socket == 'Normal (Non color)':
-                        link = copy.copy(link)
-                        link.to_socket = NodeSocketInDefaultEnum.NORMAL
-                new_links.append(link)
+            return DEFAULT_NORMAL_LINK_REMAP
         elif old_version <= 11:
-            for link in old_links:
-                if link.to_type == 'ShaderNodeGroup':
-                    if link.to_socket == 'Damage Color':
-                        link = copy.copy(link)
-                        link.to_socket = NodeSocketInDefaultEnum.DAMAGE_COLOR
-                    elif link.to_socket == 'Damage Map':
-                        link = copy.copy(link)
-                        link.to_socket = NodeSocketInDeckEnum.DAMAGE_MASK
-                    elif link.to_socket == 'Damage Map (Non-Color)':
-                        link = copy.copy(link)
-                        link.to_socket = NodeSocketInDeckEnum.DAMAGE_MASK
-                    elif link.to_socket == 'Damage Normal':
-                        link = copy.copy(link)
-                        link.to_socket = NodeSocketInDefaultEnum.DAMAGE_NORMAL
-                new_links.append(link)
-        else:
-            for link in old_links:
-                new_links.append(link)
-
-        return new_links
+            return DEFAULT_DAMAGE_LINK_REMAP
+        return {}
     
+    @classmethod
+    def get_defaults_remap(cls, new_node_group, old_version, material_name):
+        remap: DefaultsRemap = super().get_defaults_remap(new_node_group, old_version, material_name)
+        if old_version >= 8:
+            remap.socket_map = make_socket_map(new_node_group)
+            remap.socket_acro_map = make_acro_map(new_node_group)
+        return remap
+
     @classmethod 
-    def restore_defaults(cls, old_sockest, new_node_group, old_version, material_name):
-        version_new: int = get_version(new_node_group.node_tree)
+    def restore_defaults(cls, old_sockest, new_node_group, old_version, material_name, remap = None):
         if old_version == 0:
             return
+        if not remap:
+            remap = cls.get_defaults_remap(new_node_group, old_version, material_name)
+        version_new: int = remap.version_new
+        old_sockets: Dict[str, SInput] = get_sockets_by_name(old_sockest)
         if old_version < 8:
             for new_socket in new_node_group.inputs:
-                old_socket_wrp: SInput = get_first_socket_by_name(old_sockest, new_socket.name)
+                old_socket_wrp: SInput = old_sockets.get(new_socket.name)
                 if not old_socket_wrp:
                     continue
                 if new_socket.name == NodeSocketInDefaultEnum.SHADOW_CASTER and (old_socket_wrp.bl_socket_idname == 'NodeSocketUndefined' or not old_socket_wrp.instance_value):
@@ -170,22 +218,22 @@ class DefaultMaterial(Materials):
                 if hasattr(old_socket_wrp, 'instance_value'):
                     new_socket.default_value = old_socket_wrp.instance_value
         elif old_version >= 8:
-            socket_map: Dict[str, Dict[str, str]] = make_socket_map(new_node_group)
-            socket_acro_map: Dict[str, str] = make_acro_map(new_node_group)
+            socket_map: Dict[str, Dict[str, str]] = remap.socket_map
+            socket_acro_map: Dict[str, str] = remap.socket_acro_map
             if socket_map.get(material_name):
                 for socket_name in socket_map[material_name].keys():
                     if new_node_group.bl_idname in (BpyShaderNode.NODE_GROUP_DEFAULT, BpyShaderNode.NODE_GROUP_DECK, BpyShaderNode.NODE_GROUP_FAKE_OMNI, BpyShaderNode.NODE_GROUP_FAKE_SPOT):
                         prop_name: str = socket_acro_map.get(socket_name)
-                        old_socket_wrp: SInput = get_first_socket_by_name(old_sockest, socket_name)
+                        old_socket_wrp: SInput = old_sockets.get(socket_name)
                         if hasattr(old_socket_wrp, 'instance_value'):
                             setattr(new_node_group, prop_name, old_socket_wrp.instance_value)
                     else:
                         enum_name: str = socket_map[material_name][socket_name]
-                        old_socket_wrp: SInput = get_first_socket_by_name(old_sockest, socket_name)
+                        old_socket_wrp: SInput = old_sockets.get(socket_name)
                         if old_socket_wrp and hasattr(old_socket_wrp, 'instance_value'):
                             setattr(new_node_group, enum_name, old_socket_wrp.instance_value)
             for new_socket in new_node_group.inputs:
-                old_socket_wrp: SInput = get_first_socket_by_name(old_sockest, new_socket.name)
+                old_socket_wrp: SInput = old_sockets.get(new_socket.name)
                 if not old_socket_wrp:
                     continue
                 if new_socket.name == NodeSocketCommonEnum.VERSION:
@@ -209,37 +257,20 @@ class DeckMaterial(Materials):
         return block_builder.make_deck_edm_mat_blocks(obj, wrap, storage)
 
     @classmethod
-    def process_links(cls, old_links, old_version, group_node_type_name):
-        new_links: List[SLink] = []
-        
+    def get_link_remap(cls, old_version):
         if old_version < 7:
-            for link in old_links:
-                if link.to_type == 'ShaderNodeGroup':
-                    if link.to_socket == 'Damage Color':
-                        link = copy.copy(link)
-                        link.to_socket = NodeSocketInDefaultEnum.DAMAGE_COLOR
-                    elif link.to_socket == 'Damage Map':
-                        link = copy.copy(link)
-                        link.to_socket = NodeSocketInDeckEnum.DAMAGE_MASK
-                    elif link.to_socket == 'Damage Map (Non-Color)':
-                        link = copy.copy(link)
-                        link.to_socket = NodeSocketInDeckEnum.DAMAGE_MASK
-                    elif link.to_socket == 'Damage Normal':
-                        link = copy.copy(link)
-                        link.to_socket = NodeSocketInDeckEnum.DAMAGE_NORMAL
-                new_links.append(link)
-        else:
-            for link in old_links:
-                new_links.append(link)
-
-        return new_links
+            return DECK_DAMAGE_LINK_REMAP
+        return {}
 
     @classmethod    
-    def restore_defaults(cls, old_sockest, new_node_group, old_version, material_name):
-        version_new: int = get_version(new_node_group.node_tree)
+    def restore_defaults(cls, old_sockest, new_node_group, old_version, material_name, remap = None):
         if old_version >= 1:
+            if not remap:
+                remap = cls.get_defaults_remap(new_node_group, old_version, material_name)
+            version_new: int = remap.version_new
+            old_sockets: Dict[str, SInput] = get_sockets_by_name(old_sockest)
             for new_socket in new_node_group.inputs:
-                old_socket_wrp: SInput = get_first_socket_by_name(old_sockest, new_socket.name)
+                old_socket_wrp: SInput = old_sockets.get(new_socket.name)
                 if not old_socket_wrp:
                     continue
                 if new_socket.name == NodeSocketCommonEnum.VERSION:
@@ -320,18 +351,79 @@ def check_md5(material_name: NodeGroupTypeEnum, material_desc: MatDesc):
         if hasattr(material_desc, 'blend_file_md5') and material_desc.blend_file_md5 != blend_file_md5:
             log.fatal(f"Hash of material file {blend_file_path} is invalid.")
         
-def build_material_descriptions() -> Dict[NodeGroupTypeEnum, MatDesc]:    
+## File with descriptions of all materials, see 'matdesc_format'. Pickle files are sources it's built from.
+MATDESC_FILE_NAME = 'data/materials.edmd'
+
+def get_matdesc_file_path() -> str:
+    return os.path.join(EDMPath.full_plugin_path, MATDESC_FILE_NAME)
+
+def load_pickled_description(name: NodeGroupTypeEnum) -> MatDesc:
+    mat = get_material(name)
+    try:
+        pickle_file_name: str = os.path.join(EDMPath.full_plugin_path, mat.description_file_name)
+        with open(pickle_file_name, 'rb') as f:
+            return pickle.load(f)
+    except OSError as e:
+        log.error(f"Can't open material description file: {mat.description_file_name}. Reason: {e}.")
+        return None
+
+## Descriptions of materials by material type. Every description is decoded from description file on first access,
+## materials missing in description file are unpickled.
+class MaterialDescriptions(Mapping):
+    def __init__(self, descs_file: MatDescFile) -> None:
+        self.descs_file = descs_file
+        self.pickled: Dict[NodeGroupTypeEnum, MatDesc] = {}
+        self.names: List[NodeGroupTypeEnum] = [name for name in get_node_group_types() if name.value in descs_file]
+        for name in get_node_group_types():
+            if name.value not in descs_file:
+                mat_desc: MatDesc = load_pickled_description(name)
+                if mat_desc:
+                    self.pickled[name] = mat_desc
+                    self.names.append(name)
+
+    def __getitem__(self, name: NodeGroupTypeEnum) -> MatDesc:
+        mat_desc: MatDesc = self.pickled.get(name)
+        if mat_desc:
+            return mat_desc
+        return self.descs_file[name]
+
+    def __iter__(self) -> Iterator[NodeGroupTypeEnum]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # Descriptions can be still referenced by nodes, so all of them are loaded before file is unmapped.
+    def close(self) -> None:
+        for name in self.names:
+            self[name]
+        self.descs_file.close()
+
+def build_material_descriptions() -> Mapping:
+    try:
+        return MaterialDescriptions(MatDescFile(get_matdesc_file_path()))
+    except (OSError, ValueError) as e:
+        log.warning(f"Can't open material description file: {MATDESC_FILE_NAME}, descriptions are unpickled. Reason: {e}.")
+
     material_descs: Dict[NodeGroupTypeEnum, MatDesc] = {}
+    for name in get_node_group_types():
+        mat_desc: MatDesc = load_pickled_description(name)
+        if mat_desc:
+            material_descs[name] = mat_desc
+    return material_descs
 
-    node_group_types = get_node_group_types()
-    for name in node_group_types:
-        mat = get_material(name)
-        try:
-            pickle_file_name: str = os.path.join(EDMPath.full_plugin_path, mat.description_file_name)
-            with open(pickle_file_name, 'rb') as f:
-                material_descs[name] = pickle.load(f)
-            
-        except OSError as e:
-            log.error(f"Can't open material description file: {mat.description_file_name}. Reason: {e}.")
-            continue
-    return material_descs
\ No newline at end of file
+_material_descs: Mapping = None
+
+## Same as 'build_material_descriptions', but descriptions are loaded only on first use.
+def get_material_descriptions() -> Mapping:
+    global _material_descs
+    if _material_descs is None:
+        _material_descs = build_material_descriptions()
+    return _material_descs
+
+# Descriptions are reloaded on next use, is called after description files are rewritten.
+def reset_material_descriptions() -> None:
+    global _material_descs
+    if isinstance(_material_descs, MaterialDescriptions):
+        _material_descs.close()
+    _material_descs = None
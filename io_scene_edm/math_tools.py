@@ -2,6 +2,7 @@ import sys
 from typing import List, Tuple
 from math import sqrt
 from mathutils import Euler, Matrix, Vector
+import numpy as np
 import bpy
 
 ZERO_VEC3 = Vector([0, 0, 0])
@@ -75,17 +76,40 @@ def get_min(vecs : List[Vector]):
            min_z = v.z
     return (min_x, min_y, min_z)
 
+AaBb = Tuple[float, float, float, float, float, float]
+
+UNIT_CUBE_CORNERS = np.array([(i, j, k) for i in (-1.0, 1.0) for j in (-1.0, 1.0) for k in (-1.0, 1.0)], dtype=np.float64)
+
+# Transforms (n, 3) points by 4x4 matrix.
+def transform_points(matrix: Matrix, points: np.ndarray) -> np.ndarray:
+    m = np.array(matrix, dtype=np.float64)
+    return points @ m[:3, :3].T + m[:3, 3]
+
+def get_points_aa_bb(points: np.ndarray) -> AaBb:
+    return tuple(points.min(axis=0).tolist() + points.max(axis=0).tolist())
+
+def get_aa_bb_corners(aa_bb: AaBb) -> np.ndarray:
+    lo = np.array(aa_bb[:3], dtype=np.float64)
+    hi = np.array(aa_bb[3:], dtype=np.float64)
+    return lo + (UNIT_CUBE_CORNERS + 1.0) * 0.5 * (hi - lo)
+
+# Box in matrix space covering transformed box.
+def transform_aa_bb(matrix: Matrix, aa_bb: AaBb) -> AaBb:
+    return get_points_aa_bb(transform_points(matrix, get_aa_bb_corners(aa_bb)))
+
+def merge_aa_bb(a: AaBb, b: AaBb) -> AaBb:
+    if not a:
+        return b
+    if not b:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3]), max(a[4], b[4]), max(a[5], b[5]))
+
+## Box of flat xyz positions array, None if there are no positions.
+def get_positions_aa_bb(positions: np.ndarray) -> AaBb:
+    if len(positions) < 3:
+        return None
+    return get_points_aa_bb(np.reshape(positions, (-1, 3)).astype(np.float64, copy=False))
+
 ## this method returns bbox coordinates as two points (x1, y1, z1, x2, y2, z2)
-def get_aa_bb(object: bpy.types.Object) -> Tuple[float, float, float, float, float, float]:    
-    mat = ROOT_TRANSFORM_MATRIX @ object.matrix_world
-    vecs: List[Vector] = []
-    for i in (-1.0, 1.0):
-        for j in (-1.0, 1.0):
-            for k in (-1.0, 1.0):
-                vec = mat @ Vector((i, j, k))
-                vecs.append(vec)
-        
-    vec1 = Vector(get_min(vecs))
-    vec2 = Vector(get_max(vecs))
-
-    return (vec1.x, vec1.y, vec1.z, vec2.x, vec2.y, vec2.z)
+def get_aa_bb(object: bpy.types.Object) -> AaBb:
+    return get_points_aa_bb(transform_points(ROOT_TRANSFORM_MATRIX @ object.matrix_world, UNIT_CUBE_CORNERS))
@@ -4,7 +4,8 @@ from bpy.types import Mesh, Object, ObjectModifiers
 import numpy as np
 from logger import log
 
-from mesh_storage import MeshStorage
+from mesh_storage import MeshStorage, VertexGroupTable, get_vertex_dmg_args, build_skin_table
+from export_cache import export_cache, get_object_deps
 from version_specific import BLENDER_RELEASE, BLENDER_41
 
 def get_mesh(obj: Object) -> Mesh:
@@ -67,10 +68,14 @@ def buld_mesh(obj: Object, armature) -> List[MeshStorage]:
     else:
         uv_active = None
 
-    bverts = bpy_mesh.vertices
+    # Vertex groups are read once for storages of all materials.
+    vertex_groups = VertexGroupTable(bpy_mesh.vertices)
+    vertex_dmg_args = get_vertex_dmg_args(vertex_groups, obj)
+    skin = build_skin_table(vertex_groups, obj)
+
     meshes = [MeshStorage(nTriangles, bpy_mesh.uv_layers.keys(), uv_active, x, armature) for x in uniq_mat_inds]
     for mesh in meshes:
-        mesh.prepare(vertices, bverts, obj, normals, uvs, vertices_indices)
+        mesh.prepare(vertices, vertex_dmg_args, skin, obj, normals, uvs, vertices_indices)
 
     for ti, triangle in enumerate(bpy_mesh.loop_triangles):
         mat_ind = mat_inds[ti]
@@ -79,4 +84,25 @@ def buld_mesh(obj: Object, armature) -> List[MeshStorage]:
     for m in meshes:
         m.shrink()
 
-    return meshes
\ No newline at end of file
+    return meshes
+
+# Evaluated mesh of object with modifiers depends on other objects, armature pose and current frame,
+# depsgraph handler doesn't see all of these changes, so only meshes without modifiers are cached.
+def is_mesh_cacheable(obj: Object) -> bool:
+    return not obj.modifiers and not obj.data.is_editmode
+
+# Same as 'buld_mesh', but result is kept between export runs until object or its data changes.
+def build_mesh_cached(obj: Object, armature) -> List[MeshStorage]:
+    if not is_mesh_cacheable(obj):
+        return buld_mesh(obj, armature)
+
+    deps = get_object_deps(obj)
+    pointers = (obj.as_pointer(), obj.data.as_pointer())
+
+    def build() -> List[MeshStorage]:
+        meshes = buld_mesh(obj, armature)
+        for m in meshes:
+            m.release()
+        return meshes
+
+    return export_cache.get(('MESH', obj.name, armature.name if armature else None), deps, pointers, build)
@@ -0,0 +1,84 @@
+import copy
+from typing import List, Tuple
+
+import numpy as np
+from bpy.types import Object
+
+from logger import log
+from objects_custom_props import get_edm_props
+from mesh_storage import MeshStorage
+
+## Splits big mesh storages to spatially coherent clusters, every cluster is separate render node
+## which is culled on its own. Triangles are ordered along Morton curve of their centroids
+## and greedily packed to clusters limited by number of vertices and triangles.
+## Normal cones of clusters for backface culling aren't computed: render node of model format has no place for them.
+
+MORTON_BITS = 10
+
+def spread_bits(x: np.ndarray) -> np.ndarray:
+    x = x.astype(np.uint64) & 0x3ff
+    x = (x | (x << 16)) & 0x030000ff
+    x = (x | (x << 8)) & 0x0300f00f
+    x = (x | (x << 4)) & 0x030c30c3
+    x = (x | (x << 2)) & 0x09249249
+    return x
+
+def get_morton_codes(points: np.ndarray) -> np.ndarray:
+    lo = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - lo, 1.0e-12)
+    cells = ((points - lo) / extent * ((1 << MORTON_BITS) - 1)).astype(np.uint64)
+    return spread_bits(cells[:, 0]) | (spread_bits(cells[:, 1]) << 1) | (spread_bits(cells[:, 2]) << 2)
+
+# Packs ordered triangles to ranges, every range has at most 'max_vertices' unique vertices and 'max_triangles' triangles.
+def pack_triangles(triangles: np.ndarray, max_vertices: int, max_triangles: int) -> List[Tuple[int, int]]:
+    ranges: List[Tuple[int, int]] = []
+    start: int = 0
+    n: int = len(triangles)
+    while start < n:
+        window = triangles[start : start + max_triangles]
+        # number of unique vertices of window prefix ending with every triangle
+        flat = window.reshape(-1)
+        _, first = np.unique(flat, return_index=True)
+        is_new = np.zeros(len(flat), dtype=np.int64)
+        is_new[first] = 1
+        vertices = np.cumsum(is_new.reshape(-1, 3).sum(axis=1))
+        count: int = max(1, int(np.searchsorted(vertices, max_vertices, side='right')))
+        ranges.append((start, start + count))
+        start += count
+    return ranges
+
+def split_mesh_storage(storage: MeshStorage, max_vertices: int, max_triangles: int) -> List[MeshStorage]:
+    positions = storage.positions.reshape(-1, 3).astype(np.float64)
+    triangles = storage.indices.reshape(-1, 3).astype(np.int64)
+    centroids = positions[triangles].mean(axis=1)
+    triangles = triangles[np.argsort(get_morton_codes(centroids), kind='stable')]
+
+    result: List[MeshStorage] = []
+    for start, end in pack_triangles(triangles, max_vertices, max_triangles):
+        result.append(storage.extract(triangles[start:end].reshape(-1)))
+    return result
+
+## Returns storages of object split to clusters, source storages if splitting is off.
+## Skins aren't split: their triangles move with bones, so culling by rest position doesn't work for them.
+## They are split by 'bone_palettes' instead, all skin render nodes of object share one control bone.
+def get_mesh_clusters(obj: Object, storages: List[MeshStorage]) -> List[MeshStorage]:
+    edm_props = get_edm_props(obj)
+    if not edm_props.CLUSTER_MESH:
+        return storages
+
+    max_vertices: int = edm_props.CLUSTER_MAX_VERTICES
+    max_triangles: int = edm_props.CLUSTER_MAX_TRIANGLES
+    result: List[MeshStorage] = []
+    for storage in storages:
+        if storage.armature or (storage.nVerts <= max_vertices and storage.nTriangles <= max_triangles):
+            # source storages can be cached, they are renamed by copies
+            result.append(copy.copy(storage))
+            continue
+        result.extend(split_mesh_storage(storage, max_vertices, max_triangles))
+
+    if len(result) == len(storages):
+        return storages
+    for i, storage in enumerate(result):
+        storage.name = f'{obj.name}_{i}'
+    log.info(f"{obj.name} is split to {len(result)} clusters.")
+    return result
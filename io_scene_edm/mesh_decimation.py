@@ -0,0 +1,158 @@
+import math
+from typing import Tuple
+
+import numpy as np
+
+from mesh_storage import MeshStorage
+
+## Quadric error half-edge collapse decimation of 'MeshStorage' arrays.
+## Vertex u is collapsed to its neighbour v, so surviving vertices keep their own normals, uv, bones and damage args.
+## Collapses are done in passes: every pass picks independent cheapest collapses (no shared vertices) at once.
+## Vertices on uv or normal seams and on open borders are locked,
+## collapse is allowed only between vertices with close normals and the same skin and damage data.
+
+NORMAL_COS_LIMIT = math.cos(math.radians(30.0))
+WEIGHT_EPS = 1.0e-3
+MAX_PASSES = 64
+
+# Merges vertices with the same attributes, storage has separate vertex for every loop.
+# Returns representative storage vertex of every welded vertex and welded triangles.
+def weld_vertices(storage: MeshStorage) -> Tuple[np.ndarray, np.ndarray]:
+    n: int = storage.nVerts
+    columns = [storage.positions.reshape(-1, 3), storage.normals.reshape(-1, 3), storage.damage_arguments.reshape(-1, 1)]
+    for name in sorted(storage.uv.keys()):
+        if len(storage.uv[name]):
+            columns.append(storage.uv[name].reshape(-1, 2))
+    if storage.armature:
+        columns.append(storage.bone_indices.reshape(-1, 4).astype(np.float32))
+        columns.append(storage.bone_weights.reshape(-1, 4))
+    attrs = np.ascontiguousarray(np.hstack([x[:n].astype(np.float32) for x in columns]))
+
+    _, first, remap = np.unique(attrs, axis=0, return_index=True, return_inverse=True)
+    triangles = remap.reshape(-1)[storage.indices.reshape(-1, 3).astype(np.int64)]
+    return first, triangles
+
+def plane_quadrics(positions: np.ndarray, triangles: np.ndarray, pos_id: np.ndarray, nPositions: int) -> np.ndarray:
+    p0 = positions[triangles[:, 0]]
+    normals = np.cross(positions[triangles[:, 1]] - p0, positions[triangles[:, 2]] - p0)
+    areas = np.linalg.norm(normals, axis=1)
+    valid = areas > 0.0
+    normals[valid] /= areas[valid, np.newaxis]
+    planes = np.hstack((normals, -np.einsum('ij,ij->i', normals, p0)[:, np.newaxis]))
+    # area weighted quadric of every triangle
+    quadrics = np.einsum('i,ij,ik->ijk', areas * 0.5, planes, planes)
+
+    result = np.zeros((nPositions, 4, 4), dtype=np.float64)
+    for k in range(3):
+        np.add.at(result, pos_id[triangles[:, k]], quadrics)
+    return result
+
+def get_triangle_normals(positions: np.ndarray, triangles: np.ndarray) -> np.ndarray:
+    p0 = positions[triangles[:, 0]]
+    return np.cross(positions[triangles[:, 1]] - p0, positions[triangles[:, 2]] - p0)
+
+# Deterministic pseudo random key of every half-edge, it changes from pass to pass.
+def get_edge_hashes(u: np.ndarray, v: np.ndarray, seed: int) -> np.ndarray:
+    h = u.astype(np.uint64) * np.uint64(0x9E3779B1) ^ v.astype(np.uint64) * np.uint64(0x85EBCA6B) ^ np.uint64(seed * 0xC2B2AE35)
+    h ^= h >> np.uint64(15)
+    h *= np.uint64(0x2C1B3C6D)
+    h ^= h >> np.uint64(12)
+    return h & np.uint64(0xFFFFFFFF)
+
+# Returns storage with about 'ratio' of triangles of source storage.
+def decimate(storage: MeshStorage, ratio: float) -> MeshStorage:
+    first, triangles = weld_vertices(storage)
+    if not len(triangles):
+        return storage
+
+    positions = storage.positions.reshape(-1, 3)[first].astype(np.float64)
+    normals = storage.normals.reshape(-1, 3)[first].astype(np.float64)
+    damage = storage.damage_arguments[first]
+    bone_indices = storage.bone_indices.reshape(-1, 4)[first]
+    bone_weights = storage.bone_weights.reshape(-1, 4)[first]
+    nVerts: int = len(first)
+    target: int = max(1, int(len(triangles) * ratio))
+
+    _, pos_id = np.unique(positions, axis=0, return_inverse=True)
+    pos_id = pos_id.reshape(-1)
+    nPositions: int = int(pos_id.max()) + 1
+
+    # uv and normal seams: position is shared by several vertices
+    locked = np.bincount(pos_id, minlength=nPositions)[pos_id] > 1
+
+    # open borders: edge of a single triangle
+    edges = np.sort(pos_id[np.concatenate((triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]))], axis=1)
+    border_edges, counts = np.unique(edges, axis=0, return_counts=True)
+    border = np.zeros(nPositions, dtype=bool)
+    border[border_edges[counts == 1].reshape(-1)] = True
+    locked |= border[pos_id]
+
+    quadrics = plane_quadrics(positions, triangles, pos_id, nPositions)
+    alive = np.ones(len(triangles), dtype=bool)
+    nAlive: int = len(triangles)
+
+    for pass_index in range(MAX_PASSES):
+        if nAlive <= target:
+            break
+        current = triangles[alive]
+
+        # half-edges u -> v
+        u = np.concatenate((current[:, 0], current[:, 1], current[:, 2], current[:, 1], current[:, 2], current[:, 0]))
+        v = np.concatenate((current[:, 1], current[:, 2], current[:, 0], current[:, 0], current[:, 1], current[:, 2]))
+        pairs = np.unique(np.stack((u, v), axis=1), axis=0)
+        u, v = pairs[:, 0], pairs[:, 1]
+
+        valid = ~locked[u]
+        valid &= np.einsum('ij,ij->i', normals[u], normals[v]) >= NORMAL_COS_LIMIT * np.linalg.norm(normals[u], axis=1) * np.linalg.norm(normals[v], axis=1)
+        valid &= damage[u] == damage[v]
+        if storage.armature:
+            valid &= np.all(bone_indices[u] == bone_indices[v], axis=1) & np.all(np.abs(bone_weights[u] - bone_weights[v]) < WEIGHT_EPS, axis=1)
+        u, v = u[valid], v[valid]
+        if not len(u):
+            break
+
+        p = np.hstack((positions[v], np.ones((len(v), 1))))
+        q = quadrics[pos_id[u]] + quadrics[pos_id[v]]
+        cost = np.einsum('ij,ijk,ik->i', p, q, p)
+
+        # Independent set: collapse is taken if it has the best rank at both of its vertices.
+        # Equal costs are ordered by hash of edge, in vertex order neighbouring collapses of flat regions block each other.
+        rank = np.empty(len(cost), dtype=np.int64)
+        rank[np.lexsort((get_edge_hashes(u, v, pass_index), cost))] = np.arange(len(cost))
+        best = np.full(nVerts, len(cost), dtype=np.int64)
+        np.minimum.at(best, u, rank)
+        np.minimum.at(best, v, rank)
+        selected = np.flatnonzero((best[u] == rank) & (best[v] == rank))
+        if not len(selected):
+            break
+        # every collapse removes about two triangles
+        limit: int = (nAlive - target) // 2 + 1
+        selected = selected[np.argsort(rank[selected])][:limit]
+        su, sv = u[selected], v[selected]
+
+        remap = np.arange(nVerts)
+        remap[su] = sv
+
+        # Collapses which flip triangles are cancelled. Triangle can be moved by several collapses,
+        # cancelling one of them moves it again, so it's checked until no moved triangle is flipped.
+        source_normals = get_triangle_normals(positions, current)
+        while True:
+            collapsed = remap[current]
+            is_degenerate = (collapsed[:, 0] == collapsed[:, 1]) | (collapsed[:, 1] == collapsed[:, 2]) | (collapsed[:, 0] == collapsed[:, 2])
+            is_moved = np.any(collapsed != current, axis=1)
+            is_flipped = is_moved & ~is_degenerate & (np.einsum('ij,ij->i', source_normals, get_triangle_normals(positions, collapsed)) <= 0.0)
+            if not is_flipped.any():
+                break
+            remap[current[is_flipped].reshape(-1)] = current[is_flipped].reshape(-1)
+
+        done = remap[su] != su
+        if not done.any():
+            break
+        np.add.at(quadrics, pos_id[sv[done]], quadrics[pos_id[su[done]]])
+
+        indices = np.flatnonzero(alive)
+        triangles[indices] = collapsed
+        alive[indices[is_degenerate]] = False
+        nAlive = int(alive.sum())
+
+    return storage.extract(first[triangles[alive]].reshape(-1))
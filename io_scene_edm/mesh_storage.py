@@ -1,8 +1,9 @@
+import copy
 import numpy as np
 from export_armature import build_bone_id
 from logger import log
 import utils
-from math_tools import normalize
+from math_tools import AaBb, get_positions_aa_bb
 
 def get_armature_from_modifiers(modifiers):
     if not modifiers:
@@ -13,6 +14,102 @@ def get_armature_from_modifiers(modifiers):
         return m.object
     return False
 
+## Vertex groups of mesh in CSR layout: groups of vertex i are [offsets[i], offsets[i + 1]) of 'groups' and 'weights'.
+## Is built in one pass over vertices, so vertex groups are read from blender only once.
+class VertexGroupTable:
+    def __init__(self, bverts) -> None:
+        nVerts = len(bverts)
+        self.counts = np.empty(nVerts, dtype=np.int32)
+        groups = []
+        weights = []
+        for i, v in enumerate(bverts):
+            vgroups = v.groups
+            self.counts[i] = len(vgroups)
+            for gr in vgroups:
+                groups.append(gr.group)
+                weights.append(gr.weight)
+
+        self.offsets = np.zeros(nVerts + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=self.offsets[1:])
+        self.groups = np.array(groups, dtype=np.int32)
+        self.weights = np.array(weights, dtype=np.float32)
+
+    def has_groups(self) -> bool:
+        return len(self.groups) > 0
+
+    # Weight of the first group of every vertex, 'default' for vertices without groups.
+    def first_weights(self, default: float = 0.0) -> np.ndarray:
+        result = np.full(len(self.counts), default, dtype=np.float32)
+        has_groups = self.counts > 0
+        result[has_groups] = self.weights[self.offsets[:-1][has_groups]]
+        return result
+
+SKIN_MAX_INFLUENCES = 4
+SKIN_MIN_WEIGHT = 1.0e-3
+
+## Skin of mesh vertices: up to 4 strongest bone influences of every vertex.
+## Influences below 'SKIN_MIN_WEIGHT' are pruned, kept weights are renormalized.
+## 'bones' are indices of armature pose bones, unused influences have zero weight.
+## 'errors' is part of bone weight of vertex dropped by top 4 selection.
+class SkinTable:
+    def __init__(self, table: VertexGroupTable, group_bones: np.ndarray) -> None:
+        nVerts = len(table.counts)
+        width = max(SKIN_MAX_INFLUENCES, int(table.counts.max()) if nVerts else 0)
+        rows = np.repeat(np.arange(nVerts), table.counts)
+        cols = np.arange(len(table.groups)) - np.repeat(table.offsets[:-1], table.counts)
+
+        bones = group_bones[table.groups] if len(table.groups) else np.empty(0, dtype=np.int32)
+        is_bone = (bones >= 0) & (table.weights >= SKIN_MIN_WEIGHT)
+        weights = np.zeros((nVerts, width), dtype=np.float32)
+        weights[rows, cols] = np.where(is_bone, table.weights, 0.0)
+        indices = np.zeros((nVerts, width), dtype=np.int32)
+        indices[rows, cols] = np.where(is_bone, bones, 0)
+
+        total = weights.sum(axis=1)
+        if width > SKIN_MAX_INFLUENCES:
+            top = np.argpartition(-weights, SKIN_MAX_INFLUENCES - 1, axis=1)[:, :SKIN_MAX_INFLUENCES]
+            weights = np.take_along_axis(weights, top, axis=1)
+            indices = np.take_along_axis(indices, top, axis=1)
+        indices[weights == 0.0] = 0
+
+        has_weights = total > 0.0
+        self.errors = np.zeros(nVerts, dtype=np.float32)
+        self.errors[has_weights] = 1.0 - weights[has_weights].sum(axis=1) / total[has_weights]
+        self.nPruned = int(np.count_nonzero(self.errors > 0.0))
+
+        # same norm as 'math_tools.normalize'
+        lengths = np.linalg.norm(weights, axis=1)
+        weights[has_weights] /= lengths[has_weights, np.newaxis]
+        self.bones = indices
+        self.weights = weights
+
+    def get_max_error(self) -> float:
+        return float(self.errors.max()) if len(self.errors) else 0.0
+
+# Damage args of vertex groups of every vertex, in order of groups.
+def get_vertex_dmg_args(table: VertexGroupTable, obj) -> list:
+    group_args = np.array([utils.get_dmg_vert_group_arg(x.name) for x in obj.vertex_groups] or [-1], dtype=np.int32)
+    args = group_args[table.groups] if len(table.groups) else np.empty(0, dtype=np.int32)
+    rows = np.repeat(np.arange(len(table.counts)), table.counts)
+    is_dmg = args >= 0
+
+    result = [[] for _ in range(len(table.counts))]
+    for row, arg in zip(rows[is_dmg].tolist(), args[is_dmg].tolist()):
+        result[row].append(arg)
+    return result
+
+# Skin of mesh vertices by bones of armature, None if object isn't skinned.
+def build_skin_table(table: VertexGroupTable, obj):
+    armature = get_armature_from_modifiers(obj.modifiers)
+    if not armature:
+        return None
+    bone_ids = {x.name: i for i, x in enumerate(armature.pose.bones)}
+    group_bones = np.array([bone_ids.get(x.name, -1) for x in obj.vertex_groups] or [-1], dtype=np.int32)
+    skin = SkinTable(table, group_bones)
+    if skin.nPruned:
+        log.warning(f"{obj.name}: {skin.nPruned} skin vertices have more than {SKIN_MAX_INFLUENCES} influencing bones. Weakest ones are dropped, max weight error is {skin.get_max_error():.4f}.")
+    return skin
+
 def get_common_dmg_arg(dmg_list):
     for i in dmg_list[0]:
         if i in dmg_list[1] and i in dmg_list[2]:
@@ -41,13 +138,16 @@ class MeshStorage:
         self.armature = []
         self.bone_names = []
         self.has_dmg_group = False
+        self.aa_bb: AaBb = None
+        # Name of render node, object name is used if it's not set.
+        self.name: str = None
 
-    def prepare(self, vertices, bverts, obj, orig_normals, orig_uvs, vertices_indices):
+    def prepare(self, vertices, vertex_dmg_args, skin, obj, orig_normals, orig_uvs, vertices_indices):
         self.vertices = vertices
-        self.bverts = bverts
+        self.vertex_dmg_args = vertex_dmg_args
+        self.skin = skin
+        self.source_vertices = np.empty(self.nTriangles * 3, dtype=np.int64)
 
-        self.vertex_group_names = [[x.name, utils.get_dmg_vert_group_arg(x.name)] for x in obj.vertex_groups]
-            
         self.orig_normals = orig_normals
         self.orig_uvs = orig_uvs
         self.vertices_indices = vertices_indices
@@ -58,16 +158,7 @@ class MeshStorage:
             self.bone_names = []
 
     def set(self, loops):
-        dmg = [[], [], []]
-        for i, index in enumerate(loops):
-            vertex_index = self.vertices_indices[index]
-            vgroups = self.bverts[vertex_index // 3].groups
-            for gr in vgroups:
-                vg_name = self.vertex_group_names[gr.group]
-                if vg_name[1] >= 0:
-                    dmg[i].append(vg_name[1])
-        
-        dmg_arg = get_common_dmg_arg(dmg)
+        dmg_arg = get_common_dmg_arg([self.vertex_dmg_args[self.vertices_indices[index] // 3] for index in loops])
         if dmg_arg >= 0:
             self.has_dmg_group = True
 
@@ -81,43 +172,9 @@ class MeshStorage:
                 self.cur += 1
                 continue
 
-            # sort bones, damage and other groups
-            vgroups = self.bverts[vertex_index // 3].groups
-            bones_groups = []
-            for gr in vgroups:
-                vg_name = self.vertex_group_names[gr.group][0]
-                if vg_name in self.bone_names and gr.weight >= 1.0e-3:
-                    bones_groups.append(gr)
-
             self.damage_arguments[self.nVerts] = dmg_arg
-                
-            if len(bones_groups) > 4:
-                log.fatal("Skin vertex has more than 4 infuencing bones.")
-
-            if bones_groups:
-                weights_temp = [0.0, 0.0, 0.0, 0.0]
-                temp_inds = [0, 0, 0, 0]
-                for i, gr in enumerate(bones_groups):
-                    bone_name = build_bone_id(self.armature.name, self.vertex_group_names[gr.group][0])
-                    if bone_name not in self.bones:
-                        ind = self.cur_bone_index
-                        self.bones[bone_name] = ind
-                        self.cur_bone_index += 1
-                    else:
-                        ind = self.bones[bone_name]
-                    
-                    weights_temp[i] = gr.weight
-                    temp_inds[i] = ind
-
-                normalize(weights_temp)
-                c = self.nVerts * 4
-                self.bone_indices[c : c + 4] = temp_inds
-                self.bone_weights[c : c + 4] = weights_temp
-            elif self.armature:
-                c = self.nVerts * 4
-                self.bone_indices[c : c + 4] = [0.0, 0.0, 0.0, 0.0]
-                self.bone_weights[c : c + 4] = [0, 0, 0, 0]
-            
+            # skin is set from source vertices in one pass in 'shrink'
+            self.source_vertices[self.nVerts] = vertex_index // 3
 
             i = len(self.indices_map)
             self.indices_map[(vertex_index, index, dmg_arg)] = i
@@ -137,13 +194,71 @@ class MeshStorage:
             self.cur += 1
             self.nVerts += 1
 
+    # Bones of storage are numbered in order of their first use by vertices.
+    def set_skin(self) -> None:
+        source = self.source_vertices[:self.nVerts]
+        bones = self.skin.bones[source]
+        weights = self.skin.weights[source]
+        used = weights > 0.0
+
+        ids, first = np.unique(bones[used], return_index=True)
+        ids = ids[np.argsort(first)]
+        local = np.zeros(len(self.bone_names), dtype=np.uint32)
+        local[ids] = np.arange(len(ids), dtype=np.uint32)
+
+        self.bone_indices = np.where(used, local[bones], 0).astype(np.uint32).reshape(-1)
+        self.bone_weights = weights.reshape(-1)
+        self.bones = {build_bone_id(self.armature.name, self.bone_names[x]): i for i, x in enumerate(ids.tolist())}
+        self.cur_bone_index = len(ids)
+
     def shrink(self):
         self.nTriangles = self.cur // 3
         self.positions = self.positions[:self.nVerts * 3]
         self.normals = self.normals[:self.nVerts * 3]
         self.indices = self.indices[:self.nTriangles * 3]
-        self.bone_indices = self.bone_indices[:self.nVerts * 4]
-        self.bone_weights = self.bone_weights[:self.nVerts * 4]
+        if self.armature and self.skin:
+            self.set_skin()
+        else:
+            self.bone_indices = self.bone_indices[:self.nVerts * 4]
+            self.bone_weights = self.bone_weights[:self.nVerts * 4]
         self.damage_arguments = self.damage_arguments[:self.nVerts]
         for k in self.uv.keys():
-            self.uv[k] = self.uv[k][:self.nVerts * 2]
\ No newline at end of file
+            self.uv[k] = self.uv[k][:self.nVerts * 2]
+
+    # Box of positions in object space, computed once.
+    def get_aa_bb(self) -> AaBb:
+        if self.aa_bb is None:
+            self.aa_bb = get_positions_aa_bb(self.positions)
+        return self.aa_bb
+
+    # Returns new storage with triangles 'indices' (flat, vertices of this storage), only used vertices are kept.
+    def extract(self, indices: np.ndarray) -> 'MeshStorage':
+        used, remap = np.unique(indices, return_inverse=True)
+        result = copy.copy(self)
+        result.indices = remap.reshape(-1).astype(np.uint32)
+        result.cur = len(result.indices)
+        result.nTriangles = len(result.indices) // 3
+        result.nVerts = len(used)
+        result.positions = self.positions.reshape(-1, 3)[used].reshape(-1)
+        result.normals = self.normals.reshape(-1, 3)[used].reshape(-1)
+        result.bone_indices = self.bone_indices.reshape(-1, 4)[used].reshape(-1)
+        result.bone_weights = self.bone_weights.reshape(-1, 4)[used].reshape(-1)
+        result.damage_arguments = self.damage_arguments[used]
+        result.uv = {k: (v.reshape(-1, 2)[used].reshape(-1) if len(v) else v) for k, v in self.uv.items()}
+        result.indices_map = {}
+        result.aa_bb = None
+        return result
+
+    # Drops source mesh data and references to blender data, so storage can outlive export run.
+    def release(self):
+        self.vertices = None
+        self.vertex_dmg_args = None
+        self.skin = None
+        self.source_vertices = None
+        self.orig_normals = None
+        self.orig_uvs = None
+        self.vertices_indices = None
+        self.indices_map = {}
+        # only name of armature is kept, storage is checked for skin by it
+        if self.armature and not isinstance(self.armature, str):
+            self.armature = self.armature.name
\ No newline at end of file
@@ -8,6 +8,8 @@ class ObjectNode(TreeNode):
         self.obj: Object = obj
         self.name: str = obj.name
         self.visible: bool = False
+        # Only transform is exported, object is a parent of exported objects.
+        self.transform_only: bool = False
 
 class LodRoot(TreeNode):
     def __init__(self) -> None:
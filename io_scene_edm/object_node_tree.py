@@ -1,12 +1,14 @@
+import bisect
 from dataclasses import dataclass
 
 from bpy.types import Context
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from object_node import ObjectNode, LodRoot, LodLeaf, SceneRootNode
+from export_scope import ExportScope
 from collection_tree import CollectionTree, LodLeafCollectionNode, CollectionNodeCustomType
 from logger import log
-from utils import is_parent, is_list_unique_sub, get_not_unique_attr
-import animation as anim
+from utils import is_list_unique_sub, get_not_unique_attr
+from tree_node import TreeIndex
 
 class ObjectNodeTree:
     def __init__(self, context: Context) -> None:
@@ -14,7 +16,6 @@ class ObjectNodeTree:
         self.obj_tree: SceneRootNode = None
         self.context: Context = context
         self.collection_tree = CollectionTree(context)
-        self.has_transform_anim = False
 
     def destroy(self):
         for key in self.objects:
@@ -28,23 +29,22 @@ class ObjectNodeTree:
             obj_wrp: ObjectNode
             collection_node: CollectionNodeCustomType
 
+        # Lod items are objects of lod collection which are children of scene root,
+        # every other object of lod collection has to be their descendant.
         def find_root(lod_name: str, lods_by_col: List[LodLink]):
             to_add = [x.obj_wrp for x in lods_by_col if type(x.obj_wrp.parent) is SceneRootNode]
+            # items are children of scene root, so their intervals don't overlap
+            intervals: List[Tuple[int, int]] = sorted(tree_index.get_interval(x) for x in to_add)
+            enters: List[int] = [x[0] for x in intervals]
             for lod_link in lods_by_col:
-                result = False
-                for obj_node in to_add:
-                    if lod_link.obj_wrp.name == obj_node.name:
-                        result = True
-                        break
-
-                    if is_parent(lod_link.obj_wrp, obj_node):
-                        result = True
-                        break
-
-                if not result:
+                enter, _ = tree_index.get_interval(lod_link.obj_wrp)
+                i: int = bisect.bisect_right(enters, enter) - 1
+                if i < 0 or enter >= intervals[i][1]:
                     log.fatal(f"Object {lod_link.obj_wrp.name} doesn't belong to lod {lod_name}.")
             return to_add
 
+        # tree is changed only by inserting lod nodes above objects, so ancestors of objects stay the same
+        tree_index = TreeIndex(self.obj_tree)
         lod_links: List[LodLink] = []
 
         # collect
@@ -52,9 +52,6 @@ class ObjectNodeTree:
             if not obj_wrp.visible:
                 continue
 
-            if anim.has_transform_anim(obj_wrp.obj):
-                self.has_transform_anim = True
-
             for bpy_collection in obj_wrp.obj.users_collection:
                 lod_col = self.collection_tree.collections.get(bpy_collection.name, None)
                 if type(lod_col) == LodLeafCollectionNode:
@@ -120,11 +117,20 @@ class ObjectNodeTree:
                 lod_root.add_children(parents)
                 self.obj_tree.add_child(lod_root)
                 
-    def build(self):
+    # deterministic == True sorts objects by name, so order of children doesn't depend on order of scene objects.
+    # scope limits tree to subset of objects, None means whole scene.
+    def build(self, deterministic: bool = False, scope: ExportScope = None):
         self.obj_tree = SceneRootNode()
         # collect all objects
-        for obj in self.context.scene.objects:
+        scene_objects = self.context.scene.objects
+        if scope:
+            scene_objects = [x for x in scene_objects if x.name in scope.objects]
+        if deterministic:
+            scene_objects = sorted(scene_objects, key=lambda x: x.name)
+        for obj in scene_objects:
             self.objects[obj.name] = ObjectNode(obj)
+            if scope and obj.name in scope.transform_only:
+                self.objects[obj.name].transform_only = True
 
         # build tree
         for obj in self.objects.values():
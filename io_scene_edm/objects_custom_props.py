@@ -106,6 +106,44 @@ class EDMPropsGroup(PropertyGroup):
         default = [1.0, 1.0]
     )
 
+    CLUSTER_LIGHTS : BoolProperty(
+        name = "split to chunks",
+        description = "Split fake lights to spatial chunks, every chunk is separate render node which can be culled",
+        default = False
+    )
+
+    CLUSTER_MAX_LIGHTS : IntProperty(
+        name = "max lights in chunk",
+        description = "0 means no limit",
+        default = 256,
+        min = 0
+    )
+
+    CLUSTER_MAX_EXTENT : FloatProperty(
+        name = "max chunk size",
+        description = "Max length of chunk along its longest axis. 0 means no limit",
+        default = 0.0,
+        min = 0.0
+    )
+
+    CLUSTER_MESH : BoolProperty(
+        name = "split to clusters",
+        description = "Split big mesh to spatial clusters, every cluster is separate render node which can be culled",
+        default = False
+    )
+
+    CLUSTER_MAX_VERTICES : IntProperty(
+        name = "max vertices in cluster",
+        default = 16384,
+        min = 64
+    )
+
+    CLUSTER_MAX_TRIANGLES : IntProperty(
+        name = "max triangles in cluster",
+        default = 16384,
+        min = 32
+    )
+
     ANIMATED_BRIGHTNESS : FloatProperty(
         name = "object luminance",
         default = 1.0,
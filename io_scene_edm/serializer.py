@@ -1,6 +1,6 @@
 import re
 from dataclasses import dataclass, field
-from typing import List, Union, Dict, Sequence, Tuple, Optional
+from typing import List, Union, Dict, Sequence, Tuple, Optional, Callable, Any
 
 from bpy.types import NodeLink, ShaderNode, Node, bpy_prop_array, NodeTree, NodeSocket, NodeInputs, NodeOutputs, Nodes, ShaderNodeGroup, ColorRamp
 import bpy
@@ -54,6 +54,58 @@ def copy_attrs(source, destination, attrs: List[str]) -> None:
         else:
             setattr(destination, attrib, type_helper(value))
 
+def set_ramp_attr(destination, attrib: str, value) -> None:
+    if type(value) is ramp_type and hasattr(destination, 'color_ramp'):
+        ramp: ramp_type = value
+        destination.color_ramp.color_mode = ramp.color_mode
+        destination.color_ramp.hue_interpolation = ramp.hue_interpolation
+        destination.color_ramp.interpolation = ramp.interpolation
+        for idx, elem in enumerate(ramp.elements):
+            if idx == 0 or (idx == len(ramp.elements) - 1):
+                new_elem = destination.color_ramp.elements[idx]
+                new_elem.position = elem[0]
+                new_elem.color = elem[1]
+            else:
+                new_elem = destination.color_ramp.elements.new(elem[0])
+                new_elem.color = elem[1]
+    else:
+        setattr(destination, attrib, type_helper(value))
+
+def set_subsurface_method_attr(destination, attrib: str, value) -> None:
+    setattr(destination, attrib, 'RANDOM_WALK' if value == 'RANDOM_WALK_SKIN' else value)
+
+def set_plain_attr(destination, attrib: str, value) -> None:
+    setattr(destination, attrib, type_helper(value))
+
+# Same dispatch as 'copy_attrs' for attributes of serialized node, is decided once per attribute name.
+def get_attr_setter(attrib: str) -> Callable[[Any, str, Any], None]:
+    if attrib == 'color_ramp':
+        return set_ramp_attr
+    if attrib == 'subsurface_method' and bpy.app.version[0] == 3:
+        return set_subsurface_method_attr
+    return set_plain_attr
+
+_attr_setters: Dict[Tuple[str, ...], List[Tuple[str, Callable[[Any, str, Any], None]]]] = {}
+
+def get_attr_setters(attrs: List[str]) -> List[Tuple[str, Callable[[Any, str, Any], None]]]:
+    key: Tuple[str, ...] = tuple(attrs)
+    setters = _attr_setters.get(key)
+    if setters is None:
+        setters = [(attrib, get_attr_setter(attrib)) for attrib in attrs]
+        _attr_setters[key] = setters
+    return setters
+
+## Precompiled creation of serialized node: attribute setters shared by nodes with the same attributes
+## and names and values of input defaults.
+@dataclass
+class NodePlan:
+    setters: List[Tuple[str, Callable[[Any, str, Any], None]]]
+    defs_names: List[str]
+    defs_values: List[Any]
+
+def get_node_plan(snode: 'SNode') -> NodePlan:
+    return NodePlan(get_attr_setters(snode.attrs), [x[0] for x in snode.input_defaults], [x[1] for x in snode.input_defaults])
+
 class SNode:
     def __init__(self, node: ShaderNode, attrs: List[str]) -> None:
         self.attrs = [
@@ -77,16 +129,18 @@ class SNode:
         self.input_defaults = [(x.name, type_helper(x.default_value)) for x in node.inputs if hasattr(x, 'default_value')]
 
     def create(self, node_tree: NodeTree) -> Node:
+        return self.create_with_plan(node_tree, get_node_plan(self))
+
+    def create_with_plan(self, node_tree: NodeTree, plan: 'NodePlan') -> Node:
         node: Node = node_tree.nodes.new(self.bl_idname)
-        copy_attrs(self, node, self.attrs)
+        for attrib, setter in plan.setters:
+            setter(node, attrib, getattr(self, attrib))
 
         inputs_with_defs = [x for x in node.inputs if hasattr(x, 'default_value')]
-        inputs_names = [x.name for x in inputs_with_defs]
-        defs_names = [x[0] for x in self.input_defaults]
-        if inputs_names == defs_names:
-            for i in zip(inputs_with_defs, self.input_defaults):
+        if len(inputs_with_defs) == len(plan.defs_names) and all(x.name == name for x, name in zip(inputs_with_defs, plan.defs_names)):
+            for socket, value in zip(inputs_with_defs, plan.defs_values):
                 try:
-                    i[0].default_value = i[1][1]
+                    socket.default_value = value
                 except ValueError:
                     # It seems reroute node takes default value from connected nodes.
                     pass
@@ -193,6 +247,41 @@ def get_socket_name_type(socket_collection: Union[NodeOutputs, NodeInputs], name
         result = socket_collection.get(name)
     return result
 
+## Sockets of created node by name and type. First socket of the same name and type wins as in 'get_socket_name_type'.
+class SocketIndex:
+    def __init__(self, socket_collection: Union[NodeOutputs, NodeInputs]) -> None:
+        self.socket_collection = socket_collection
+        self.sockets: List[NodeSocket] = list(socket_collection)
+        self.by_name_type: Dict[Tuple[str, str], NodeSocket] = {}
+        for socket in self.sockets:
+            self.by_name_type.setdefault((socket.name, socket.bl_idname), socket)
+
+    def find(self, name: str, bpy_type_name: str, socket_idx: int) -> Union[None, NodeSocket]:
+        result: NodeSocket = None
+        if socket_idx and socket_idx >= 0 and socket_idx < len(self.sockets):
+            result = self.sockets[socket_idx]
+            if result.name == name and result.bl_idname == bpy_type_name:
+                return result
+        if not name or not bpy_type_name:
+            return result
+        found: NodeSocket = self.by_name_type.get((name, bpy_type_name))
+        if found:
+            return found
+        # socket at saved index is kept when nothing matches exactly, as in 'get_socket_name_type'
+        if result:
+            return result
+        # fuzzy matching by name is rare, it's done by linear scan
+        return get_socket_name_type(self.socket_collection, name, bpy_type_name, -1)
+
+# Index of outputs or inputs of node, is built on first lookup.
+def get_socket_index(socket_indices: Dict[Tuple[str, bool], SocketIndex], node_name: str, node: Node, is_output: bool) -> SocketIndex:
+    key: Tuple[str, bool] = (node_name, is_output)
+    index: SocketIndex = socket_indices.get(key)
+    if index is None:
+        index = SocketIndex(node.outputs if is_output else node.inputs)
+        socket_indices[key] = index
+    return index
+
 # TODO: its better to add comment to this class
 class SLink:
     def __init__(self, link: NodeLink) -> None:
@@ -217,13 +306,17 @@ class SLink:
         self.to_type = link.to_node.bl_idname
         self.to_socket_idx = to_socket_idx
 
-    def create(self, node_tree: NodeTree, nodes: Dict[str, Node]):
+    def create(self, node_tree: NodeTree, nodes: Dict[str, Node], socket_indices: Dict[Tuple[str, bool], SocketIndex] = None):
         a: ShaderNode = nodes.get(self.from_node)
         b: ShaderNode = nodes.get(self.to_node)
         link: NodeLink = None
         if a and b:
-            socket_from: NodeSocket = get_socket_name_type(a.outputs, self.from_socket, self.from_idname, self.from_socket_idx)
-            socket_to: NodeSocket = get_socket_name_type(b.inputs, self.to_socket, self.to_idname, self.to_socket_idx)
+            if socket_indices is None:
+                socket_from: NodeSocket = get_socket_name_type(a.outputs, self.from_socket, self.from_idname, self.from_socket_idx)
+                socket_to: NodeSocket = get_socket_name_type(b.inputs, self.to_socket, self.to_idname, self.to_socket_idx)
+            else:
+                socket_from: NodeSocket = get_socket_index(socket_indices, self.from_node, a, True).find(self.from_socket, self.from_idname, self.from_socket_idx)
+                socket_to: NodeSocket = get_socket_index(socket_indices, self.to_node, b, False).find(self.to_socket, self.to_idname, self.to_socket_idx)
             # socket_from: NodeSocket = a.outputs[self.from_socket_idx]
             # socket_to: NodeSocket = b.inputs[self.to_socket_idx]
             if socket_from and socket_to:
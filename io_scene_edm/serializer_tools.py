@@ -5,7 +5,7 @@ from typing import List, Union, Dict, Sequence, Tuple, Optional, Callable
 from bpy.types import NodeLink, ShaderNode, Node, bpy_prop_array, NodeTree, NodeSocket, NodeInputs, NodeOutputs, Nodes, ShaderNodeGroup, ColorRamp
 from logger import log
 from utils import type_helper, md5
-from serializer import SNode, SOutput, SInput, ramp_type, SLink, SNodeMixRGB, SNodeMix, SNodeSeparateColor, SNodeSeparateRGB, SNodeColorRamp, SNodeInvert, SNodeCombineRGB, SNodeNormalMap, SNodeBsdfPrincipled, SNodeGroupInput, SNodeGroupOutput, SNodeReroute, SShaderNode, SShaderNodeMath
+from serializer import SNode, SOutput, SInput, ramp_type, SLink, SNodeMixRGB, SNodeMix, SNodeSeparateColor, SNodeSeparateRGB, SNodeColorRamp, SNodeInvert, SNodeCombineRGB, SNodeNormalMap, SNodeBsdfPrincipled, SNodeGroupInput, SNodeGroupOutput, SNodeReroute, SShaderNode, SShaderNodeMath, NodePlan, get_node_plan, SocketIndex
 from version_specific import create_custom_inodesocket_input, InterfaceNodeSocket, create_inodesocket_output, create_inodesocket_input, create_custom_inodesocket_input, extract_group_inputs, extract_group_outputs
 from enums import BpyShaderNode, NodeSocketCommonEnum, SocketItemTypeEnum, SocketItemInOutTypeEnum, BpyNodeSocketType
 
@@ -43,6 +43,9 @@ def get_socket_name_type(socket_collection: Union[NodeOutputs, NodeInputs], name
         result = socket_collection[name]
     return result
 
+TEMPLATE_PREFIX = '.EDM_Template_'
+TEMPLATE_KEY_PROP = 'edm_template_key'
+
 @dataclass
 class MatDesc:
     name: str
@@ -59,7 +62,12 @@ class MatDesc:
         pbr_tree: NodeTree = bpy.data.node_groups.get(self.name)
         if pbr_tree:
             return pbr_tree
-        node_tree: NodeTree = bpy.data.node_groups.new(name_with_postfix, node_tree_type)
+        node_tree: NodeTree = self.get_template(node_tree_type, sinput_fn).copy()
+        node_tree.name = name_with_postfix
+        return node_tree
+
+    def build_tree(self, name: str, node_tree_type: BpyShaderNode, sinput_fn: Callable[[SInput, NodeTree], None]) -> NodeTree:
+        node_tree: NodeTree = bpy.data.node_groups.new(name, node_tree_type)
         nodes: Dict[str, Node] = self.create_nodes(node_tree)
         for input in self.inputs:
             sinput_fn(input, node_tree)
@@ -71,6 +79,20 @@ class MatDesc:
         links = self.create_links(node_tree, nodes)
         return node_tree
 
+    ## Tree built from description once, every strapped tree is its copy. Template is hidden tree without users,
+    ## so it isn't saved to blend file. It's rebuilt if description changed.
+    def get_template(self, node_tree_type: BpyShaderNode, sinput_fn: Callable[[SInput, NodeTree], None]) -> NodeTree:
+        template_name: str = TEMPLATE_PREFIX + self.name
+        template_key: str = f'{node_tree_type}:{sinput_fn.__name__}:{self.version}:{self.blend_file_md5}'
+        template: NodeTree = bpy.data.node_groups.get(template_name)
+        if template and template.get(TEMPLATE_KEY_PROP) == template_key:
+            return template
+        if template:
+            bpy.data.node_groups.remove(template)
+        template = self.build_tree(template_name, node_tree_type, sinput_fn)
+        template[TEMPLATE_KEY_PROP] = template_key
+        return template
+
     def create_with_postfix(self, postfix: str) -> NodeTree:
         #return self.strap_tree(BpyShaderNode.NODE_TREE, postfix, sinput_add_to_tree_norm)
         return self.strap_tree(BpyShaderNode.NODE_TREE, postfix, sinput_add_to_tree_custom)
@@ -88,17 +110,26 @@ class MatDesc:
         self.postfix = ''
         return self.create_custom_with_postfix(self.postfix)
     
+    # Plans are computed once per description.
+    def get_node_plans(self) -> List[NodePlan]:
+        plans: List[NodePlan] = self.__dict__.get('_node_plans')
+        if plans is None:
+            plans = [get_node_plan(node) for node in self.nodes]
+            self._node_plans = plans
+        return plans
+
     def create_nodes(self, node_tree: NodeTree) -> Dict[str, Node]:
         nodes: Dict[str, Node] = {}
-        for node in self.nodes:
-            bpy_node: Node = node.create(node_tree)
+        for node, plan in zip(self.nodes, self.get_node_plans()):
+            bpy_node: Node = node.create_with_plan(node_tree, plan)
             nodes[node.name] = bpy_node
         return nodes
     
     def create_links(self, node_tree: NodeTree, nodes: Dict[str, Node]) -> List[NodeLink]:
         links: List[NodeLink] = []
+        socket_indices: Dict[Tuple[str, bool], SocketIndex] = {}
         for link in self.links:
-            bpy_link: NodeLink = link.create(node_tree, nodes)
+            bpy_link: NodeLink = link.create(node_tree, nodes, socket_indices)
             links.append(bpy_link)
         return links
 
@@ -147,7 +178,7 @@ def collect_nodetree_links(node_tree: NodeTree, links: List[SLink]) -> None:
         if shader_link not in links:
             links.append(shader_link)
 
-def serialize_group(node_group: ShaderNodeGroup, blend_file_path: str) -> bytes:
+def build_mat_desc(node_group: ShaderNodeGroup, blend_file_path: str) -> MatDesc:
     mat_desc = MatDesc(node_group.node_tree.name, [], [], [], -1)
     mat_desc.inputs: List[SInput] = extract_group_inputs(node_group)
     mat_desc.outputs: List[SOutput] = extract_group_outputs(node_group)
@@ -161,5 +192,8 @@ def serialize_group(node_group: ShaderNodeGroup, blend_file_path: str) -> bytes:
             mat_desc.version = input.default_value
             break
     mat_desc.blend_file_md5 = md5(blend_file_path)
-    dump = pickle.dumps(mat_desc)
+    return mat_desc
+
+def serialize_group(node_group: ShaderNodeGroup, blend_file_path: str) -> bytes:
+    dump = pickle.dumps(build_mat_desc(node_group, blend_file_path))
     return dump
\ No newline at end of file
@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+from bpy.types import Object
+
+from logger import log
+from mesh_builder import get_mesh, is_mesh_cacheable
+from export_cache import export_cache, get_object_deps
+
+## Collision shells need positions and triangles only.
+## Positions are welded by exact value, degenerate and duplicated triangles are dropped.
+
+BVH_LEAF_SIZE = 4
+
+@dataclass
+class ShellStorage:
+    positions: np.ndarray   # flat xyz, float32
+    indices: np.ndarray     # flat, uint32
+    nTriangles: int
+    nDropped: int = 0
+
+def read_shell_geometry(obj: Object):
+    bpy_mesh = get_mesh(obj)
+    bpy_mesh.calc_loop_triangles()
+
+    positions = np.empty(len(bpy_mesh.vertices) * 3, dtype=np.float32)
+    bpy_mesh.vertices.foreach_get('co', positions)
+
+    triangles = np.empty(len(bpy_mesh.loop_triangles) * 3, dtype=np.int64)
+    bpy_mesh.loop_triangles.foreach_get('vertices', triangles)
+    return positions.reshape(-1, 3), triangles.reshape(-1, 3)
+
+def weld_positions(positions: np.ndarray, triangles: np.ndarray):
+    welded, remap = np.unique(positions, axis=0, return_inverse=True)
+    return welded, remap.reshape(-1)[triangles]
+
+# Rotates every triangle so its smallest index is first, winding is kept.
+def get_canonical_triangles(triangles: np.ndarray) -> np.ndarray:
+    shift = np.argmin(triangles, axis=1)
+    columns = (shift[:, np.newaxis] + np.arange(3)) % 3
+    return np.take_along_axis(triangles, columns, axis=1)
+
+# Drops triangles with repeated vertices, zero area and the same vertices in the same winding as previous ones.
+# Triangle with opposite winding is kept, it's other side of double sided wall.
+def clean_triangles(positions: np.ndarray, triangles: np.ndarray) -> np.ndarray:
+    keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 0] != triangles[:, 2])
+    triangles = triangles[keep]
+
+    p0 = positions[triangles[:, 0]].astype(np.float64)
+    cross = np.cross(positions[triangles[:, 1]] - p0, positions[triangles[:, 2]] - p0)
+    triangles = triangles[np.einsum('ij,ij->i', cross, cross) > 0.0]
+
+    _, first = np.unique(get_canonical_triangles(triangles), axis=0, return_index=True)
+    return triangles[np.sort(first)]
+
+# Orders triangles as leaves of BVH built by median splits of triangle centroids along the longest axis,
+# so triangles close in space are close in shell. Only the order is written, pyedm doesn't store BVH nodes.
+def get_bvh_order(positions: np.ndarray, triangles: np.ndarray, leaf_size: int = BVH_LEAF_SIZE) -> np.ndarray:
+    centroids = positions[triangles].mean(axis=1)
+
+    order: List[np.ndarray] = []
+    stack = [np.arange(len(triangles))]
+    while stack:
+        tris = stack.pop()
+        extent = centroids[tris].max(axis=0) - centroids[tris].min(axis=0)
+        if len(tris) <= leaf_size or not extent.any():
+            order.append(tris)
+            continue
+
+        axis = int(np.argmax(extent))
+        half = len(tris) // 2
+        split = np.argpartition(centroids[tris, axis], half)
+        # left half is popped first
+        stack.append(tris[split[half:]])
+        stack.append(tris[split[:half]])
+
+    return np.concatenate(order) if order else np.empty(0, dtype=np.int64)
+
+def build_shell(obj: Object, bvh_order: bool = False) -> ShellStorage:
+    positions, triangles = read_shell_geometry(obj)
+    nSource = len(triangles)
+
+    positions, triangles = weld_positions(positions, triangles)
+    triangles = clean_triangles(positions, triangles)
+    if len(triangles) < nSource:
+        log.info(f"{obj.name} shell: {nSource - len(triangles)} degenerate or duplicated triangles are dropped.")
+
+    # Only referenced positions are kept.
+    used, remap = np.unique(triangles, return_inverse=True)
+    positions = positions[used]
+    triangles = remap.reshape(-1, 3)
+
+    if bvh_order and len(triangles):
+        triangles = triangles[get_bvh_order(positions, triangles)]
+
+    return ShellStorage(
+        np.ascontiguousarray(positions, dtype=np.float32).reshape(-1),
+        np.ascontiguousarray(triangles, dtype=np.uint32).reshape(-1),
+        len(triangles),
+        nSource - len(triangles)
+    )
+
+# Same as 'build_shell', but result is kept between export runs until object or its data changes.
+def build_shell_cached(obj: Object, bvh_order: bool = False) -> ShellStorage:
+    if not is_mesh_cacheable(obj):
+        return build_shell(obj, bvh_order)
+    pointers = (obj.as_pointer(), obj.data.as_pointer())
+    return export_cache.get(('SHELL', obj.name, bvh_order), get_object_deps(obj), pointers, lambda: build_shell(obj, bvh_order))
@@ -1,11 +1,13 @@
+from typing import Dict, List, Tuple
 
+## Children are kept in insertion ordered dict used as ordered set, so membership checks and removal are O(1).
 class TreeNode:
     def __init__(self) -> None:
         self.parent = None
-        self.children = []
+        self.children: Dict['TreeNode', None] = {}
 
     def destroy(self):
-        self.remove_children(self.children)
+        self.remove_children(list(self.children))
         self.parent = None
 
     def get_child_by_name(self, name):
@@ -17,7 +19,7 @@ class TreeNode:
     def add_child(self, o):
         assert o not in self.children
 
-        self.children.append(o)
+        self.children[o] = None
         o.parent = self
     
     def add_children(self, objects):
@@ -28,8 +30,35 @@ class TreeNode:
         assert o in self.children
 
         o.parent = None
-        self.children.remove(o)
+        del self.children[o]
 
     def remove_children(self, objects):
         for o in objects:
             self.remove_child(o)
+
+## Euler tour of tree: node is ancestor of other node if its [enter, exit] interval contains enter of other one.
+## Index is valid until tree is changed, nodes added later aren't in index.
+class TreeIndex:
+    def __init__(self, root: TreeNode) -> None:
+        self.intervals: Dict[TreeNode, Tuple[int, int]] = {}
+        enter: Dict[TreeNode, int] = {}
+        time: int = 0
+        stack: List[Tuple[TreeNode, bool]] = [(root, False)]
+        while stack:
+            node, is_exit = stack.pop()
+            if is_exit:
+                self.intervals[node] = (enter[node], time)
+                continue
+            enter[node] = time
+            time += 1
+            stack.append((node, True))
+            stack.extend((x, False) for x in reversed(list(node.children)))
+
+    # Interval contains enters of node and all its descendants.
+    def get_interval(self, node: TreeNode) -> Tuple[int, int]:
+        return self.intervals[node]
+
+    # Returns if 'ancestor' is 'node' or its parent despite the distance.
+    def is_ancestor_or_self(self, ancestor: TreeNode, node: TreeNode) -> bool:
+        a_enter, a_exit = self.intervals[ancestor]
+        return a_enter <= self.intervals[node][0] < a_exit
@@ -2,11 +2,12 @@ import re
 import bpy
 import os.path
 import hashlib
+from collections import Counter
 from mathutils import Color, Vector, Euler
 from bpy.utils import register_class, unregister_class
 from typing import List
 from dataclasses import dataclass
-from logger import log
+from logger import log, LogLevel
 from bpy.types import Object, bpy_prop_array, ShaderNodeGroup, ShaderNodeCustomGroup
 from typing import List, Union, Tuple, Union, Sequence, Callable, Dict
 from bpy.types import Node
@@ -159,28 +160,21 @@ def extract_arg_number(str_name: str) -> int:
     return int(m.group(1))
 
 def is_list_unique_sub(list: List, sub_obj, attr_name) -> bool:
-    for i in list:
-        ct = 0
-        for j in list:
-            if getattr(getattr(i, sub_obj), attr_name) == getattr(getattr(j, sub_obj), attr_name):
-                ct += 1
-        if ct > 1:
-            return False
-        
-    return True
+    return get_not_unique_attr(list, sub_obj, attr_name) is None
 
+# Returns first value of attribute which isn't unique, None if all values are unique.
 def get_not_unique_attr(list: List, sub_obj, attr_name) -> bool:
+    counts = Counter(getattr(getattr(i, sub_obj), attr_name) for i in list)
     for i in list:
-        ct = 0
-        for j in list:
-            if getattr(getattr(i, sub_obj), attr_name) == getattr(getattr(j, sub_obj), attr_name):
-                ct += 1
-        if ct > 1:
-            return getattr(getattr(i, sub_obj), attr_name)
+        value = getattr(getattr(i, sub_obj), attr_name)
+        if counts[value] > 1:
+            return value
         
     return None
 
 def print_parents(obj):
+    if not log.is_enabled_for(LogLevel.DEBUG):
+        return
     res = []
     p = obj
     while p:
@@ -190,7 +184,7 @@ def print_parents(obj):
     log.debug(' --> '.join(res))
 
 def print_matrix(name, mat):
-    log.debug(f'{name}:\n{str(mat)}')
+    log.debug('%s:\n%s', name, mat)
 
 dmg_vertex_group_re_c = re.compile(r'^DMG_(\d+)$')
 def get_dmg_vert_group_arg(vertex_group_name):
@@ -0,0 +1,69 @@
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import os
+import sys
+from unittest import mock
+
+import numpy as np
+import pytest
+
+## Tests of numpy parts of add-on, they run outside of blender.
+## Modules of add-on import each other flat, as blender loads them, so add-on folder is added to path.
+## Blender and native modules which can't be imported are replaced by mocks.
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'io_scene_edm')
+MOCKED_MODULES = ('bpy', 'bpy_extras', 'bmesh', 'gpu', 'mathutils', 'pyedm', 'pyedm_platform_selector')
+
+class MockFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    def find_spec(self, name, path, target=None):
+        if name.split('.')[0] in MOCKED_MODULES:
+            return importlib.util.spec_from_loader(name, self, is_package=True)
+        return None
+
+    def create_module(self, spec):
+        module = mock.MagicMock()
+        module.__path__ = []
+        module.__name__ = spec.name
+        module.__spec__ = spec
+        module.app.version = (4, 1, 0)
+        return module
+
+    def exec_module(self, module):
+        pass
+
+if ADDON_DIR not in sys.path:
+    sys.path.insert(0, ADDON_DIR)
+if importlib.machinery.PathFinder.find_spec('bpy') is None:
+    sys.meta_path.insert(0, MockFinder())
+    # version_specific has to be loaded before modules which import it back through material modules
+    import version_specific
+
+from mesh_storage import MeshStorage
+
+# Storage of 'positions' and 'triangles' with one normal and without uv, skin and damage args.
+def make_storage(positions: np.ndarray, triangles: np.ndarray, normal=(0.0, 0.0, 1.0)) -> MeshStorage:
+    nVerts: int = len(positions)
+    storage = MeshStorage(len(triangles), [], None, 0, None)
+    storage.positions = np.asarray(positions, dtype=np.float32).reshape(-1)
+    storage.normals = np.tile(np.asarray(normal, dtype=np.float32), nVerts)
+    storage.indices = np.asarray(triangles, dtype=np.uint32).reshape(-1)
+    storage.nVerts = nVerts
+    storage.cur = len(storage.indices)
+    storage.damage_arguments = np.full(nVerts, -1.0, dtype=np.float32)
+    storage.bone_indices = np.zeros(nVerts * 4, dtype=np.uint32)
+    storage.bone_weights = np.zeros(nVerts * 4, dtype=np.float32)
+    storage.armature = None
+    return storage
+
+# Flat n x n grid of vertices in xy plane, two triangles per cell.
+def make_grid(n: int):
+    xs, ys = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    positions = np.stack((xs.reshape(-1), ys.reshape(-1), np.zeros(n * n)), axis=1)
+    a = (np.arange(n - 1)[:, np.newaxis] * n + np.arange(n - 1)).reshape(-1)
+    triangles = np.concatenate((np.stack((a, a + n, a + 1), axis=1), np.stack((a + 1, a + n, a + n + 1), axis=1)))
+    return positions, triangles
+
+@pytest.fixture
+def grid_storage():
+    return make_storage(*make_grid(40))
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from conftest import make_grid, make_storage
+from bone_palettes import get_bone_palettes, get_triangle_bone_sets, pack_palettes, split_bone_palettes
+
+N_BONES = 12
+
+# Grid skinned by stripes along x, every stripe of vertices has its own bone.
+def make_skin_storage(n: int = 24):
+    positions, triangles = make_grid(n)
+    storage = make_storage(positions, triangles)
+    bones = (positions[:, 0] * N_BONES // n).astype(np.uint32)
+    storage.armature = 'Armature'
+    storage.bone_indices = np.zeros((len(positions), 4), dtype=np.uint32)
+    storage.bone_indices[:, 0] = bones
+    storage.bone_indices = storage.bone_indices.reshape(-1)
+    storage.bone_weights = np.zeros((len(positions), 4), dtype=np.float32)
+    storage.bone_weights[:, 0] = 1.0
+    storage.bone_weights = storage.bone_weights.reshape(-1)
+    storage.bones = {f'Bone{i}': i for i in range(N_BONES)}
+    return storage
+
+# Bone name and position of every vertex of every triangle.
+def get_skinned_triangles(storage) -> set:
+    names = {i: name for name, i in storage.bones.items()}
+    positions = storage.positions.reshape(-1, 3).tolist()
+    bones = storage.bone_indices.reshape(-1, 4)[:, 0].tolist()
+    return {tuple((tuple(positions[i]), names[bones[i]]) for i in x) for x in storage.indices.reshape(-1, 3).tolist()}
+
+def test_triangle_bone_sets():
+    storage = make_skin_storage()
+    sets = get_triangle_bone_sets(storage)
+    assert sets.shape == (storage.nTriangles, 12)
+    # triangle of one stripe has one bone, triangle between stripes has two
+    counts = (sets >= 0).sum(axis=1)
+    assert set(counts.tolist()) == {1, 2}
+
+def test_pack_palettes_first_fit():
+    sets = np.array([[-1, 0, 1], [-1, 1, 2], [-1, -1, 3], [-1, 2, 3]])
+    palettes = pack_palettes(sets, 3)
+    assert palettes.tolist() == [0, 0, 1, 1]
+
+def test_split_keeps_triangles_and_bones():
+    storage = make_skin_storage()
+    parts = split_bone_palettes(storage, 4)
+    assert len(parts) > 1
+    assert all(len(x.bones) <= 4 for x in parts)
+    assert sum(x.nTriangles for x in parts) == storage.nTriangles
+    assert set().union(*(get_skinned_triangles(x) for x in parts)) == get_skinned_triangles(storage)
+
+def test_palettes_are_named_by_object():
+    storage = make_skin_storage()
+    obj = SimpleNamespace(name='Skin')
+    parts = get_bone_palettes(obj, [storage], 4)
+    assert [x.name for x in parts] == [f'Skin_{i}' for i in range(len(parts))]
+
+def test_small_skin_and_disabled_are_not_split():
+    storage = make_skin_storage()
+    obj = SimpleNamespace(name='Skin')
+    assert get_bone_palettes(obj, [storage], N_BONES) == [storage]
+    assert get_bone_palettes(obj, [storage], 0) == [storage]
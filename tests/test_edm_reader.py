@@ -0,0 +1,63 @@
+import struct
+
+import numpy as np
+
+from edm_reader import CHUNK_MAX_SIZE, CHUNK_MIN_SIZE, EdmFile, diff, get_chunk_ends, is_content_identical
+
+STRINGS = ['model::RootNode', 'model::Transform', 'Root', 'Body']
+
+# Version 10 file: string table, type index maps with counts of 'model::Transform' and payload.
+def write_edm(path, payload: bytes, transforms: int = 1, strings=STRINGS) -> str:
+    table = b'\0'.join(x.encode() for x in strings) + b'\0'
+    data = b'EDM' + struct.pack('<HI', 10, len(table)) + table
+    data += struct.pack('<III', 1, 1, transforms) + struct.pack('<I', 0)
+    data += payload
+    path.write_bytes(data)
+    return str(path)
+
+def make_payload(size: int, seed: int = 0) -> bytes:
+    return np.random.default_rng(seed).integers(0, 256, size, dtype=np.uint8).tobytes()
+
+def test_header(tmp_path):
+    with EdmFile(write_edm(tmp_path / 'a.edm', make_payload(100), 3)) as f:
+        assert f.version == 10
+        assert f.strings == STRINGS
+        assert f.key_counts == [{'model::Transform': 3}, {}]
+        assert len(f.payload()) == 100
+
+def test_chunk_sizes():
+    data = np.frombuffer(make_payload(1 << 20), dtype=np.uint8)
+    ends = get_chunk_ends(data)
+    sizes = np.diff([0] + ends)
+    assert ends[-1] == len(data)
+    assert sizes[:-1].min() >= CHUNK_MIN_SIZE and sizes.max() <= CHUNK_MAX_SIZE
+    assert 32 <= len(ends) <= 512
+
+def test_chunks_resync_after_insert():
+    data = make_payload(1 << 20)
+    ends_a = get_chunk_ends(np.frombuffer(data, dtype=np.uint8))
+    inserted = data[:1000] + b'x' + data[1000:]
+    ends_b = get_chunk_ends(np.frombuffer(inserted, dtype=np.uint8))
+    # all boundaries after the first ones are shifted by inserted byte
+    assert set(x + 1 for x in ends_a[2:]) <= set(ends_b)
+
+def test_identical_files(tmp_path):
+    a = write_edm(tmp_path / 'a.edm', make_payload(200000))
+    b = write_edm(tmp_path / 'b.edm', make_payload(200000))
+    assert is_content_identical(a, b)
+    assert diff(a, b).is_empty()
+
+def test_diff_of_inserted_bytes(tmp_path):
+    payload = make_payload(400000)
+    a = write_edm(tmp_path / 'a.edm', payload)
+    b = write_edm(tmp_path / 'b.edm', payload[:200000] + b'inserted' + payload[200000:], 2, STRINGS + ['Wing'])
+    assert not is_content_identical(a, b)
+    result = diff(a, b)
+    assert result.key_counts == {'model::Transform': (1, 2)}
+    assert result.strings_added == ['Wing']
+    # only chunks around inserted bytes differ
+    assert len(result.removed_ranges) == 1 and len(result.added_ranges) == 1
+    assert sum(size for _, size in result.added_ranges) <= 2 * CHUNK_MAX_SIZE
+    offset, size = result.added_ranges[0]
+    with EdmFile(b) as f:
+        assert offset <= f.payload_offset + 200000 < offset + size
@@ -0,0 +1,70 @@
+import json
+from math import cos, radians, sin
+
+import numpy as np
+import pytest
+
+from light_bounds import build_light_grid, get_light_bounds, get_sector_sphere, write_light_grid
+
+def make_matrix(position=(0.0, 0.0, 0.0), scale: float = 1.0) -> np.ndarray:
+    m = np.eye(4)
+    m[:3, :3] *= scale
+    m[:3, 3] = position
+    return m
+
+# Apex, points of cone rim and of cap of spot light shining along -Z.
+def get_sector_points(distance: float, cone_angle: float) -> np.ndarray:
+    points = [(0.0, 0.0, 0.0), (0.0, 0.0, -distance)]
+    half: float = cone_angle * 0.5
+    for k in range(16):
+        a: float = k * np.pi / 8.0
+        points.append((distance * sin(half) * cos(a), distance * sin(half) * sin(a), -distance * cos(half)))
+    return np.array(points)
+
+def test_omni_bounds():
+    bounds = get_light_bounds(make_matrix((1.0, 2.0, 3.0), 2.0), 5.0)
+    assert bounds.center == pytest.approx((1.0, 2.0, 3.0))
+    assert bounds.radius == pytest.approx(10.0)
+    assert bounds.aa_bb == pytest.approx((-9.0, -8.0, -7.0, 11.0, 12.0, 13.0))
+
+@pytest.mark.parametrize('cone_angle', [radians(20.0), radians(60.0), radians(90.0), radians(150.0)])
+def test_spot_sphere_contains_sector(cone_angle):
+    bounds = get_light_bounds(make_matrix(), 10.0, cone_angle)
+    distances = np.linalg.norm(get_sector_points(10.0, cone_angle) - np.array(bounds.center), axis=1)
+    assert distances.max() <= bounds.radius + 1.0e-9
+    assert bounds.radius <= 10.0 + 1.0e-9
+
+def test_narrow_spot_is_smaller_than_omni():
+    assert get_light_bounds(make_matrix(), 10.0, radians(30.0)).radius < 10.0
+
+def test_sector_sphere_through_apex():
+    center, radius = get_sector_sphere(np.zeros(3), np.array([0.0, 0.0, -1.0]), 10.0, radians(30.0))
+    assert np.linalg.norm(center) == pytest.approx(radius)
+
+def test_grid_cells_contain_lights():
+    bounds = {f'Light{i}': get_light_bounds(make_matrix((i * 10.0, 0.0, 0.0)), 3.0) for i in range(8)}
+    grid = build_light_grid(bounds)
+    assert grid.names == list(bounds.keys())
+    assert len(grid.cell_offsets) == int(np.prod(grid.dims)) + 1
+    for i, name in enumerate(grid.names):
+        cell = np.clip(((np.array(bounds[name].center) - grid.origin) / grid.cell_size).astype(np.int64), 0, np.array(grid.dims) - 1)
+        index: int = int(cell[0] + grid.dims[0] * (cell[1] + grid.dims[1] * cell[2]))
+        assert name in grid.get_cell_lights(index)
+
+def test_grid_skips_far_cells():
+    bounds = {'A': get_light_bounds(make_matrix((0.0, 0.0, 0.0)), 1.0), 'B': get_light_bounds(make_matrix((100.0, 0.0, 0.0)), 1.0)}
+    grid = build_light_grid(bounds)
+    cells = [grid.get_cell_lights(i) for i in range(int(np.prod(grid.dims)))]
+    assert not any('A' in x and 'B' in x for x in cells)
+    assert sum(len(x) for x in cells) < len(cells)
+
+def test_grid_file(tmp_path):
+    bounds = {f'Light{i}': get_light_bounds(make_matrix((i * 10.0, 0.0, 0.0)), 3.0) for i in range(4)}
+    grid = build_light_grid(bounds)
+    path = tmp_path / 'model.edm.lights.json'
+    write_light_grid(str(path), bounds, grid)
+    data = json.loads(path.read_text())
+    assert [x['name'] for x in data['lights']] == grid.names
+    assert data['lights'][1]['center'] == pytest.approx([10.0, 0.0, 0.0])
+    assert data['cell_offsets'] == grid.cell_offsets.tolist()
+    assert data['light_indices'] == grid.light_indices.tolist()
@@ -0,0 +1,60 @@
+import pytest
+
+from matdesc_format import MatDescFile, TYPE_TAGS, write_matdesc_file
+
+# Plain classes standing for description classes, they are found by module and name as pickled records are.
+def make_class(tag: str) -> type:
+    module, name = TYPE_TAGS[tag]
+    return type(name, (), {'__module__': module})
+
+CLASSES = {tag: make_class(tag) for tag in ('MatDesc', 'SNodeMix', 'SLink', 'SInput')}
+
+def make(tag: str, **fields):
+    o = CLASSES[tag]()
+    o.__dict__.update(fields)
+    return o
+
+def make_desc():
+    socket = make('SInput', name='Color', default_value=(1.0, 0.5, 0.0, 1.0))
+    node = make('SNodeMix', name='Mix', location=[10.0, 20.0], inputs=[socket])
+    link = make('SLink', from_node='Mix', from_socket_idx=0, to_socket=socket)
+    desc = make('MatDesc', name='EDM_Test_Material', nodes=[node], links=[link], inputs=[socket], version=3)
+    node.owner = desc
+    return desc
+
+def write_file(tmp_path, descs) -> MatDescFile:
+    path = str(tmp_path / 'materials.edmd')
+    write_matdesc_file(descs, path)
+    return MatDescFile(path, CLASSES.__getitem__)
+
+def test_round_trip(tmp_path):
+    f = write_file(tmp_path, {'EDM_Test_Material': make_desc()})
+    desc = f['EDM_Test_Material']
+    assert type(desc) is CLASSES['MatDesc']
+    assert desc.name == 'EDM_Test_Material' and desc.version == 3
+    assert desc.nodes[0].location == [10.0, 20.0]
+    assert desc.links[0].from_socket_idx == 0
+    assert desc.inputs[0].default_value == (1.0, 0.5, 0.0, 1.0)
+    assert f['EDM_Test_Material'] is desc
+    f.close()
+
+def test_shared_and_cyclic_references(tmp_path):
+    f = write_file(tmp_path, {'EDM_Test_Material': make_desc()})
+    desc = f['EDM_Test_Material']
+    socket = desc.inputs[0]
+    assert desc.nodes[0].inputs[0] is socket
+    assert desc.links[0].to_socket is socket
+    assert desc.nodes[0].owner is desc
+    f.close()
+
+def test_materials_are_decoded_separately(tmp_path):
+    f = write_file(tmp_path, {'A': make_desc(), 'B': make_desc()})
+    assert list(f) == ['A', 'B']
+    assert f['B'].inputs[0] is not f['A'].inputs[0]
+    f.close()
+
+def test_class_without_tag_is_rejected(tmp_path):
+    desc = make_desc()
+    desc.nodes.append(type('Unknown', (), {'__module__': 'serializer'})())
+    with pytest.raises(ValueError):
+        write_file(tmp_path, {'EDM_Test_Material': desc})
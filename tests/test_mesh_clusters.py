@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from conftest import make_grid, make_storage
+from mesh_clusters import get_mesh_clusters, get_morton_codes, pack_triangles, split_mesh_storage
+
+def make_object(max_vertices: int, max_triangles: int, cluster: bool = True):
+    props = SimpleNamespace(CLUSTER_MESH=cluster, CLUSTER_MAX_VERTICES=max_vertices, CLUSTER_MAX_TRIANGLES=max_triangles)
+    return SimpleNamespace(name='Mesh', EDMProps=props)
+
+def get_triangle_set(storage) -> set:
+    positions = storage.positions.reshape(-1, 3)
+    return {tuple(map(tuple, positions[x].tolist())) for x in storage.indices.reshape(-1, 3)}
+
+def test_pack_triangles_limits():
+    _, triangles = make_grid(20)
+    ranges = pack_triangles(triangles, 50, 64)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(triangles)
+    for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert end == next_start
+    for start, end in ranges:
+        assert end - start <= 64
+        assert len(np.unique(triangles[start:end])) <= 50
+
+def test_pack_triangles_takes_one_triangle_over_limit():
+    ranges = pack_triangles(np.array([[0, 1, 2], [3, 4, 5]]), 2, 10)
+    assert ranges == [(0, 1), (1, 2)]
+
+def test_morton_codes_order_by_cells():
+    points = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 1]], dtype=np.float64)
+    codes = get_morton_codes(points)
+    assert codes[0] < codes[1] < codes[2] < codes[3] < codes[4]
+
+def test_split_keeps_all_triangles():
+    storage = make_storage(*make_grid(30))
+    parts = split_mesh_storage(storage, 100, 128)
+    assert sum(x.nTriangles for x in parts) == storage.nTriangles
+    assert all(x.nVerts <= 100 and x.nTriangles <= 128 for x in parts)
+    assert set().union(*(get_triangle_set(x) for x in parts)) == get_triangle_set(storage)
+
+def test_clusters_are_named_by_object():
+    storage = make_storage(*make_grid(30))
+    clusters = get_mesh_clusters(make_object(100, 128), [storage])
+    assert len(clusters) > 1
+    assert [x.name for x in clusters] == [f'Mesh_{i}' for i in range(len(clusters))]
+
+def test_small_and_disabled_are_not_split():
+    storage = make_storage(*make_grid(5))
+    assert get_mesh_clusters(make_object(100, 128), [storage]) == [storage]
+    big = make_storage(*make_grid(30))
+    assert get_mesh_clusters(make_object(100, 128, False), [big]) == [big]
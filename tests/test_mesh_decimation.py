@@ -0,0 +1,58 @@
+import numpy as np
+
+from conftest import make_grid, make_storage
+from mesh_decimation import decimate, get_edge_hashes, weld_vertices
+
+def get_normals(storage) -> np.ndarray:
+    positions = storage.positions.reshape(-1, 3).astype(np.float64)
+    triangles = storage.indices.reshape(-1, 3)
+    p0 = positions[triangles[:, 0]]
+    return np.cross(positions[triangles[:, 1]] - p0, positions[triangles[:, 2]] - p0)
+
+def test_flat_grid_reaches_target(grid_storage):
+    # equal costs of flat grid must not block collapses of neighbouring vertices
+    result = decimate(grid_storage, 0.25)
+    assert result.nTriangles <= grid_storage.nTriangles * 0.3
+
+def test_triangles_are_not_flipped(grid_storage):
+    result = decimate(grid_storage, 0.25)
+    normals = get_normals(result)
+    assert np.all(normals[:, 2] > 0.0)
+
+def test_border_is_kept(grid_storage):
+    n: int = 40
+    positions = grid_storage.positions.reshape(-1, 3)
+    is_border = (positions[:, 0] == 0) | (positions[:, 0] == n - 1) | (positions[:, 1] == 0) | (positions[:, 1] == n - 1)
+    result = decimate(grid_storage, 0.25)
+    kept = {tuple(x) for x in result.positions.reshape(-1, 3).tolist()}
+    assert all(tuple(x) in kept for x in positions[is_border].tolist())
+
+def test_result_is_deterministic(grid_storage):
+    a = decimate(grid_storage, 0.25)
+    b = decimate(grid_storage, 0.25)
+    assert np.array_equal(a.indices, b.indices)
+    assert np.array_equal(a.positions, b.positions)
+
+def test_weld_merges_equal_vertices():
+    # two triangles of quad with separate vertices, as storage has them for every loop
+    positions = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 1, 0], [1, 0, 0], [1, 1, 0]], dtype=np.float32)
+    storage = make_storage(positions, [[0, 1, 2], [3, 4, 5]])
+    first, triangles = weld_vertices(storage)
+    assert len(first) == 4
+    assert triangles[0, 1] == triangles[1, 1] and triangles[0, 2] == triangles[1, 0]
+
+def test_damage_args_are_not_mixed():
+    positions, triangles = make_grid(10)
+    storage = make_storage(positions, triangles)
+    storage.damage_arguments[positions[:, 0] >= 5] = 3.0
+    result = decimate(storage, 0.25)
+    args = result.damage_arguments[result.indices.reshape(-1, 3)]
+    # triangles of one side keep args of their vertices
+    assert set(np.unique(args).tolist()) == {-1.0, 3.0}
+    assert result.nTriangles < storage.nTriangles
+
+def test_edge_hashes_change_by_seed():
+    u = np.arange(100)
+    v = u + 1
+    assert not np.array_equal(get_edge_hashes(u, v, 0), get_edge_hashes(u, v, 1))
+    assert np.array_equal(get_edge_hashes(u, v, 0), get_edge_hashes(u, v, 0))
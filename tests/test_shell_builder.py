@@ -0,0 +1,40 @@
+import numpy as np
+
+from conftest import make_grid
+from shell_builder import clean_triangles, get_bvh_order, get_canonical_triangles, weld_positions
+
+def test_canonical_triangles_keep_winding():
+    triangles = np.array([[2, 0, 1], [1, 2, 0], [0, 2, 1]])
+    assert get_canonical_triangles(triangles).tolist() == [[0, 1, 2], [0, 1, 2], [0, 2, 1]]
+
+def test_clean_keeps_opposite_winding():
+    positions = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0]], dtype=np.float32)
+    triangles = np.array([[0, 1, 2], [0, 2, 1], [1, 2, 0], [2, 1, 0]])
+    assert clean_triangles(positions, triangles).tolist() == [[0, 1, 2], [0, 2, 1]]
+
+def test_clean_drops_degenerate():
+    positions = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [2, 0, 0]], dtype=np.float32)
+    # repeated vertex, zero area, valid
+    triangles = np.array([[0, 0, 1], [0, 1, 3], [0, 1, 2]])
+    assert clean_triangles(positions, triangles).tolist() == [[0, 1, 2]]
+
+def test_weld_positions():
+    positions = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 0, 0]], dtype=np.float32)
+    welded, triangles = weld_positions(positions, np.array([[0, 1, 2], [2, 3, 0]]))
+    assert len(welded) == 3
+    assert np.array_equal(welded[triangles], positions[[[0, 1, 2], [2, 3, 0]]])
+
+def test_bvh_order_is_permutation():
+    positions, triangles = make_grid(20)
+    order = get_bvh_order(positions.astype(np.float64), triangles, 4)
+    assert np.array_equal(np.sort(order), np.arange(len(triangles)))
+
+def test_bvh_order_groups_close_triangles():
+    positions, triangles = make_grid(20)
+    positions = positions.astype(np.float64)
+    # shuffled triangles, neighbours in order are far apart
+    triangles = triangles[np.random.default_rng(0).permutation(len(triangles))]
+    centroids = positions[triangles].mean(axis=1)
+    order = get_bvh_order(positions, triangles, 4)
+    steps = np.linalg.norm(np.diff(centroids[order], axis=0), axis=1)
+    assert steps.mean() < 2.0
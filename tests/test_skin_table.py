@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from mesh_storage import SkinTable, VertexGroupTable
+
+# Vertex groups of every vertex as (group, weight) pairs.
+def make_table(vertices) -> VertexGroupTable:
+    return VertexGroupTable([SimpleNamespace(groups=[SimpleNamespace(group=g, weight=w) for g, w in x]) for x in vertices])
+
+def test_table_layout():
+    table = make_table([[(0, 0.5), (2, 0.5)], [], [(1, 1.0)]])
+    assert table.offsets.tolist() == [0, 2, 2, 3]
+    assert table.groups.tolist() == [0, 2, 1]
+    assert table.first_weights(-1.0).tolist() == [0.5, -1.0, 1.0]
+    assert table.has_groups()
+
+def test_groups_are_mapped_to_bones():
+    # group 1 isn't bone
+    table = make_table([[(0, 1.0)], [(1, 1.0), (2, 1.0)]])
+    skin = SkinTable(table, np.array([5, -1, 7], dtype=np.int32))
+    assert skin.bones[0, 0] == 5 and skin.weights[0, 0] == pytest.approx(1.0)
+    assert skin.weights[1, 0] == 0.0 and skin.bones[1, 0] == 0
+    assert skin.bones[1, 1] == 7 and skin.weights[1, 1] == pytest.approx(1.0)
+    assert skin.nPruned == 0
+
+def test_weak_influences_are_pruned():
+    weights = [0.4, 0.3, 0.2, 0.08, 0.02]
+    table = make_table([[(i, w) for i, w in enumerate(weights)]])
+    skin = SkinTable(table, np.arange(5, dtype=np.int32))
+    assert skin.bones.shape == (1, 4)
+    assert sorted(skin.bones[0].tolist()) == [0, 1, 2, 3]
+    assert skin.nPruned == 1
+    assert skin.get_max_error() == pytest.approx(0.02, abs=1.0e-6)
+
+def test_tiny_weights_are_dropped():
+    table = make_table([[(0, 1.0), (1, 1.0e-4)]])
+    skin = SkinTable(table, np.arange(2, dtype=np.int32))
+    assert skin.weights[0, 1] == 0.0 and skin.bones[0, 1] == 0
+
+def test_weights_are_normalized():
+    table = make_table([[(0, 3.0), (1, 4.0)], []])
+    skin = SkinTable(table, np.arange(2, dtype=np.int32))
+    assert np.linalg.norm(skin.weights[0]) == pytest.approx(1.0)
+    assert not skin.weights[1].any()